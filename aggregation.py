@@ -0,0 +1,127 @@
+# aggregation.py
+import calendar
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+from sqlalchemy import Integer, case, cast, func
+from sqlalchemy.orm import Session
+from sqlalchemy.sql.elements import ColumnElement
+
+import models
+
+# /graph?bucket= 로 받을 수 있는 구간 크기 (초)
+BUCKET_SECONDS: Dict[str, int] = {
+    "1m": 60,
+    "5m": 5 * 60,
+    "1h": 60 * 60,
+    "1d": 24 * 60 * 60,
+}
+
+# 한 번에 돌려주는 최대 구간 수
+MAX_BUCKETS = 5000
+
+METRICS = ("temperature", "humidity", "pm25")
+AIR_QUALITY_CLASSES = ("good", "normal", "bad")
+# PM2.5 경계값: 15 미만 good, 50 미만 normal, 나머지 bad (mqtt.get_air_quality 와 동일)
+AIR_QUALITY_PM25_BOUNDS = (15, 50)
+
+
+def to_epoch(dt: datetime) -> int:
+    """datetime -> UTC epoch 초 (naive 는 DB 와 같이 UTC 로 간주)"""
+    if dt.tzinfo is not None:
+        dt = dt.astimezone(timezone.utc)
+    return calendar.timegm(dt.timetuple())
+
+
+def to_naive_utc(dt: Optional[datetime]) -> Optional[datetime]:
+    """조회 조건의 시각 -> DB 에 저장된 형식과 같은 naive UTC (tz 가 붙은 값을 그대로 비교하면 벽시계 문자열로 비교됨)"""
+    if dt is None or dt.tzinfo is None:
+        return dt
+    return dt.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def classify_air_quality(pm25_values: Iterable[float]) -> List[str]:
+    """PM2.5 값 여러 개 -> air_quality 등급 목록 (numpy 로 배열 전체를 한 번에 분류)"""
+    values = np.fromiter(pm25_values, dtype=np.float64)
+    # side="right": 경계값과 같으면 위 등급 (15 -> normal, 50 -> bad)
+    classes = np.searchsorted(AIR_QUALITY_PM25_BOUNDS, values, side="right")
+    return np.asarray(AIR_QUALITY_CLASSES)[classes].tolist()
+
+
+def epoch_seconds(db: Session, column) -> ColumnElement:
+    """DATETIME 컬럼 -> UNIX epoch 초 (DB 종류별 함수 차이 처리)"""
+    if db.get_bind().dialect.name == "sqlite":
+        return cast(func.strftime("%s", column), Integer)
+    return cast(func.unix_timestamp(column), Integer)
+
+
+def bucket_start_expr(db: Session, column, seconds: int) -> ColumnElement:
+    """created_at 을 seconds 단위로 내림한 구간 시작 시각 (epoch 초)"""
+    # 정수 나눗셈 (SQLite: /, MySQL: DIV)
+    return (epoch_seconds(db, column) // seconds) * seconds
+
+
+def dominant_air_quality(counts: Dict[str, int]) -> Optional[str]:
+    """구간 안에서 가장 많이 나온 air_quality 등급 (동률이면 나쁜 쪽)"""
+    best: Optional[str] = None
+    best_count = 0
+    for name in AIR_QUALITY_CLASSES:
+        n = counts.get(name) or 0
+        if n > 0 and n >= best_count:
+            best, best_count = name, n
+    return best
+
+
+def aggregate_raw(
+    db: Session,
+    user_id: int,
+    seconds: int,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    limit: int = MAX_BUCKETS,
+) -> List[dict]:
+    """
+    data 테이블을 SQL GROUP BY 로 구간별 집계 (최신 구간부터).
+    ORM 객체를 만들지 않고 구간당 한 행만 받아온다.
+    """
+    Data = models.Data
+    bucket = bucket_start_expr(db, Data.created_at, seconds).label("bucket")
+
+    columns = [bucket, func.count().label("count")]
+    for metric in METRICS:
+        col = getattr(Data, metric)
+        columns += [
+            func.min(col).label(f"{metric}_min"),
+            func.avg(col).label(f"{metric}_avg"),
+            func.max(col).label(f"{metric}_max"),
+        ]
+    for name in AIR_QUALITY_CLASSES:
+        columns.append(
+            func.sum(case((Data.air_quality == name, 1), else_=0)).label(f"aq_{name}")
+        )
+
+    query = db.query(*columns).filter(Data.user_id == user_id)
+    if start_date:
+        query = query.filter(Data.created_at >= start_date)
+    if end_date:
+        query = query.filter(Data.created_at <= end_date)
+
+    rows = query.group_by(bucket).order_by(bucket.desc()).limit(limit).all()
+    return [bucket_row_to_point(row._mapping) for row in rows]
+
+
+def bucket_row_to_point(row) -> dict:
+    """집계 결과 한 행 -> BucketPoint 형태의 dict"""
+    point = {
+        "bucket_start": datetime.utcfromtimestamp(int(row["bucket"])),
+        "count": int(row["count"]),
+        "air_quality": dominant_air_quality(
+            {name: row[f"aq_{name}"] for name in AIR_QUALITY_CLASSES}
+        ),
+    }
+    for metric in METRICS:
+        for stat in ("min", "avg", "max"):
+            key = f"{metric}_{stat}"
+            point[key] = float(row[key]) if row[key] is not None else None
+    return point
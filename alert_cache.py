@@ -0,0 +1,158 @@
+# alert_cache.py
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+import models
+
+# 캐시 항목 유효 시간 (초). 다른 워커 프로세스에서 바뀐 설정도 이 시간 안에는 반영된다.
+ALERT_CACHE_TTL_SECONDS: float = float(os.getenv("ALERT_CACHE_TTL_SECONDS", "300"))
+
+# AlertSetting 값이 None 일 때 사용하는 기본값 (기존 check_and_send_alert 와 동일)
+DEFAULT_PM25_THRESHOLD = 50.0
+DEFAULT_TEMPERATURE_THRESHOLD = 1.0
+DEFAULT_HUMIDITY_THRESHOLD = 40.0
+DEFAULT_INTERVAL_MINUTES = 1
+DEFAULT_RULE = "above"
+RULE_KINDS = ("above", "below", "range")
+
+
+def _rule(value: Optional[str]) -> str:
+    return value if value in RULE_KINDS else DEFAULT_RULE
+
+
+def _optional_float(value) -> Optional[float]:
+    return float(value) if value is not None else None
+
+
+@dataclass(frozen=True)
+class AlertTarget:
+    """알림 판단에 필요한 유저 정보 + 기본값이 적용된 임계값"""
+    user_id: int
+    username: str
+    useremail: str
+    pm25_threshold: float
+    temperature_threshold: float
+    humidity_threshold: float
+    interval_minutes: int
+    # 항목별 규칙 ("above" / "below" / "range") 과 "range" 의 상한
+    pm25_rule: str = DEFAULT_RULE
+    temperature_rule: str = DEFAULT_RULE
+    humidity_rule: str = DEFAULT_RULE
+    pm25_upper: Optional[float] = None
+    temperature_upper: Optional[float] = None
+    humidity_upper: Optional[float] = None
+
+    def rule(self, metric: str) -> Tuple[str, float, Optional[float]]:
+        """metric -> (규칙, 기준값, 상한)"""
+        return (
+            getattr(self, f"{metric}_rule"),
+            getattr(self, f"{metric}_threshold"),
+            getattr(self, f"{metric}_upper"),
+        )
+
+    @classmethod
+    def from_rows(cls, user: models.User, setting: models.AlertSetting) -> "AlertTarget":
+        return cls(
+            user_id=user.User_ID,
+            username=user.username,
+            useremail=user.useremail,
+            pm25_threshold=(
+                float(setting.pm25_threshold)
+                if setting.pm25_threshold is not None
+                else DEFAULT_PM25_THRESHOLD
+            ),
+            temperature_threshold=(
+                float(setting.temperature_threshold)
+                if setting.temperature_threshold is not None
+                else DEFAULT_TEMPERATURE_THRESHOLD
+            ),
+            humidity_threshold=(
+                float(setting.humidity_threshold)
+                if setting.humidity_threshold is not None
+                else DEFAULT_HUMIDITY_THRESHOLD
+            ),
+            interval_minutes=(
+                int(setting.interval_minutes)
+                if setting.interval_minutes is not None
+                else DEFAULT_INTERVAL_MINUTES
+            ),
+            pm25_rule=_rule(setting.pm25_rule),
+            temperature_rule=_rule(setting.temperature_rule),
+            humidity_rule=_rule(setting.humidity_rule),
+            pm25_upper=_optional_float(setting.pm25_upper_threshold),
+            temperature_upper=_optional_float(setting.temperature_upper_threshold),
+            humidity_upper=_optional_float(setting.humidity_upper_threshold),
+        )
+
+
+class AlertTargetCache:
+    """
+    user_id -> AlertTarget 프로세스 로컬 캐시.
+
+    - 유저가 없거나 AlertSetting 이 없는 경우도 None 으로 캐시 (매번 조회하지 않도록)
+    - 설정 변경/계정 삭제 시 routes/user.py 에서 put()/invalidate() 호출
+    - TTL 이 지나면 다음 조회 때 DB 에서 다시 읽음
+    """
+
+    def __init__(self, ttl: float = ALERT_CACHE_TTL_SECONDS) -> None:
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries: Dict[int, Tuple[Optional[AlertTarget], float]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, db: Session, user_id: int) -> Optional[AlertTarget]:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and entry[1] > now:
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+
+        target = self._load(db, user_id)
+        with self._lock:
+            self._entries[user_id] = (target, now + self.ttl)
+        return target
+
+    def put(self, target: AlertTarget) -> None:
+        """DB 에 방금 쓴 값으로 캐시를 갱신 (write-through)"""
+        with self._lock:
+            self._entries[target.user_id] = (target, time.monotonic() + self.ttl)
+
+    def invalidate(self, user_id: int) -> None:
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def _load(self, db: Session, user_id: int) -> Optional[AlertTarget]:
+        row = (
+            db.query(models.User, models.AlertSetting)
+            .outerjoin(
+                models.AlertSetting,
+                models.AlertSetting.user_id == models.User.User_ID,
+            )
+            .filter(models.User.User_ID == user_id)
+            .first()
+        )
+        if row is None:
+            print("[ALERT] No user found for id:", user_id)
+            return None
+
+        user, setting = row
+        if setting is None:
+            print("[ALERT] No AlertSetting for user:", user_id)
+            return None
+
+        return AlertTarget.from_rows(user, setting)
+
+
+alert_targets = AlertTargetCache()
@@ -0,0 +1,255 @@
+# alert_cooldown.py
+import os
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Set, Tuple
+
+from sqlalchemy.orm import Session
+
+import models
+
+# 임계값 아래로 이 비율만큼 더 내려가야 "해제"로 본다 (예: 0.05 -> 기준 50이면 47.5 미만에서 해제)
+ALERT_HYSTERESIS_RATIO: float = float(os.getenv("ALERT_HYSTERESIS_RATIO", "0.05"))
+# "1" 이면 초과 구간이 계속되는 동안 interval_minutes 마다 다시 알림 (기본: 구간마다 한 번만)
+ALERT_REMIND_WHILE_ACTIVE: bool = os.getenv("ALERT_REMIND_WHILE_ACTIVE", "0") == "1"
+# 메일을 보내지 않은 상태 변화(억제 횟수 등)를 DB에 모아서 쓰는 주기 (초)
+ALERT_STATE_FLUSH_SECONDS: float = float(os.getenv("ALERT_STATE_FLUSH_SECONDS", "30"))
+
+
+@dataclass
+class CooldownState:
+    """(유저, 항목) 하나의 알림 상태"""
+    active: bool = False                    # 초과 구간 안에 있는지 (히스테리시스 적용)
+    last_sent_at: Optional[datetime] = None
+    notified: bool = False                  # 지금 초과 구간에 대해 메일을 보냈는지
+    suppressed: int = 0                     # 마지막 메일 이후 쿨다운으로 억제된 초과 횟수
+    peak: Optional[float] = None            # 억제된 초과 값 중 최고값
+    dirty: bool = False                     # DB에 아직 쓰지 않은 변경이 있는지
+
+
+@dataclass
+class AlertDecision:
+    """메일로 보내야 하는 초과 한 건 (억제됐던 초과 요약 포함)"""
+    metric: str
+    value: float
+    threshold: float
+    suppressed: int
+    peak: float
+    # 전송 실패 시 되돌리기용 (send_failed)
+    sent_at: Optional[datetime] = None
+    previous_sent_at: Optional[datetime] = None
+    previous_notified: bool = False
+
+
+class AlertCooldown:
+    """
+    (user_id, metric) 단위 알림 쿨다운 / 중복 억제 엔진.
+
+    - value >= threshold 이면 초과 구간 시작 -> 메일은 구간마다 한 번
+      (직전 메일 이후 interval_minutes 가 지나지 않았으면 지날 때까지 미룸)
+    - 한 번 초과한 뒤에는 threshold * (1 - hysteresis_ratio) 아래로 내려가야 해제되고,
+      해제된 뒤에 다시 초과해야 새 구간 (기준 근처에서 오르내리는 값으로는 다시 알리지 않음)
+    - 메일을 보내지 않은 초과는 횟수/최고값만 누적 -> 다음 메일에 요약으로 포함
+    - remind_while_active 면 구간이 계속되는 동안 interval_minutes 마다 다시 알림
+    - 상태는 alert_state 테이블에 저장해서 재시작 후에도 쿨다운이 유지된다
+    """
+
+    def __init__(
+        self,
+        hysteresis_ratio: float = ALERT_HYSTERESIS_RATIO,
+        flush_interval: float = ALERT_STATE_FLUSH_SECONDS,
+        remind_while_active: bool = ALERT_REMIND_WHILE_ACTIVE,
+    ) -> None:
+        self.hysteresis_ratio = hysteresis_ratio
+        self.flush_interval = flush_interval
+        self.remind_while_active = remind_while_active
+
+        self._lock = threading.Lock()
+        self._states: Dict[Tuple[int, str], CooldownState] = {}
+        # active 상태인 (user_id, metric) - 해제 여부를 확인해야 하는 유저를 빨리 찾기 위함
+        self._active: Set[Tuple[int, str]] = set()
+        self._loaded = False
+        self._last_flush = time.monotonic()
+
+    def evaluate(
+        self,
+        db: Session,
+        user_id: int,
+        metric: str,
+        value: Optional[float],
+        threshold: float,
+        interval_minutes: int,
+        now: Optional[datetime] = None,
+        breached: Optional[bool] = None,
+        cleared: Optional[bool] = None,
+    ) -> Optional[AlertDecision]:
+        """
+        측정값 하나를 반영하고, 지금 메일을 보내야 하면 AlertDecision 을 반환.
+        db 는 처음 한 번 이전 상태를 읽는 데만 씀 (읽기 세션 가능, 저장은 호출한 쪽이 flush 로).
+        breached / cleared 를 주면 (alert_rules 로 평가한 결과) 그대로 쓰고,
+        없으면 value >= threshold 로 초과, 히스테리시스 아래로 내려가면 해제로 판단.
+        """
+        if value is None:
+            return None
+        if now is None:
+            now = datetime.utcnow()
+
+        self._ensure_loaded(db)
+
+        decision: Optional[AlertDecision] = None
+        with self._lock:
+            state = self._states.setdefault((user_id, metric), CooldownState())
+            if breached is None:
+                breached = value >= threshold
+            if cleared is None:
+                cleared = value < threshold - abs(threshold) * self.hysteresis_ratio
+
+            if breached:
+                if not state.active:
+                    # 새 초과 구간 (처음이거나 해제된 뒤 다시 초과)
+                    state.active = True
+                    state.notified = False
+                    self._active.add((user_id, metric))
+
+                cooldown = timedelta(minutes=max(1, interval_minutes))
+                cooled = state.last_sent_at is None or now - state.last_sent_at >= cooldown
+                if cooled and (not state.notified or self.remind_while_active):
+                    # 다른 알림 워커가 같은 구간으로 또 보내지 않도록 미리 기록 (실패하면 send_failed 로 되돌림)
+                    decision = AlertDecision(
+                        metric=metric,
+                        value=value,
+                        threshold=threshold,
+                        suppressed=state.suppressed,
+                        peak=_worse(value, state.peak, threshold),
+                        sent_at=now,
+                        previous_sent_at=state.last_sent_at,
+                        previous_notified=state.notified,
+                    )
+                    state.last_sent_at = now
+                    state.notified = True
+                    state.suppressed = 0
+                    state.peak = None
+                else:
+                    state.suppressed += 1
+                    state.peak = _worse(value, state.peak, threshold)
+                state.dirty = True
+
+            elif state.active and cleared:
+                # 히스테리시스 구간 안쪽으로 들어와야 해제
+                state.active = False
+                state.dirty = True
+                self._active.discard((user_id, metric))
+
+        return decision
+
+    def send_failed(self, user_id: int, decision: AlertDecision) -> None:
+        """
+        메일 전송이 실패했을 때 evaluate 가 미리 기록한 전송을 되돌린다.
+        구간은 그대로 active 이고 보내지 못한 초과는 억제 횟수 / 최고값에 남아서 다음 초과 측정값에서 다시 보낸다.
+        """
+        with self._lock:
+            state = self._states.get((user_id, decision.metric))
+            # 그 사이 다른 전송이 기록됐으면 건드리지 않음
+            if state is None or state.last_sent_at != decision.sent_at:
+                return
+            state.last_sent_at = decision.previous_sent_at
+            state.notified = decision.previous_notified
+            state.suppressed += decision.suppressed + 1
+            state.peak = _worse(decision.peak, state.peak, decision.threshold)
+            state.dirty = True
+
+    def flush_due(self) -> bool:
+        """마지막 저장 후 flush_interval 이 지났는지 (메일을 보내지 않은 변화는 이 주기로 모아서 저장)"""
+        return time.monotonic() - self._last_flush >= self.flush_interval
+
+    def flush(self, db: Session) -> None:
+        """변경된 상태를 alert_state 테이블에 저장"""
+        with self._lock:
+            dirty: List[Tuple[Tuple[int, str], CooldownState]] = [
+                (key, CooldownState(s.active, s.last_sent_at, s.notified, s.suppressed, s.peak))
+                for key, s in self._states.items()
+                if s.dirty
+            ]
+            for key, _ in dirty:
+                self._states[key].dirty = False
+            self._last_flush = time.monotonic()
+
+        if not dirty:
+            return
+
+        try:
+            for (user_id, metric), s in dirty:
+                db.merge(
+                    models.AlertState(
+                        user_id=user_id,
+                        metric=metric,
+                        active=s.active,
+                        last_sent_at=s.last_sent_at,
+                        notified=s.notified,
+                        suppressed_count=s.suppressed,
+                        peak_value=s.peak,
+                    )
+                )
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            # 다음 flush 때 다시 시도
+            with self._lock:
+                for key, _ in dirty:
+                    if key in self._states:
+                        self._states[key].dirty = True
+            print("[ALERT] 알림 상태 저장 실패:", e)
+
+    def active_user_ids(self) -> Set[int]:
+        """초과 구간 안에 있는 항목이 하나라도 있는 유저들"""
+        with self._lock:
+            return {user_id for user_id, _ in self._active}
+
+    def forget_user(self, user_id: int) -> None:
+        with self._lock:
+            for key in [k for k in self._states if k[0] == user_id]:
+                del self._states[key]
+                self._active.discard(key)
+
+    def reset(self) -> None:
+        """메모리 상태를 버리고 다음 사용 때 alert_state 에서 다시 읽음 (다른 프로세스가 알림을 맡았다가 넘겨받을 때)"""
+        with self._lock:
+            self._states.clear()
+            self._active.clear()
+            self._loaded = False
+
+    def _ensure_loaded(self, db: Session) -> None:
+        """처음 사용할 때 alert_state 테이블에서 이전 상태를 복원"""
+        if self._loaded:
+            return
+        rows = db.query(models.AlertState).all()
+        with self._lock:
+            if self._loaded:
+                return
+            for row in rows:
+                if row.active:
+                    self._active.add((row.user_id, row.metric))
+                self._states.setdefault(
+                    (row.user_id, row.metric),
+                    CooldownState(
+                        active=bool(row.active),
+                        last_sent_at=row.last_sent_at,
+                        notified=bool(row.notified) if row.notified is not None else bool(row.active),
+                        suppressed=row.suppressed_count or 0,
+                        peak=row.peak_value,
+                    ),
+                )
+            self._loaded = True
+        print(f"[ALERT] Restored {len(rows)} alert cooldown states")
+
+
+def _worse(value: float, peak: Optional[float], threshold: float) -> float:
+    """기준에서 더 멀리 벗어난 값 (above 면 더 큰 값, below 면 더 작은 값)"""
+    if peak is None:
+        return value
+    return value if abs(value - threshold) > abs(peak - threshold) else peak
+
+
+alert_cooldown = AlertCooldown()
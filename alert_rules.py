@@ -0,0 +1,190 @@
+# alert_rules.py
+import threading
+import time
+from dataclasses import dataclass
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from database import ReadSessionLocal
+from alert_cache import ALERT_CACHE_TTL_SECONDS, AlertTarget
+from alert_cooldown import ALERT_HYSTERESIS_RATIO
+import models
+
+# 평가 순서 = 컬럼 순서 (메일에 나오는 순서와 같음)
+METRICS: Tuple[str, ...] = ("pm25", "temperature", "humidity")
+
+
+def rule_bounds(kind: str, threshold: float, upper: Optional[float]) -> Tuple[float, float]:
+    """
+    규칙 하나 -> (이 값 이상이면 초과, 이 값 이하이면 초과).
+    세 규칙을 모두 "value >= hi or value <= lo" 한 가지 비교로 평가하기 위한 변환.
+    - above: value >= threshold
+    - below: value <= threshold
+    - range: value < threshold or value > upper (범위를 벗어나면)
+    """
+    if kind == "below":
+        return np.inf, threshold
+    if kind == "range":
+        hi = np.nextafter(upper, np.inf) if upper is not None else np.inf
+        return hi, np.nextafter(threshold, -np.inf)
+    return threshold, -np.inf
+
+
+def compile_bounds(
+    targets: Sequence[AlertTarget],
+    hysteresis_ratio: float = ALERT_HYSTERESIS_RATIO,
+) -> np.ndarray:
+    """
+    유저들 -> 임계값 표. shape = (유저 수, 4, len(METRICS)), 두 번째 축은
+    [hi, lo, 해제 hi, 해제 lo]. 해제 경계는 기준에서 hysteresis_ratio 만큼 안쪽.
+    """
+    bounds = np.empty((len(targets), 4, len(METRICS)))
+    for i, target in enumerate(targets):
+        for j, metric in enumerate(METRICS):
+            bounds[i, 0, j], bounds[i, 1, j] = rule_bounds(*target.rule(metric))
+    hi, lo = bounds[:, 0], bounds[:, 1]
+    with np.errstate(invalid="ignore"):
+        bounds[:, 2] = np.where(np.isfinite(hi), hi - np.abs(hi) * hysteresis_ratio, np.inf)
+        bounds[:, 3] = np.where(np.isfinite(lo), lo + np.abs(lo) * hysteresis_ratio, -np.inf)
+    return bounds
+
+
+def evaluate_bounds(bounds: np.ndarray, values: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    측정값 (n, len(METRICS)) 과 행마다 맞춘 임계값 표 (n, 4, len(METRICS)) -> (초과, 해제) bool 배열.
+    값이 NaN(없음)이면 둘 다 False.
+    """
+    breached = (values >= bounds[:, 0]) | (values <= bounds[:, 1])
+    cleared = (values < bounds[:, 2]) & (values > bounds[:, 3])
+    return breached, cleared
+
+
+def violated_threshold(target: AlertTarget, metric: str, value: float) -> float:
+    """메일에 적을 기준값 ("range" 는 벗어난 쪽 경계)"""
+    kind, threshold, upper = target.rule(metric)
+    if kind == "range" and upper is not None and value > upper:
+        return upper
+    return threshold
+
+
+def readings_to_array(rows: Iterable[dict]) -> Tuple[np.ndarray, np.ndarray]:
+    """행 dict 들 -> (user_id 배열, 측정값 (n, len(METRICS)) 배열, 없는 값은 NaN)"""
+    rows = list(rows)
+    user_ids = np.fromiter((row["user_id"] for row in rows), dtype=np.int64, count=len(rows))
+    # dtype=float64 면 None 은 NaN 으로 변환됨
+    values = np.array(
+        [(row["pm25"], row["temperature"], row["humidity"]) for row in rows],
+        dtype=np.float64,
+    ).reshape(len(rows), len(METRICS))
+    return user_ids, values
+
+
+@dataclass(frozen=True)
+class _Compiled:
+    user_ids: np.ndarray  # 정렬된 user_id
+    bounds: np.ndarray    # compile_bounds 결과 (user_ids 와 같은 순서)
+    loaded_at: float
+
+
+@dataclass
+class RuleResult:
+    known: np.ndarray     # (n,) 알림 설정이 있는 유저의 측정값인지
+    breached: np.ndarray  # (n, len(METRICS))
+    cleared: np.ndarray   # (n, len(METRICS))
+
+
+class AlertRuleTable:
+    """
+    모든 유저의 AlertSetting 을 user_id 순으로 정렬된 numpy 임계값 표로 컴파일해 두고,
+    측정값 배치 전체를 한 번에 평가한다 (유저/측정값 수와 관계없이 numpy 연산 몇 번).
+
+    - 표는 통째로 새로 만들어 교체하므로 평가 쪽은 락 없이 읽음
+    - 설정 변경 시 invalidate() -> 다음 평가 때 DB 에서 다시 컴파일
+    - 다른 워커 프로세스의 변경은 ttl 안에 반영 (alert_cache 와 같은 주기)
+    """
+
+    def __init__(
+        self,
+        ttl: float = ALERT_CACHE_TTL_SECONDS,
+        hysteresis_ratio: float = ALERT_HYSTERESIS_RATIO,
+    ) -> None:
+        self.ttl = ttl
+        self.hysteresis_ratio = hysteresis_ratio
+        self._compiled: Optional[_Compiled] = None
+        self._stale = True
+        self._lock = threading.Lock()
+
+    def invalidate(self) -> None:
+        self._stale = True
+
+    def compile(self, db: Session) -> _Compiled:
+        rows = (
+            db.query(models.User, models.AlertSetting)
+            .join(models.AlertSetting, models.AlertSetting.user_id == models.User.User_ID)
+            .order_by(models.User.User_ID)
+            .all()
+        )
+        targets: List[AlertTarget] = [AlertTarget.from_rows(user, setting) for user, setting in rows]
+        return _Compiled(
+            user_ids=np.array([t.user_id for t in targets], dtype=np.int64),
+            bounds=compile_bounds(targets, self.hysteresis_ratio),
+            loaded_at=time.monotonic(),
+        )
+
+    def _current(self) -> _Compiled:
+        compiled = self._compiled
+        if compiled is not None and not self._stale and time.monotonic() - compiled.loaded_at < self.ttl:
+            return compiled
+        with self._lock:
+            compiled = self._compiled
+            if compiled is None or self._stale or time.monotonic() - compiled.loaded_at >= self.ttl:
+                self._stale = False
+                db: Session = ReadSessionLocal()
+                try:
+                    compiled = self._compiled = self.compile(db)
+                finally:
+                    db.close()
+        return compiled
+
+    def evaluate(self, user_ids: np.ndarray, values: np.ndarray) -> RuleResult:
+        compiled = self._current()
+        n = len(user_ids)
+        if len(compiled.user_ids) == 0 or n == 0:
+            empty = np.zeros((n, len(METRICS)), dtype=bool)
+            return RuleResult(np.zeros(n, dtype=bool), empty, empty)
+
+        # user_id -> 표의 행 번호 (정렬된 배열에서 이진 탐색)
+        rows = np.minimum(np.searchsorted(compiled.user_ids, user_ids), len(compiled.user_ids) - 1)
+        known = compiled.user_ids[rows] == user_ids
+        breached, cleared = evaluate_bounds(compiled.bounds[rows], values)
+        breached &= known[:, None]
+        cleared &= known[:, None]
+        return RuleResult(known, breached, cleared)
+
+    def worse(self, user_id: int, metric: str, a: float, b: float) -> float:
+        """
+        같은 유저의 두 측정값 중 그 항목 규칙의 경계에서 더 멀리 벗어난 값 (알림 큐에서 이벤트를 합칠 때).
+        above 면 더 큰 값, below 면 더 작은 값, range 는 범위 밖으로 더 나간 값. 같으면 새 값(b)
+        """
+        # 알림 큐의 잠금 안에서 불리므로 DB 에서 다시 읽지 않고 마지막으로 컴파일한 표를 사용
+        compiled = self._compiled
+        if compiled is None:
+            return max(a, b)
+        j = METRICS.index(metric)
+        i = int(np.searchsorted(compiled.user_ids, user_id))
+        if i >= len(compiled.user_ids) or compiled.user_ids[i] != user_id:
+            return max(a, b)
+        hi, lo = compiled.bounds[i, 0, j], compiled.bounds[i, 1, j]
+        # 경계 밖으로 나간 정도 (안쪽이면 음수)
+        excess_a = max(a - hi, lo - a)
+        excess_b = max(b - hi, lo - b)
+        return a if excess_a > excess_b else b
+
+    def stats(self) -> dict:
+        compiled = self._compiled
+        return {"users": 0 if compiled is None else len(compiled.user_ids)}
+
+
+alert_rules = AlertRuleTable()
@@ -0,0 +1,189 @@
+# alerts.py
+import os
+import threading
+from collections import deque
+from dataclasses import dataclass
+from typing import Callable, Deque, Dict, List, Optional
+
+# 알림 처리 워커 설정 (환경변수로 조절 가능)
+ALERT_WORKERS: int = int(os.getenv("ALERT_WORKERS", "2"))
+ALERT_QUEUE_SIZE: int = int(os.getenv("ALERT_QUEUE_SIZE", "1000"))
+
+# 큐가 가득 찼을 때 정책
+# - "merge": 같은 유저의 대기 중인 이벤트에 값을 합침 (없으면 새 이벤트를 버림)
+# - "drop_new": 새 이벤트를 버림
+# - "drop_old": 가장 오래된 이벤트를 버리고 새 이벤트를 넣음
+ALERT_OVERFLOW_POLICY: str = os.getenv("ALERT_OVERFLOW_POLICY", "merge")
+OVERFLOW_POLICIES = ("merge", "drop_new", "drop_old")
+
+# (user_id, 항목, 대기 중인 값, 새 값) -> 합친 이벤트에 남길 값 (alert_rules.AlertRuleTable.worse)
+WorseValue = Callable[[int, str, float, float], float]
+
+
+@dataclass
+class AlertEvent:
+    """알림 체크 대상이 되는 (user_id, 측정값) 한 건"""
+    user_id: int
+    temperature: Optional[float]
+    humidity: Optional[float]
+    pm25: Optional[float]
+    merged: int = 1  # 합쳐진 측정값 개수
+
+    def merge(self, other: "AlertEvent", worse: Optional[WorseValue] = None) -> None:
+        """
+        대기 중인 이벤트에 새 측정값을 합친다. 항목마다 규칙 경계에서 더 멀리 벗어난 값을 유지
+        (worse 가 없으면 더 큰 값 = above 규칙 기준)
+        """
+        for metric in ("temperature", "humidity", "pm25"):
+            a, b = getattr(self, metric), getattr(other, metric)
+            if a is None:
+                value = b
+            elif b is None:
+                value = a
+            else:
+                value = worse(self.user_id, metric, a, b) if worse is not None else max(a, b)
+            setattr(self, metric, value)
+        self.merged += other.merged
+
+
+class AlertDispatcher:
+    """
+    MQTT 콜백/적재 스레드와 분리된 알림 처리 단계.
+
+    - submit() 은 큐에 넣기만 하고 바로 반환 (SMTP 지연이 적재에 영향 X)
+    - workers 개의 스레드가 큐에서 꺼내 handler(event) 를 호출
+    - 큐가 max_size 에 도달하면 overflow_policy 에 따라 합치거나 버림
+    """
+
+    def __init__(
+        self,
+        handler: Callable[[AlertEvent], None],
+        workers: int = ALERT_WORKERS,
+        max_size: int = ALERT_QUEUE_SIZE,
+        overflow_policy: str = ALERT_OVERFLOW_POLICY,
+        worse: Optional[WorseValue] = None,
+    ) -> None:
+        if overflow_policy not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown alert overflow policy: {overflow_policy}")
+
+        self.handler = handler
+        self.workers = max(1, workers)
+        self.max_size = max(1, max_size)
+        self.overflow_policy = overflow_policy
+        self.worse = worse
+
+        self._queue: Deque[AlertEvent] = deque()
+        # 유저별로 가장 최근에 큐에 들어간 이벤트 (merge 정책에서 사용)
+        self._pending: Dict[int, AlertEvent] = {}
+        self._cond = threading.Condition()
+        self._stopping = False
+        self._threads: List[threading.Thread] = []
+
+        self._stats: Dict[str, int] = {
+            "submitted": 0,   # submit() 호출 수
+            "processed": 0,   # handler 처리 완료 수
+            "failed": 0,      # handler 예외 수
+            "merged": 0,      # 대기 이벤트에 합쳐진 수
+            "dropped": 0,     # 큐가 가득 차서 버려진 수
+        }
+
+    # -----------------------------
+    # 생산자 쪽
+    # -----------------------------
+    def submit(self, event: AlertEvent) -> bool:
+        """이벤트를 큐에 넣는다. 버려졌으면 False."""
+        with self._cond:
+            self._stats["submitted"] += 1
+
+            if len(self._queue) >= self.max_size:
+                outcome = self._handle_overflow(event)
+                if outcome == "dropped":
+                    return False
+                if outcome == "merged":
+                    # 대기 중인 이벤트에 합쳐졌으므로 새로 넣지 않음
+                    return True
+
+            self._queue.append(event)
+            self._pending[event.user_id] = event
+            self._cond.notify()
+            return True
+
+    def _handle_overflow(self, event: AlertEvent) -> str:
+        """
+        _cond 를 잡은 상태에서 호출.
+        "merged" / "dropped" / "room"(오래된 이벤트를 버려 자리가 생김) 중 하나를 반환.
+        """
+        if self.overflow_policy == "merge":
+            pending = self._pending.get(event.user_id)
+            if pending is not None:
+                pending.merge(event, self.worse)
+                self._stats["merged"] += 1
+                return "merged"
+
+        elif self.overflow_policy == "drop_old":
+            oldest = self._queue.popleft()
+            self._forget(oldest)
+            self._stats["dropped"] += 1
+            return "room"
+
+        self._stats["dropped"] += 1
+        return "dropped"
+
+    def _forget(self, event: AlertEvent) -> None:
+        if self._pending.get(event.user_id) is event:
+            del self._pending[event.user_id]
+
+    # -----------------------------
+    # 워커
+    # -----------------------------
+    def start(self) -> None:
+        if self._threads:
+            return
+        self._stopping = False
+        for i in range(self.workers):
+            t = threading.Thread(
+                target=self._run, name=f"alert-worker-{i}", daemon=True
+            )
+            t.start()
+            self._threads.append(t)
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """대기 중인 이벤트를 처리한 뒤 워커를 멈춘다."""
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        for t in self._threads:
+            t.join(timeout)
+        self._threads = []
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._queue and not self._stopping:
+                    self._cond.wait()
+                if not self._queue:
+                    return
+                event = self._queue.popleft()
+                self._forget(event)
+
+            try:
+                self.handler(event)
+            except Exception as e:
+                with self._cond:
+                    self._stats["failed"] += 1
+                print("[ALERT] 알림 워커 오류:", e)
+            else:
+                with self._cond:
+                    self._stats["processed"] += 1
+
+    # -----------------------------
+    # 카운터
+    # -----------------------------
+    def stats(self) -> Dict[str, object]:
+        with self._cond:
+            snapshot: Dict[str, object] = dict(self._stats)
+            snapshot["queue_depth"] = len(self._queue)
+        snapshot["workers"] = self.workers
+        snapshot["max_size"] = self.max_size
+        snapshot["overflow_policy"] = self.overflow_policy
+        return snapshot
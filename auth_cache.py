@@ -0,0 +1,106 @@
+# auth_cache.py
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, Optional, Set, Tuple
+
+import models
+
+# 토큰 하나를 캐시에 두는 최대 시간 (초). 토큰 exp 가 더 빠르면 exp 까지만.
+# 다른 워커 프로세스에서 삭제된 계정도 이 시간 안에는 거부된다.
+AUTH_CACHE_TTL_SECONDS: float = float(os.getenv("AUTH_CACHE_TTL_SECONDS", "60"))
+# 캐시에 두는 최대 토큰 수 (넘으면 가장 오래 안 쓴 것부터 제거)
+AUTH_CACHE_SIZE: int = int(os.getenv("AUTH_CACHE_SIZE", "10000"))
+
+
+@dataclass(frozen=True)
+class AuthUser:
+    """인증된 유저 스냅샷 (models.User 와 같은 속성 이름이라 UserInfo 응답에도 그대로 사용)"""
+    User_ID: int
+    username: str
+    useremail: str
+    create_at: Optional[datetime]
+
+    @classmethod
+    def from_user(cls, user: models.User) -> "AuthUser":
+        return cls(
+            User_ID=user.User_ID,
+            username=user.username,
+            useremail=user.useremail,
+            create_at=user.create_at,
+        )
+
+
+class AuthCache:
+    """
+    JWT 문자열 -> AuthUser 프로세스 로컬 LRU 캐시.
+
+    - 서명 검증 + User 조회를 통과한 토큰만 저장 -> 다음 요청은 디코딩/DB 조회 없이 바로 반환
+    - 항목 만료 시각은 min(지금 + ttl, 토큰 exp)
+    - 계정 삭제 시 routes/user.py 에서 invalidate_user() 호출 (그 유저의 토큰 전부 제거)
+    """
+
+    def __init__(self, max_size: int = AUTH_CACHE_SIZE, ttl: float = AUTH_CACHE_TTL_SECONDS) -> None:
+        self.max_size = max(1, max_size)
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, Tuple[AuthUser, float]]" = OrderedDict()
+        self._tokens_by_user: Dict[int, Set[str]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, token: str) -> Optional[AuthUser]:
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is not None:
+                if entry[1] > now:
+                    self._entries.move_to_end(token)
+                    self.hits += 1
+                    return entry[0]
+                self._remove(token)
+            self.misses += 1
+        return None
+
+    def put(self, token: str, user: AuthUser, exp: Optional[float] = None) -> None:
+        expires_at = time.time() + self.ttl
+        if exp is not None:
+            expires_at = min(expires_at, float(exp))
+        with self._lock:
+            self._remove(token)
+            self._entries[token] = (user, expires_at)
+            self._tokens_by_user.setdefault(user.User_ID, set()).add(token)
+            while len(self._entries) > self.max_size:
+                self._remove(next(iter(self._entries)))
+
+    def invalidate_user(self, user_id: int) -> None:
+        with self._lock:
+            for token in list(self._tokens_by_user.get(user_id, ())):
+                self._remove(token)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._tokens_by_user.clear()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"size": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+    def _remove(self, token: str) -> None:
+        """self._lock 을 잡은 상태에서 호출"""
+        entry = self._entries.pop(token, None)
+        if entry is None:
+            return
+        user_id = entry[0].User_ID
+        tokens = self._tokens_by_user.get(user_id)
+        if tokens is not None:
+            tokens.discard(token)
+            if not tokens:
+                del self._tokens_by_user[user_id]
+
+
+auth_users = AuthCache()
@@ -0,0 +1,139 @@
+# bench/graph_query.py
+"""
+/graph 조회 시간 vs data 테이블 크기 벤치마크.
+같은 데이터로 (user_id, created_at) 인덱스가 없을 때 / 있을 때를 비교한다.
+
+    python -m bench.graph_query --sizes 10000 100000 1000000 --users 50
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+from typing import Callable, List
+
+from sqlalchemy import create_engine, insert, text
+from sqlalchemy.orm import sessionmaker
+
+from database import Base
+import models
+from routes.graph import build_graph_query
+
+INDEX_NAME = "ix_data_user_id_created_at"
+
+
+def seed(engine, size: int, users: int, days: int) -> None:
+    with engine.begin() as conn:
+        conn.execute(
+            insert(models.User),
+            [
+                {
+                    "User_ID": uid,
+                    "username": f"user{uid}",
+                    "useremail": f"user{uid}@example.com",
+                    "userpassword": "x",
+                }
+                for uid in range(1, users + 1)
+            ],
+        )
+
+    start = datetime.utcnow() - timedelta(days=days)
+    step = timedelta(days=days) / size
+    chunk = 50_000
+    rng = random.Random(42)
+    for offset in range(0, size, chunk):
+        rows = []
+        for i in range(offset, min(size, offset + chunk)):
+            pm25 = rng.uniform(0, 100)
+            rows.append(
+                {
+                    "temperature": rng.uniform(15, 35),
+                    "humidity": rng.uniform(20, 80),
+                    "pm25": pm25,
+                    "air_quality": "good" if pm25 < 15 else ("normal" if pm25 < 50 else "bad"),
+                    "created_at": start + step * i,
+                    "user_id": rng.randint(1, users),
+                }
+            )
+        with engine.begin() as conn:
+            conn.execute(insert(models.Data), rows)
+
+
+def timed(fn: Callable[[], object], repeat: int) -> float:
+    samples: List[float] = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+
+def run_queries(Session, users: int, repeat: int) -> dict:
+    now = datetime.utcnow()
+    db = Session()
+    try:
+        latest = timed(
+            lambda: build_graph_query(db, users // 2 or 1).limit(100).all(), repeat
+        )
+        last_day = timed(
+            lambda: build_graph_query(
+                db, users // 2 or 1, start_date=now - timedelta(days=1), end_date=now
+            ).limit(100).all(),
+            repeat,
+        )
+        plan = db.execute(
+            text(
+                "EXPLAIN QUERY PLAN "
+                + str(
+                    build_graph_query(db, 1, start_date=now, end_date=now)
+                    .limit(100)
+                    .statement.compile(compile_kwargs={"literal_binds": True})
+                )
+            )
+        ).fetchall()
+    finally:
+        db.close()
+    return {
+        "latest_100_ms": latest,
+        "last_day_100_ms": last_day,
+        "plan": " / ".join(row[-1] for row in plan),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    print(f"{'rows':>10} | {'index':>5} | {'latest 100 (ms)':>15} | {'last day (ms)':>13} | plan")
+    for size in args.sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            engine = create_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+            Base.metadata.create_all(bind=engine)
+            with engine.begin() as conn:
+                conn.execute(text(f"DROP INDEX {INDEX_NAME}"))
+            seed(engine, size, args.users, args.days)
+            Session = sessionmaker(bind=engine)
+
+            for label in ("no", "yes"):
+                if label == "yes":
+                    with engine.begin() as conn:
+                        conn.execute(
+                            text(f"CREATE INDEX {INDEX_NAME} ON data (user_id, created_at)")
+                        )
+                        conn.execute(text("ANALYZE"))
+                result = run_queries(Session, args.users, args.repeat)
+                print(
+                    f"{size:>10} | {label:>5} | {result['latest_100_ms']:>15.2f} | "
+                    f"{result['last_day_100_ms']:>13.2f} | {result['plan']}"
+                )
+            engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,378 @@
+# bench/ingest_fleet.py
+"""
+가상 기기 N 대의 MQTT 적재 + HTTP 라우트 부하 벤치마크.
+
+    python -m bench.ingest_fleet --rows 100000 --devices 200 --messages 50
+    python -m bench.ingest_fleet --http-seconds 10 --concurrency 16 --output run.json
+    python -m bench.ingest_fleet --compare baseline.json
+    python -m bench.ingest_fleet --format binary --per-message 60 --messages 600
+
+1) 임시 SQLite DB 를 만들고 (DATABASE_URL) --rows 개로 미리 채운다
+2) 기기마다 페이로드(--format, 메시지당 --per-message 개)를 만들어 mqtt.on_message 를 직접 호출 (paho 네트워크 스레드 대신)
+   -> 전부 커밋될 때까지의 처리량, on_message 지연, 커밋 지연
+3) /measurement, /graph, /users/login 을 앱에 직접 (ASGI, 네트워크 없음) 동시 요청
+   -> 라우트별 처리량, p50 / p99 지연
+4) DB 행 수 / 파일 크기 증가량과 함께 결과를 JSON 으로 저장 (--compare 로 이전 결과와 비교)
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, List, Optional, Sequence
+
+
+def percentile(samples: Sequence[float], q: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, int(round(q / 100 * (len(ordered) - 1)))))
+    return ordered[index]
+
+
+def histogram_quantile(bounds: Sequence[float], cumulative: Sequence[float], q: float) -> float:
+    """metrics 히스토그램 (누적 구간 개수) 에서 q 분위가 들어있는 구간의 상한"""
+    total = cumulative[-1] if cumulative else 0
+    if not total:
+        return 0.0
+    target = total * q / 100
+    for bound, count in zip(list(bounds) + [float("inf")], cumulative):
+        if count >= target:
+            return bound
+    return float("inf")
+
+
+def latency_summary(samples: List[float], elapsed: float) -> Dict[str, float]:
+    return {
+        "count": len(samples),
+        "per_sec": len(samples) / elapsed if elapsed > 0 else 0.0,
+        "p50_ms": percentile(samples, 50) * 1000,
+        "p99_ms": percentile(samples, 99) * 1000,
+        "max_ms": max(samples) * 1000 if samples else 0.0,
+    }
+
+
+def db_size(path: str) -> int:
+    return sum(os.path.getsize(p) for p in (path, path + "-wal") if os.path.exists(p))
+
+
+def count_rows(engine) -> int:
+    from sqlalchemy import func, select
+    import models
+
+    with engine.connect() as conn:
+        return conn.execute(select(func.count()).select_from(models.Data)).scalar_one()
+
+
+# -----------------------------
+# 1) MQTT 적재
+# -----------------------------
+class FakeMessage:
+    __slots__ = ("topic", "payload")
+
+    def __init__(self, topic: str, payload: bytes) -> None:
+        self.topic = topic
+        self.payload = payload
+
+
+def make_payload(fmt: str, device: int, readings: List[tuple], base_ts: int) -> bytes:
+    """(offset 초, 온도, 습도, PM2.5) 목록 -> 기기가 보내는 페이로드 (payloads.py 형식)"""
+    from payloads import encode_binary
+
+    if fmt == "binary":
+        return encode_binary(readings, base_ts)
+    items = [
+        {"temperature": t, "humidity": h, "pm25": p, "ts": base_ts + offset}
+        for offset, t, h, p in readings
+    ]
+    if fmt == "msgpack":
+        import msgpack
+
+        return msgpack.packb({"device": f"dev-{device}", "readings": items})
+    if len(items) == 1:
+        # 기존 형식: 측정값 하나, 기기 시각 없음
+        offset, t, h, p = readings[0]
+        return json.dumps({"device": f"dev-{device}", "temperature": t, "humidity": h, "pm25": p}).encode("utf-8")
+    return json.dumps({"device": f"dev-{device}", "readings": items}).encode("utf-8")
+
+
+def run_ingest(args: argparse.Namespace) -> dict:
+    import mqtt
+    from metrics import db_commit_seconds
+
+    mqtt.start_ingest_workers()
+
+    # --messages = 기기당 측정값 수, 한 메시지에 --per-message 개씩 담아서 보냄
+    per_message = max(1, args.per_message)
+    publishes = -(-args.messages // per_message)
+    total = args.devices * publishes * per_message
+    latencies: List[float] = []
+    lock = threading.Lock()
+
+    def publisher(devices: List[int]) -> None:
+        rng = random.Random(devices[0] if devices else 0)
+        local: List[float] = []
+        round_started = time.perf_counter()
+        base_ts = int(time.time()) - publishes * per_message
+        for n in range(publishes):
+            for device in devices:
+                readings = [
+                    (i, round(rng.uniform(15, 35), 2), round(rng.uniform(20, 80), 2), round(rng.uniform(0, 100), 1))
+                    for i in range(per_message)
+                ]
+                payload = make_payload(args.format, device, readings, base_ts + n * per_message)
+                started = time.perf_counter()
+                mqtt.on_message(None, None, FakeMessage(mqtt.MQTT_TOPIC, payload))
+                local.append(time.perf_counter() - started)
+            if args.interval > 0:
+                # 기기 한 대가 interval 초마다 한 번씩 보내는 속도에 맞춤
+                round_started += args.interval
+                time.sleep(max(0.0, round_started - time.perf_counter()))
+        with lock:
+            latencies.extend(local)
+
+    # paho 는 네트워크 스레드 하나에서 on_message 를 부르므로 기본 publisher 는 1개
+    groups = [list(range(i, args.devices, args.publishers)) for i in range(args.publishers)]
+    threads = [threading.Thread(target=publisher, args=(g,)) for g in groups]
+
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    published = time.perf_counter() - started
+
+    # 전부 커밋(또는 버려짐)될 때까지 대기
+    deadline = time.monotonic() + args.drain_timeout
+    stats = mqtt.get_ingest_stats()
+    while mqtt.MQTT_INGEST_MODE == "batch" and time.monotonic() < deadline:
+        stats = mqtt.get_ingest_stats()
+        if stats.get("flushed", 0) + stats.get("dropped", 0) >= total:
+            break
+        time.sleep(0.01)
+    absorbed = time.perf_counter() - started
+
+    commit = db_commit_seconds.labels("mqtt_batch" if mqtt.MQTT_INGEST_MODE == "batch" else "mqtt_direct")
+    cumulative, commits, commit_total = commit.snapshot()
+    mqtt.stop_mqtt()
+
+    flushed = stats.get("flushed", total) if mqtt.MQTT_INGEST_MODE == "batch" else total
+    return {
+        "mode": mqtt.MQTT_INGEST_MODE,
+        "format": args.format,
+        "per_message": per_message,
+        "messages": total // per_message,
+        "readings": total,
+        "published_per_sec": total / published if published > 0 else 0.0,
+        "absorbed_per_sec": flushed / absorbed if absorbed > 0 else 0.0,
+        "flushed": flushed,
+        "dropped": stats.get("dropped", 0),
+        "on_message": latency_summary(latencies, published),
+        "commit": {
+            "count": commits,
+            "avg_ms": commit_total / commits * 1000 if commits else 0.0,
+            "p50_le_ms": histogram_quantile(db_commit_seconds.buckets, cumulative, 50) * 1000,
+            "p99_le_ms": histogram_quantile(db_commit_seconds.buckets, cumulative, 99) * 1000,
+        },
+    }
+
+
+# -----------------------------
+# 2) HTTP 라우트
+# -----------------------------
+async def load_route(
+    send: Callable[[random.Random], Awaitable[int]],
+    seconds: float,
+    concurrency: int,
+) -> dict:
+    latencies: List[float] = []
+    errors = 0
+    stop_at = time.perf_counter() + seconds
+
+    async def worker(seed_value: int) -> None:
+        nonlocal errors
+        rng = random.Random(seed_value)
+        while time.perf_counter() < stop_at:
+            started = time.perf_counter()
+            status_code = await send(rng)
+            latencies.append(time.perf_counter() - started)
+            if status_code >= 400:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(i) for i in range(concurrency)))
+    result = latency_summary(latencies, time.perf_counter() - started)
+    result["errors"] = errors
+    return result
+
+
+async def run_http(args: argparse.Namespace) -> dict:
+    import httpx
+    import main
+    from routes.user import create_access_token
+
+    headers = {"Authorization": "Bearer " + create_access_token({"sub": "1"})}
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+
+        async def post_measurement(rng: random.Random) -> int:
+            r = await client.post(
+                "/measurement",
+                json={
+                    "temperature": rng.uniform(15, 35),
+                    "humidity": rng.uniform(20, 80),
+                    "pm25": rng.uniform(0, 100),
+                },
+                headers=headers,
+            )
+            return r.status_code
+
+        async def get_graph(rng: random.Random) -> int:
+            start = (datetime.utcnow() - timedelta(hours=args.graph_hours)).isoformat()
+            r = await client.get(
+                "/graph", params={"start_date": start, "limit": 100}, headers=headers
+            )
+            return r.status_code
+
+        async def login(rng: random.Random) -> int:
+            r = await client.post(
+                "/users/login",
+                json={"useremail": "user1@example.com", "password": "password"},
+            )
+            return r.status_code
+
+        routes = {
+            "POST /measurement": post_measurement,
+            "GET /graph": get_graph,
+            "POST /users/login": login,
+        }
+        results = {}
+        for name, send in routes.items():
+            await send(random.Random(0))  # 첫 요청 (커넥션 / 프로세스 풀 준비) 은 제외
+            results[name] = await load_route(send, args.http_seconds, args.concurrency)
+        return results
+
+
+# -----------------------------
+# 실행 / 출력
+# -----------------------------
+def compare(current: dict, previous: dict) -> None:
+    print(f"\n{'metric':<40} {'previous':>12} {'current':>12} {'change':>8}")
+
+    def row(label: str, old: Optional[float], new: Optional[float]) -> None:
+        if old is None or new is None:
+            return
+        change = f"{(new - old) / old * 100:+.1f}%" if old else "-"
+        print(f"{label:<40} {old:>12.2f} {new:>12.2f} {change:>8}")
+
+    row("ingest absorbed/s", previous.get("ingest", {}).get("absorbed_per_sec"),
+        current["ingest"]["absorbed_per_sec"])
+    for route, result in current["http"].items():
+        old = previous.get("http", {}).get(route, {})
+        row(f"{route} req/s", old.get("per_sec"), result["per_sec"])
+        row(f"{route} p99 ms", old.get("p99_ms"), result["p99_ms"])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100_000, help="미리 채울 data 행 수")
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--days", type=int, default=30, help="미리 채운 데이터가 걸쳐 있는 기간")
+    parser.add_argument("--devices", type=int, default=100)
+    parser.add_argument("--messages", type=int, default=50, help="기기당 보낼 측정값 수")
+    parser.add_argument("--per-message", type=int, default=1, help="메시지 하나에 담을 측정값 수")
+    parser.add_argument("--format", choices=["json", "msgpack", "binary"], default="json", help="페이로드 형식")
+    parser.add_argument("--interval", type=float, default=0.0, help="기기당 전송 간격 (초, 0 이면 최대 속도)")
+    parser.add_argument("--publishers", type=int, default=1, help="on_message 를 부르는 스레드 수")
+    parser.add_argument("--mode", choices=["batch", "direct"], default="batch", help="MQTT_INGEST_MODE")
+    parser.add_argument("--drain-timeout", type=float, default=120.0)
+    parser.add_argument("--http-seconds", type=float, default=5.0, help="라우트별 부하 시간")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--graph-hours", type=float, default=24.0, help="/graph 조회 구간")
+    parser.add_argument("--profile", default=os.getenv("DB_PROFILE", "production"))
+    parser.add_argument("--output", default="ingest_fleet.json", help="결과 JSON 경로")
+    parser.add_argument("--compare", default=None, help="비교할 이전 결과 JSON")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "bench.db")
+        # database / mqtt 모듈이 import 시점에 환경변수를 읽으므로 먼저 설정
+        os.environ["DATABASE_URL"] = f"sqlite:///{db_path}"
+        os.environ["DB_PROFILE"] = args.profile
+        os.environ["MQTT_INGEST_MODE"] = args.mode
+
+        from sqlalchemy import update
+
+        import main as app_main  # noqa: F401  (테이블 생성 / 마이그레이션)
+        import models
+        from database import engine
+        from bench.graph_query import seed
+        from passwords import get_password_hash, shutdown_hash_executor
+        from recent_buffer import recent_readings
+
+        seed(engine, args.rows, args.users, days=args.days)
+        with engine.begin() as conn:
+            conn.execute(
+                update(models.User)
+                .where(models.User.User_ID == 1)
+                .values(userpassword=get_password_hash("password"))
+            )
+        recent_readings.warm_up()
+
+        rows_before, size_before = count_rows(engine), db_size(db_path)
+        print(f"seeded rows={rows_before} users={args.users} db={size_before / 1e6:.1f}MB")
+
+        ingest = run_ingest(args)
+        print(
+            f"ingest: {ingest['readings']} readings in {ingest['messages']} {args.format} msgs "
+            f"from {args.devices} devices, "
+            f"absorbed {ingest['absorbed_per_sec']:.0f}/s, dropped {ingest['dropped']}, "
+            f"on_message p50 {ingest['on_message']['p50_ms']:.3f}ms p99 {ingest['on_message']['p99_ms']:.3f}ms, "
+            f"commit avg {ingest['commit']['avg_ms']:.2f}ms"
+        )
+
+        http = asyncio.run(run_http(args))
+        print(f"\n{'route':<20} {'req/s':>9} {'p50 ms':>9} {'p99 ms':>9} {'errors':>7}")
+        for route, r in http.items():
+            print(f"{route:<20} {r['per_sec']:>9.1f} {r['p50_ms']:>9.2f} {r['p99_ms']:>9.2f} {r['errors']:>7}")
+
+        rows_after, size_after = count_rows(engine), db_size(db_path)
+        shutdown_hash_executor()
+        engine.dispose()
+
+    result = {
+        "started_at": datetime.utcnow().isoformat(),
+        "config": vars(args),
+        "cpu_count": os.cpu_count(),
+        "ingest": ingest,
+        "http": http,
+        "db": {
+            "rows_before": rows_before,
+            "rows_after": rows_after,
+            "bytes_before": size_before,
+            "bytes_after": size_after,
+            "bytes_per_row": (size_after - size_before) / max(1, rows_after - rows_before),
+        },
+        "recent_buffer": recent_readings.stats(),
+    }
+    print(
+        f"\ndb: +{rows_after - rows_before} rows, "
+        f"+{(size_after - size_before) / 1e6:.2f}MB ({result['db']['bytes_per_row']:.0f} B/row)"
+    )
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2, default=str)
+        print(f"saved {args.output}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            compare(result, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
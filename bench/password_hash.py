@@ -0,0 +1,69 @@
+# bench/password_hash.py
+"""
+로그인(비밀번호 검증) 처리량 벤치마크: 해시 프로세스 수별 logins/s.
+
+    python -m bench.password_hash --logins 200 --rounds 29000
+    python -m bench.password_hash --workers 1 2 4 8
+
+workers=0 은 프로세스 풀 없이 요청 스레드(스레드풀 4개)에서 계산하는 경우.
+"""
+import argparse
+import multiprocessing
+import os
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+
+from passlib.context import CryptContext
+
+
+def _context(rounds: int) -> CryptContext:
+    return CryptContext(schemes=["pbkdf2_sha256"], pbkdf2_sha256__default_rounds=rounds)
+
+
+def _verify(args) -> bool:
+    rounds, password, hashed = args
+    return _context(rounds).verify(password, hashed)
+
+
+def run(workers: int, logins: int, rounds: int, hashed: str) -> float:
+    executor: Executor
+    if workers > 0:
+        executor = ProcessPoolExecutor(
+            max_workers=workers, mp_context=multiprocessing.get_context("spawn")
+        )
+    else:
+        executor = ThreadPoolExecutor(max_workers=4)
+
+    with executor:
+        # 프로세스 기동 비용은 빼고 측정
+        list(executor.map(_verify, [(rounds, "password", hashed)] * max(1, workers)))
+
+        started = time.perf_counter()
+        results = list(executor.map(_verify, [(rounds, "password", hashed)] * logins))
+        elapsed = time.perf_counter() - started
+
+    assert all(results)
+    return logins / elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--rounds", type=int, default=int(os.getenv("PBKDF2_ROUNDS", "29000")))
+    parser.add_argument("--workers", type=int, nargs="+", default=None)
+    args = parser.parse_args()
+
+    cores = os.cpu_count() or 1
+    workers_list = args.workers or sorted({0, 1, 2, cores, cores * 2})
+    hashed = _context(args.rounds).hash("password")
+
+    print(f"cores={cores} rounds={args.rounds} logins={args.logins}")
+    print(f"{'workers':>8} {'logins/s':>10}")
+    for workers in workers_list:
+        rate = run(workers, args.logins, args.rounds, hashed)
+        label = "threads" if workers == 0 else str(workers)
+        print(f"{label:>8} {rate:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
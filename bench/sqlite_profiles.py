@@ -0,0 +1,123 @@
+# bench/sqlite_profiles.py
+"""
+SQLite 엔진 프로필별 읽기/쓰기 혼합 처리량 벤치마크 (basic vs production).
+
+    python -m bench.sqlite_profiles --rows 100000 --writers 4 --readers 8 --seconds 10
+"""
+import argparse
+import os
+import random
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+
+from database import Base, create_engines
+import models
+from routes.graph import build_graph_query
+from bench.graph_query import seed
+
+
+def run_profile(profile: str, args: argparse.Namespace) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        url = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+        write_engine, read_engine = create_engines(url, profile)
+        Base.metadata.create_all(bind=write_engine)
+        seed(write_engine, args.rows, args.users, days=30)
+
+        WriteSession = sessionmaker(bind=write_engine)
+        ReadSession = sessionmaker(bind=read_engine)
+
+        stop = threading.Event()
+        counts = {"writes": 0, "reads": 0, "errors": 0}
+        lock = threading.Lock()
+
+        def bump(key: str) -> None:
+            with lock:
+                counts[key] += 1
+
+        def writer(seed_value: int) -> None:
+            rng = random.Random(seed_value)
+            while not stop.is_set():
+                db = WriteSession()
+                try:
+                    # record_measurement 와 같은 한 행 INSERT + 커밋
+                    db.execute(
+                        insert(models.Data),
+                        [{
+                            "temperature": rng.uniform(15, 35),
+                            "humidity": rng.uniform(20, 80),
+                            "pm25": rng.uniform(0, 100),
+                            "air_quality": "normal",
+                            "created_at": datetime.utcnow(),
+                            "user_id": rng.randint(1, args.users),
+                        }],
+                    )
+                    db.commit()
+                    bump("writes")
+                except OperationalError:
+                    db.rollback()
+                    bump("errors")
+                finally:
+                    db.close()
+
+        def reader(seed_value: int) -> None:
+            rng = random.Random(seed_value)
+            while not stop.is_set():
+                db = ReadSession()
+                try:
+                    now = datetime.utcnow()
+                    build_graph_query(
+                        db, rng.randint(1, args.users), start_date=now - timedelta(days=1)
+                    ).limit(100).all()
+                    bump("reads")
+                except OperationalError:
+                    bump("errors")
+                finally:
+                    db.close()
+
+        threads = [threading.Thread(target=writer, args=(i,)) for i in range(args.writers)]
+        threads += [threading.Thread(target=reader, args=(100 + i,)) for i in range(args.readers)]
+        for t in threads:
+            t.start()
+        time.sleep(args.seconds)
+        stop.set()
+        for t in threads:
+            t.join()
+
+        write_engine.dispose()
+        read_engine.dispose()
+
+    return {
+        "profile": profile,
+        "writes_per_sec": counts["writes"] / args.seconds,
+        "reads_per_sec": counts["reads"] / args.seconds,
+        "errors": counts["errors"],
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--writers", type=int, default=4)
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--profiles", nargs="+", default=["basic", "production"])
+    args = parser.parse_args()
+
+    print(f"{'profile':>10} | {'writes/s':>9} | {'reads/s':>9} | {'errors':>6}")
+    for profile in args.profiles:
+        r = run_profile(profile, args)
+        print(
+            f"{r['profile']:>10} | {r['writes_per_sec']:>9.1f} | "
+            f"{r['reads_per_sec']:>9.1f} | {r['errors']:>6}"
+        )
+
+
+if __name__ == "__main__":
+    main()
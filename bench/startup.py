@@ -0,0 +1,132 @@
+# bench/startup.py
+"""
+서버 프로세스를 띄운 뒤 첫 요청(/ready 200)을 받을 때까지 걸리는 시간 vs data 테이블 크기.
+DB_SCHEMA_ON_STARTUP=migrate (import 때 마이그레이션) 와 check (카탈로그만 확인) 를 비교하고,
+MQTT 브로커는 닿지 않는 주소로 두어 브로커 상태가 시작 시간에 영향을 주지 않는지도 본다.
+
+    python -m bench.startup --sizes 10000 200000 1000000 --repeat 3
+"""
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Dict, List
+
+import httpx
+from sqlalchemy import create_engine
+
+from database import Base
+from bench.graph_query import seed
+
+MODES = ("migrate", "check")
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def time_to_first_request(env: Dict[str, str], timeout: float) -> Dict[str, float]:
+    """uvicorn 을 띄우고 /ready 가 200 을 줄 때까지의 시간 (프로세스 시작 기준)"""
+    port = free_port()
+    started = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--log-level", "warning"],
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        with httpx.Client(timeout=1.0) as client:
+            while time.perf_counter() - started < timeout:
+                if proc.poll() is not None:
+                    raise RuntimeError(f"server exited with code {proc.returncode}")
+                try:
+                    r = client.get(f"http://127.0.0.1:{port}/ready")
+                except httpx.TransportError:
+                    time.sleep(0.01)
+                    continue
+                if r.status_code == 200:
+                    body = r.json()
+                    return {
+                        "first_request_s": time.perf_counter() - started,
+                        # 서버가 잰 main import -> startup 완료
+                        "server_startup_s": body["startup_seconds"],
+                        "ingest_live": body["ingest"]["live"],
+                    }
+                time.sleep(0.01)
+        raise TimeoutError(f"/ready not 200 within {timeout}s")
+    finally:
+        proc.terminate()
+        try:
+            proc.wait(10)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 200_000])
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--broker", default="10.255.255.1", help="MQTT_BROKER (기본: 닿지 않는 주소)")
+    parser.add_argument("--output", default="startup.json", help="결과 JSON 경로")
+    args = parser.parse_args()
+
+    results: List[dict] = []
+    print(f"{'rows':>10} {'schema':>8} {'first req s':>12} {'server s':>10}")
+    for size in args.sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            url = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+            engine = create_engine(url)
+            Base.metadata.create_all(bind=engine)
+            seed(engine, size, args.users, days=args.days)
+            engine.dispose()
+
+            env = dict(
+                os.environ,
+                DATABASE_URL=url,
+                MQTT_BROKER=args.broker,
+                MQTT_COORDINATION="none",
+                PYTHONPATH=os.getcwd(),
+            )
+            # 배포 단계에서 한 번만 실행하는 마이그레이션 (롤업 백필 등)
+            subprocess.run([sys.executable, "manage.py", "migrate"], env=env, check=True,
+                           stdout=subprocess.DEVNULL)
+
+            for mode in MODES:
+                runs = [
+                    time_to_first_request(dict(env, DB_SCHEMA_ON_STARTUP=mode), args.timeout)
+                    for _ in range(args.repeat)
+                ]
+                result = {
+                    "rows": size,
+                    "schema": mode,
+                    "first_request_s": statistics.median(r["first_request_s"] for r in runs),
+                    "server_startup_s": statistics.median(r["server_startup_s"] for r in runs),
+                    "ingest_live": any(r["ingest_live"] for r in runs),
+                }
+                results.append(result)
+                print(f"{size:>10} {mode:>8} {result['first_request_s']:>12.3f} {result['server_startup_s']:>10.3f}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(
+                {"started_at": datetime.utcnow().isoformat(), "config": vars(args), "results": results},
+                f, indent=2,
+            )
+        print(f"saved {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+# columnar.py
+import json
+import struct
+import sys
+from array import array
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from fastapi.responses import Response
+
+import models
+from aggregation import METRICS, to_epoch
+
+# 응답 형식
+# - json: 기존 GraphResponse (행마다 dict)
+# - columnar: 컬럼별 배열을 담은 compact JSON
+# - binary: 컬럼별 packed buffer (아래 encode_binary 참고)
+COLUMNAR_JSON_MEDIA_TYPE = "application/vnd.airzy.columnar+json"
+COLUMNAR_BINARY_MEDIA_TYPE = "application/vnd.airzy.columnar"
+
+# air_quality 문자열 -> int8 코드 (없으면 -1)
+AIR_QUALITY_CODES: Dict[str, int] = {"good": 0, "normal": 1, "bad": 2}
+AIR_QUALITY_LABELS: List[str] = ["good", "normal", "bad"]
+
+BINARY_MAGIC = b"AZC1"
+
+# array typecode -> 헤더에 적는 dtype 이름
+_DTYPES = {"q": "int64", "f": "float32", "b": "int8"}
+
+# ORM 객체 대신 이 컬럼들만 튜플로 조회
+POINT_COLUMNS = (
+    models.Data.id,
+    models.Data.created_at,
+    models.Data.temperature,
+    models.Data.humidity,
+    models.Data.pm25,
+    models.Data.air_quality,
+)
+
+Column = Tuple[str, str, array]
+
+
+def negotiate_format(format: Optional[str], accept: Optional[str]) -> str:
+    """format 파라미터가 우선, 없으면 Accept 헤더로 결정"""
+    if format:
+        return format
+    accept = (accept or "").lower()
+    if COLUMNAR_JSON_MEDIA_TYPE in accept:
+        return "columnar"
+    if COLUMNAR_BINARY_MEDIA_TYPE in accept or "application/octet-stream" in accept:
+        return "binary"
+    return "json"
+
+
+def to_epoch_ms(dt: datetime) -> int:
+    return to_epoch(dt) * 1000 + dt.microsecond // 1000
+
+
+def _float_or_nan(value) -> float:
+    return float("nan") if value is None else float(value)
+
+
+def point_columns(rows: Sequence[Sequence]) -> List[Column]:
+    """POINT_COLUMNS 로 조회한 행 튜플들 -> 컬럼 배열"""
+    ids = array("q")
+    timestamps = array("q")
+    temperature = array("f")
+    humidity = array("f")
+    pm25 = array("f")
+    air_quality = array("b")
+
+    for row_id, created_at, temp, humi, pm, aq in rows:
+        ids.append(row_id)
+        timestamps.append(to_epoch_ms(created_at))
+        temperature.append(_float_or_nan(temp))
+        humidity.append(_float_or_nan(humi))
+        pm25.append(_float_or_nan(pm))
+        air_quality.append(AIR_QUALITY_CODES.get(aq, -1))
+
+    return [
+        ("id", "q", ids),
+        ("timestamp", "q", timestamps),
+        ("temperature", "f", temperature),
+        ("humidity", "f", humidity),
+        ("pm25", "f", pm25),
+        ("air_quality", "b", air_quality),
+    ]
+
+
+def bucket_columns(buckets: Sequence[dict]) -> List[Column]:
+    """aggregate_raw / aggregate_rollups 결과 -> 컬럼 배열"""
+    columns: List[Column] = [
+        ("timestamp", "q", array("q", (to_epoch_ms(b["bucket_start"]) for b in buckets))),
+        ("count", "q", array("q", (b["count"] for b in buckets))),
+    ]
+    for metric in METRICS:
+        for stat in ("min", "avg", "max"):
+            key = f"{metric}_{stat}"
+            columns.append(
+                (key, "f", array("f", (_float_or_nan(b[key]) for b in buckets)))
+            )
+    columns.append(
+        (
+            "air_quality",
+            "b",
+            array("b", (AIR_QUALITY_CODES.get(b["air_quality"], -1) for b in buckets)),
+        )
+    )
+    return columns
+
+
+def encode_json(columns: List[Column], meta: dict) -> bytes:
+    body = dict(meta)
+    body["air_quality_labels"] = AIR_QUALITY_LABELS
+    for name, typecode, values in columns:
+        if typecode == "f":
+            # JSON 에는 NaN 이 없으므로 null 로
+            body[name] = [None if v != v else round(v, 4) for v in values]
+        else:
+            body[name] = values.tolist()
+    return json.dumps(body, separators=(",", ":")).encode("utf-8")
+
+
+def encode_binary(columns: List[Column], meta: dict) -> bytes:
+    """
+    레이아웃 (모두 little-endian):
+      magic "AZC1" | uint32 header_len | header(JSON, utf-8) | 패딩 | 컬럼 buffer ...
+    header 의 columns[i] = {name, dtype, offset, length}, offset 은 파일 처음부터의 바이트 위치.
+    각 buffer 는 8바이트 경계에 맞춰져 있어서 numpy.frombuffer 등으로 바로 읽을 수 있다.
+    """
+    buffers: List[bytes] = []
+    for _, _, values in columns:
+        if sys.byteorder != "little":
+            values = array(values.typecode, values)
+            values.byteswap()
+        buffers.append(values.tobytes())
+
+    def build_header(data_start: int) -> bytes:
+        specs = []
+        offset = data_start
+        for (name, typecode, values), buf in zip(columns, buffers):
+            specs.append(
+                {"name": name, "dtype": _DTYPES[typecode], "offset": offset, "length": len(values)}
+            )
+            offset += _pad8(len(buf))
+        header = dict(meta)
+        header["air_quality_labels"] = AIR_QUALITY_LABELS
+        header["columns"] = specs
+        return json.dumps(header, separators=(",", ":")).encode("utf-8")
+
+    # header 길이에 따라 data 시작 위치가 바뀌므로 크기가 안정될 때까지 다시 계산
+    data_start = 0
+    header = build_header(data_start)
+    while _pad8(8 + len(header)) != data_start:
+        data_start = _pad8(8 + len(header))
+        header = build_header(data_start)
+
+    out = bytearray(BINARY_MAGIC)
+    out += struct.pack("<I", len(header))
+    out += header
+    out += b"\0" * (data_start - len(out))
+    for buf in buffers:
+        out += buf
+        out += b"\0" * (_pad8(len(buf)) - len(buf))
+    return bytes(out)
+
+
+def _pad8(n: int) -> int:
+    return (n + 7) & ~7
+
+
+def columnar_response(columns: List[Column], meta: dict, fmt: str) -> Response:
+    if fmt == "binary":
+        return Response(encode_binary(columns, meta), media_type=COLUMNAR_BINARY_MEDIA_TYPE)
+    return Response(encode_json(columns, meta), media_type=COLUMNAR_JSON_MEDIA_TYPE)
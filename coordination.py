@@ -0,0 +1,264 @@
+# coordination.py
+"""
+여러 서버 워커(gunicorn -w N)가 떠 있어도 MQTT 측정값을 한 번만 저장/알림하도록 조율.
+
+MQTT_COORDINATION:
+- "lock"   (기본): 같은 호스트의 워커들이 잠금 파일을 두고 경쟁, 잡은 워커 하나(리더)만 MQTT 구독.
+                   그 워커가 죽으면 OS 가 잠금을 풀고 다른 워커가 MQTT_LEADER_RETRY_SECONDS 안에 넘겨받음
+- "shared":        모든 워커가 MQTT 공유 구독($share/그룹/토픽)으로 붙고 브로커가 메시지를 나눠 줌 (공유 구독을 지원하는 브로커 필요).
+                   프로세스 하나만 해야 하는 일(알림 평가 / 메일, 보관 정책)은 같은 잠금을 잡은 리더가 맡음
+- "off":           이 프로세스는 MQTT 를 받지 않음 (python manage.py ingest 로 전용 적재 프로세스를 따로 띄울 때 HTTP 워커용)
+- "none":          조율 없이 바로 구독 (기존 동작, 워커 하나일 때)
+"""
+import os
+import tempfile
+import threading
+from dataclasses import dataclass
+from typing import Callable, List, Optional, Sequence
+
+from mqtt import (
+    MQTT_COORDINATION,
+    get_mqtt_status,
+    start_leader_alerts,
+    start_mqtt,
+    stop_leader_alerts,
+    stop_mqtt,
+)
+from recent_buffer import recent_readings
+from relay import row_relay
+from retention import retention_worker
+
+MQTT_LEADER_LOCK_FILE: str = os.getenv(
+    "MQTT_LEADER_LOCK_FILE",
+    os.path.join(tempfile.gettempdir(), "airzy-mqtt-ingest.lock"),
+)
+# 잠금을 못 잡은 워커가 다시 시도하는 주기 (초) = 적재 워커가 죽었을 때 최대 공백
+MQTT_LEADER_RETRY_SECONDS: float = float(os.getenv("MQTT_LEADER_RETRY_SECONDS", "2.0"))
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+class FileLock:
+    """프로세스 간 배타 잠금 (non-blocking). 프로세스가 죽으면 OS 가 자동으로 풀어줌"""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._fd: Optional[int] = None
+
+    @property
+    def held(self) -> bool:
+        return self._fd is not None
+
+    def try_acquire(self) -> bool:
+        if self._fd is not None:
+            return True
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            if fcntl is not None:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            else:
+                msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+        except OSError:
+            os.close(fd)
+            return False
+        # 누가 잡고 있는지 확인용 (잠금 자체와는 무관)
+        os.ftruncate(fd, 0)
+        os.write(fd, str(os.getpid()).encode())
+        self._fd = fd
+        return True
+
+    def release(self) -> None:
+        if self._fd is None:
+            return
+        try:
+            if fcntl is not None:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+            else:
+                os.lseek(self._fd, 0, os.SEEK_SET)
+                msvcrt.locking(self._fd, msvcrt.LK_UNLCK, 1)
+        finally:
+            os.close(self._fd)
+            self._fd = None
+
+
+@dataclass
+class LeaderDuty:
+    """리더 프로세스 하나만 맡는 일. 잠금을 잡으면 start, 놓을 때 stop"""
+
+    name: str
+    start: Callable[[], None]
+    stop: Callable[[], None]
+
+
+def leader_duties(mode: str = MQTT_COORDINATION) -> List[LeaderDuty]:
+    duties: List[LeaderDuty] = []
+    if mode == "lock":
+        duties.append(LeaderDuty("mqtt", start_mqtt, stop_mqtt))
+    elif mode == "shared":
+        # 모든 워커가 저장하지만 알림은 리더만 (다른 워커가 저장한 행은 row_relay 로 읽어서 평가)
+        duties.append(LeaderDuty("alerts", start_leader_alerts, stop_leader_alerts))
+    # RETENTION_INTERVAL_HOURS 가 설정된 경우에만 주기 실행 (여러 워커가 같은 행을 지우지 않도록 리더만)
+    duties.append(LeaderDuty("retention", retention_worker.start, retention_worker.stop))
+    return duties
+
+
+class IngestLeader:
+    """
+    잠금을 잡은 프로세스만 duties (MQTT 구독, 보관 정책 등)를 시작한다.
+    못 잡은 프로세스는 retry 주기마다 다시 시도하다가, 리더가 죽어 잠금이 풀리면 넘겨받는다.
+    """
+
+    def __init__(
+        self,
+        lock_path: str = MQTT_LEADER_LOCK_FILE,
+        retry_seconds: float = MQTT_LEADER_RETRY_SECONDS,
+    ) -> None:
+        self.lock = FileLock(lock_path)
+        self.retry_seconds = retry_seconds
+        self.duties: List[LeaderDuty] = []
+        self._started: List[LeaderDuty] = []
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def is_leader(self) -> bool:
+        return self.lock.held
+
+    def _try_lead(self) -> bool:
+        try:
+            acquired = self.lock.try_acquire()
+        except OSError as e:
+            print("[INGEST] Lock file error:", e)
+            return False
+        if acquired:
+            names = ", ".join(duty.name for duty in self.duties) or "nothing"
+            print(f"[INGEST] Leader lock acquired (pid={os.getpid()}), starting {names}")
+            try:
+                for duty in self.duties:
+                    self._started.append(duty)
+                    duty.start()
+            except Exception as e:
+                # 시작 실패: 시작한 것들을 멈추고 잠금을 놓아 다른 워커(또는 다음 시도)에 넘김
+                print("[INGEST] Failed to start leader duties:", e)
+                self._stop_duties()
+                self.lock.release()
+                return False
+        return acquired
+
+    def _stop_duties(self) -> None:
+        while self._started:
+            duty = self._started.pop()
+            try:
+                duty.stop()
+            except Exception as e:
+                print(f"[INGEST] Failed to stop {duty.name}:", e)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.retry_seconds):
+            if self._try_lead():
+                return
+
+    def start(self, duties: Sequence[LeaderDuty] = ()) -> None:
+        if self._thread is not None or self.is_leader:
+            return
+        self.duties = list(duties)
+        self._stop.clear()
+        if self._try_lead():
+            return
+        print(f"[INGEST] Another process holds {self.lock.path}; standing by")
+        self._thread = threading.Thread(target=self._run, name="ingest-leader", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(self.retry_seconds + 1)
+            self._thread = None
+        if self.is_leader:
+            # 큐에 남은 측정값을 다 저장한 뒤 잠금을 놓음
+            self._stop_duties()
+            self.lock.release()
+            print("[INGEST] Leader lock released")
+
+    def stats(self) -> dict:
+        return {
+            "lock_file": self.lock.path,
+            "leader": self.is_leader,
+            "duties": [duty.name for duty in self.duties],
+        }
+
+
+ingest_leader = IngestLeader()
+
+
+def start_ingest(mode: str = MQTT_COORDINATION) -> None:
+    """서버 시작 시 호출: mode 에 따라 MQTT 구독 시작 + 다른 프로세스가 저장한 행 전달 시작"""
+    # 워커가 하나뿐인 경우("none")가 아니면 다른 프로세스가 저장한 행도 대시보드/버퍼에 전달
+    # (MQTT 보다 먼저 시작해야 이 프로세스가 저장한 행을 poll 에서 다시 보내지 않음)
+    if mode != "none":
+        row_relay.start()
+
+    # 최근값 버퍼는 relay 가 시작 위치(max id)를 기록한 뒤에 DB 에서 채운다
+    # -> 그 사이 다른 워커가 저장한 행은 warm_up 이 읽거나 relay 가 전달하므로 빠지는 행이 없음
+    if mode != "none" and not row_relay.running:
+        # 다른 프로세스가 저장한 행을 받을 방법이 없으면 버퍼를 쓰지 않고 항상 DB 에서 조회
+        print("[BUFFER] Row relay is off, recent-readings buffer disabled")
+    else:
+        recent_readings.start_warm_up()
+
+    if mode in ("lock", "shared"):
+        if mode == "shared":
+            start_mqtt()
+        ingest_leader.start(leader_duties(mode))
+    elif mode == "none":
+        start_mqtt()
+        retention_worker.start()
+    elif mode == "off":
+        print("[INGEST] MQTT ingest disabled in this process (MQTT_COORDINATION=off)")
+    else:
+        raise ValueError(f"Unknown MQTT_COORDINATION: {mode}")
+
+
+def stop_ingest(mode: str = MQTT_COORDINATION) -> None:
+    row_relay.stop()
+    if mode == "shared":
+        # 큐에 남은 측정값을 저장하고 알림까지 보낸 뒤 리더 역할을 놓음
+        stop_mqtt()
+    if mode in ("lock", "shared"):
+        ingest_leader.stop()
+    else:
+        retention_worker.stop()
+        stop_mqtt()
+
+
+def get_coordination_stats(mode: str = MQTT_COORDINATION) -> dict:
+    stats = {"mode": mode, "pid": os.getpid(), "relay": row_relay.stats()}
+    if mode in ("lock", "shared"):
+        stats.update(ingest_leader.stats())
+    return stats
+
+
+def get_ingest_status(mode: str = MQTT_COORDINATION) -> dict:
+    """
+    이 프로세스의 적재 역할과 브로커 연결 상태 (/ready).
+    role: "leader" / "standby" (lock), "consumer" (shared / none), "off"
+    leader: 이 프로세스가 리더 잠금을 잡고 있음 (lock / shared)
+    live: 이 프로세스가 MQTT 를 받는 역할이고 브로커에 연결되어 있음
+    """
+    if mode == "lock":
+        role = "leader" if ingest_leader.is_leader else "standby"
+    elif mode == "off":
+        role = "off"
+    else:
+        role = "consumer"
+    mqtt_status = get_mqtt_status()
+    return {
+        "role": role,
+        "leader": ingest_leader.is_leader,
+        "live": role in ("leader", "consumer") and mqtt_status["live"],
+        "mqtt": mqtt_status["state"],
+    }
@@ -19,20 +19,197 @@
 #         yield db 
 #     finally:
 #         db.close()
-from sqlalchemy import create_engine
+import asyncio
+import os
+import threading
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Tuple
+
+from sqlalchemy import create_engine, event, exc
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, Session
 
 # SQLite 파일 DB 사용 (프로젝트 폴더에 science_project.db 파일이 생깁니다)
-SQLALCHEMY_DATABASE_URL = "sqlite:///./science_project.db"
+SQLALCHEMY_DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./science_project.db")
+
+# 엔진 설정 프로필
+# - "production": WAL + pragma 튜닝, 쓰기 전용 커넥션 1개 + 읽기 전용 풀 분리
+# - "basic": 예전 설정 그대로 (check_same_thread=False 만)
+DB_PROFILE = os.getenv("DB_PROFILE", "production")
+
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+SQLITE_CACHE_SIZE_KB = int(os.getenv("SQLITE_CACHE_SIZE_KB", "65536"))
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+DB_READ_POOL_SIZE = int(os.getenv("DB_READ_POOL_SIZE", "8"))
+DB_READ_MAX_OVERFLOW = int(os.getenv("DB_READ_MAX_OVERFLOW", "4"))
+DB_WRITE_POOL_TIMEOUT = float(os.getenv("DB_WRITE_POOL_TIMEOUT", "30"))
+
+# 라우트(async def)에서 쓰는 비동기 드라이버 URL. 없으면 DATABASE_URL 에서 드라이버만 바꿔서 사용
+# - sqlite:///...                  -> sqlite+aiosqlite:///...
+# - mysql+mysqlconnector://...     -> mysql+aiomysql://...
+_ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "mysql": "mysql+aiomysql",
+    "mysql+mysqlconnector": "mysql+aiomysql",
+    "mysql+pymysql": "mysql+aiomysql",
+}
+
+
+def to_async_url(url: str) -> str:
+    """동기 드라이버 URL -> 같은 DB 를 가리키는 비동기 드라이버 URL"""
+    scheme, sep, rest = url.partition("://")
+    return _ASYNC_DRIVERS.get(scheme, scheme) + sep + rest
+
+
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL", to_async_url(SQLALCHEMY_DATABASE_URL))
+
+
+def _apply_sqlite_pragmas(engine: Engine, read_only: bool) -> None:
+    """커넥션이 새로 열릴 때마다 pragma 적용 (AsyncEngine 은 .sync_engine 을 넘긴다)"""
+
+    @event.listens_for(engine, "connect")
+    def _on_connect(dbapi_conn, _record):
+        cursor = dbapi_conn.cursor()
+        try:
+            if not read_only:
+                # 새 DB 파일이면 지운 행의 빈 페이지를 retention 작업에서 조금씩 돌려줄 수 있게
+                # (이미 테이블이 있는 DB 는 python manage.py retention --enable-incremental-vacuum)
+                cursor.execute("PRAGMA auto_vacuum=INCREMENTAL")
+                # WAL: 쓰기 중에도 읽기가 막히지 않음 (DB 파일에 영구 저장되는 설정)
+                cursor.execute("PRAGMA journal_mode=WAL")
+            # WAL 에서는 NORMAL 로도 커밋 후 DB 손상 없음 (전원 장애 시 마지막 커밋만 유실 가능)
+            cursor.execute("PRAGMA synchronous=NORMAL")
+            cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+            cursor.execute(f"PRAGMA cache_size=-{SQLITE_CACHE_SIZE_KB}")
+            cursor.execute(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}")
+            cursor.execute("PRAGMA temp_store=MEMORY")
+            if read_only:
+                cursor.execute("PRAGMA query_only=ON")
+        finally:
+            cursor.close()
+
+
+# 이 프로세스의 SQLite 쓰기(동기 쓰기 엔진 + 비동기 쓰기 세션)가 함께 쓰는 잠금 -> 쓰기는 한 번에 하나만
+# (busy_timeout 으로 파일 잠금을 두고 경합하지 않고 순서대로 대기)
+# 재진입이 안 되므로 쓰기 세션을 연 채로 다른 쓰기 세션을 열면 안 된다 (먼저 닫고 열 것)
+_sqlite_writer_lock = threading.Lock()
+
+
+async def _acquire_async(lock: threading.Lock, timeout: float) -> None:
+    """이벤트 루프를 막지 않고 잠금을 기다림 (짧게 쉬면서 다시 시도, 취소되면 잡지 않은 채로 끝남)"""
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    delay = 0.001
+    while not lock.acquire(blocking=False):
+        if loop.time() >= deadline:
+            raise exc.TimeoutError(f"SQLite writer lock not available within {timeout}s")
+        await asyncio.sleep(delay)
+        delay = min(delay * 2, 0.05)
+
+
+def _share_writer_lock(engine: Engine, lock: threading.Lock) -> None:
+    """동기 engine 의 커넥션을 쓰는 동안 lock 을 잡고 있게 한다"""
+
+    @event.listens_for(engine, "checkout")
+    def _on_checkout(dbapi_conn, record, proxy):
+        if not lock.acquire(timeout=DB_WRITE_POOL_TIMEOUT):
+            raise exc.TimeoutError(f"SQLite writer lock not available within {DB_WRITE_POOL_TIMEOUT}s")
+        record.info["writer_lock"] = True
+
+    @event.listens_for(engine, "checkin")
+    def _on_checkin(dbapi_conn, record):
+        if record.info.pop("writer_lock", False):
+            lock.release()
+
+
+@asynccontextmanager
+async def sqlite_writer_slot() -> AsyncIterator[None]:
+    """
+    비동기 쪽에서 쓰기 잠금을 잡는 구간. 비동기 엔진의 checkout 은 await 할 수 없으므로
+    커넥션 대신 세션 단위로 잡는다 (async_writer_session)
+    """
+    await _acquire_async(_sqlite_writer_lock, DB_WRITE_POOL_TIMEOUT)
+    try:
+        yield
+    finally:
+        _sqlite_writer_lock.release()
 
-# SQLite는 check_same_thread 옵션 필요
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL,
-    connect_args={"check_same_thread": False},
-)
+
+def create_engines(url: str, profile: str = DB_PROFILE) -> Tuple[Engine, Engine]:
+    """(쓰기 엔진, 읽기 엔진) 생성. 분리하지 않는 경우 둘은 같은 엔진."""
+    if not url.startswith("sqlite"):
+        # MySQL 등은 서버가 동시성을 처리하므로 엔진 하나로 충분
+        engine = create_engine(url, pool_pre_ping=True)
+        return engine, engine
+
+    if profile == "basic":
+        # SQLite는 check_same_thread 옵션 필요
+        engine = create_engine(url, connect_args={"check_same_thread": False})
+        return engine, engine
+
+    # 쓰기는 커넥션 1개로 직렬화 -> "database is locked" 경합 대신 풀에서 순서대로 대기
+    write_engine = create_engine(
+        url,
+        connect_args={"check_same_thread": False},
+        pool_size=1,
+        max_overflow=0,
+        pool_timeout=DB_WRITE_POOL_TIMEOUT,
+    )
+    _apply_sqlite_pragmas(write_engine, read_only=False)
+    _share_writer_lock(write_engine, _sqlite_writer_lock)
+
+    # 읽기는 WAL 스냅샷으로 쓰기와 동시에 진행
+    read_engine = create_engine(
+        url,
+        connect_args={"check_same_thread": False},
+        pool_size=DB_READ_POOL_SIZE,
+        max_overflow=DB_READ_MAX_OVERFLOW,
+    )
+    _apply_sqlite_pragmas(read_engine, read_only=True)
+    return write_engine, read_engine
+
+
+def create_async_engines(url: str, profile: str = DB_PROFILE) -> Tuple[AsyncEngine, AsyncEngine]:
+    """create_engines 의 비동기 버전 (같은 프로필 / pragma 적용)"""
+    if not url.startswith("sqlite"):
+        engine = create_async_engine(url, pool_pre_ping=True)
+        return engine, engine
+
+    if profile == "basic":
+        engine = create_async_engine(url)
+        return engine, engine
+
+    # 동기 쓰기 엔진(MQTT 배치 저장 등)과의 직렬화는 async_writer_session 의 잠금으로
+    write_engine = create_async_engine(
+        url,
+        pool_size=1,
+        max_overflow=0,
+        pool_timeout=DB_WRITE_POOL_TIMEOUT,
+    )
+    _apply_sqlite_pragmas(write_engine.sync_engine, read_only=False)
+
+    read_engine = create_async_engine(
+        url,
+        pool_size=DB_READ_POOL_SIZE,
+        max_overflow=DB_READ_MAX_OVERFLOW,
+    )
+    _apply_sqlite_pragmas(read_engine.sync_engine, read_only=True)
+    return write_engine, read_engine
+
+
+engine, read_engine = create_engines(SQLALCHEMY_DATABASE_URL)
+async_engine, async_read_engine = create_async_engines(ASYNC_DATABASE_URL)
+# 비동기 쓰기 세션도 _sqlite_writer_lock 을 잡아야 하는지 (쓰기 엔진을 분리하는 SQLite 프로필)
+ASYNC_WRITER_LOCKED = ASYNC_DATABASE_URL.startswith("sqlite") and DB_PROFILE != "basic"
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine)
+
+# 커밋 후에도 응답 직렬화에서 속성을 읽을 수 있도록 expire_on_commit=False
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+AsyncReadSessionLocal = async_sessionmaker(async_read_engine, autoflush=False, expire_on_commit=False)
 
 Base = declarative_base()
 
@@ -42,3 +219,40 @@ def get_db() -> Session:
         yield db
     finally:
         db.close()
+
+def get_read_db() -> Session:
+    """조회만 하는 라우트용 (읽기 전용 풀)"""
+    db = ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+@asynccontextmanager
+async def async_writer_session() -> AsyncIterator[AsyncSession]:
+    """
+    비동기 쓰기 세션. 필요하면 세션이 닫힐 때까지 쓰기 잠금을 잡는다 (기다리는 동안 이벤트 루프는 막지 않음).
+    해시 계산처럼 오래 걸리는 작업은 이 세션 밖에서 할 것
+    """
+    if not ASYNC_WRITER_LOCKED:
+        async with AsyncSessionLocal() as db:
+            yield db
+        return
+    async with sqlite_writer_slot():
+        async with AsyncSessionLocal() as db:
+            yield db
+
+async def get_async_db() -> AsyncSession:
+    """async 라우트용 세션 (스레드풀 대신 이벤트 루프에서 DB I/O 대기)"""
+    async with async_writer_session() as db:
+        yield db
+
+async def get_async_read_db() -> AsyncSession:
+    """async 라우트 중 조회만 하는 곳용 (읽기 전용 풀)"""
+    async with AsyncReadSessionLocal() as db:
+        yield db
+
+async def dispose_async_engines() -> None:
+    await async_engine.dispose()
+    if async_read_engine is not async_engine:
+        await async_read_engine.dispose()
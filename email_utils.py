@@ -1,37 +1,302 @@
 # email_utils.py
 import os
 import smtplib
+import threading
+import time
 from email.message import EmailMessage
+from typing import Dict, Iterable, List, Optional, Tuple
 
-SMTP_HOST = "smtp.gmail.com"
-SMTP_PORT = 587
+from metrics import emails, smtp_send_seconds
+
+SMTP_HOST = os.getenv("SMTP_HOST", "smtp.gmail.com")
+SMTP_PORT = int(os.getenv("SMTP_PORT", "587"))
 
 # ⚠️ 여기는 진짜 계정/비밀번호를 코드에 직접 쓰지 말고
 # 환경변수로 빼두는 게 좋습니다.
 SMTP_USER = os.getenv("SMTP_USER")  # 보내는 메일 주소
 SMTP_PASS = os.getenv("SMTP_PASS")  # 앱 비밀번호 등
 
+# 로컬 테스트용 SMTP 서버(aiosmtpd 등)는 STARTTLS/로그인 없이 쓸 수 있도록 끌 수 있게 함
+SMTP_STARTTLS = os.getenv("SMTP_STARTTLS", "1") == "1"
+SMTP_AUTH = os.getenv("SMTP_AUTH", "1") == "1"
+
+# 연결 풀 설정
+SMTP_POOL_SIZE = int(os.getenv("SMTP_POOL_SIZE", "2"))
+SMTP_TIMEOUT_SECONDS = float(os.getenv("SMTP_TIMEOUT_SECONDS", "10"))
+SMTP_IDLE_CHECK_SECONDS = float(os.getenv("SMTP_IDLE_CHECK_SECONDS", "30"))
+SMTP_MAX_RETRIES = int(os.getenv("SMTP_MAX_RETRIES", "3"))
+SMTP_BACKOFF_BASE_SECONDS = float(os.getenv("SMTP_BACKOFF_BASE_SECONDS", "0.5"))
+SMTP_BACKOFF_MAX_SECONDS = float(os.getenv("SMTP_BACKOFF_MAX_SECONDS", "30"))
+
 
-def send_alert_email(to_email: str, subject: str, body: str):
+class SMTPPool:
     """
-    간단한 텍스트 메일 보내기.
-    SMTP_USER / SMTP_PASS 가 설정돼 있지 않으면 그냥 로그만 찍고 넘어감.
+    로그인까지 끝난 SMTP 연결을 최대 size 개까지 유지하면서 재사용한다.
+
+    - 메일마다 TCP 연결 + STARTTLS + 로그인을 반복하지 않음
+    - 오래 쉬던 연결은 NOOP 로 살아있는지 확인 후 사용
+    - 연결이 끊기거나 실패하면 지수 백오프로 다시 연결해서 재시도
+    - send_many() 는 메일 여러 개를 한 세션으로 보냄
     """
-    if not (SMTP_USER and SMTP_PASS):
-        print("[EMAIL] SMTP 계정이 설정되어 있지 않습니다. 메일을 보내지 않습니다.")
-        return
 
+    def __init__(
+        self,
+        host: str = SMTP_HOST,
+        port: int = SMTP_PORT,
+        user: Optional[str] = SMTP_USER,
+        password: Optional[str] = SMTP_PASS,
+        starttls: bool = SMTP_STARTTLS,
+        auth: bool = SMTP_AUTH,
+        size: int = SMTP_POOL_SIZE,
+        timeout: float = SMTP_TIMEOUT_SECONDS,
+        max_retries: int = SMTP_MAX_RETRIES,
+    ) -> None:
+        self.host = host
+        self.port = port
+        self.user = user
+        self.password = password
+        self.starttls = starttls
+        self.auth = auth
+        self.size = max(1, size)
+        self.timeout = timeout
+        self.max_retries = max(1, max_retries)
+
+        # 동시에 열 수 있는 연결 수 제한
+        self._slots = threading.BoundedSemaphore(self.size)
+        self._lock = threading.Lock()
+        self._idle: List[Tuple[smtplib.SMTP, float]] = []
+
+        self._stats: Dict[str, float] = {
+            "sent": 0,
+            "failed": 0,
+            "connects": 0,
+            "connection_errors": 0,
+            "latency_count": 0,
+            "latency_total_seconds": 0.0,
+            "latency_max_seconds": 0.0,
+            "latency_last_seconds": 0.0,
+        }
+
+    # -----------------------------
+    # 연결 관리
+    # -----------------------------
+    def _connect(self) -> smtplib.SMTP:
+        server = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        try:
+            if self.starttls:
+                server.starttls()
+            if self.auth:
+                server.login(self.user, self.password)
+        except Exception:
+            _close_quietly(server)
+            raise
+        with self._lock:
+            self._stats["connects"] += 1
+        return server
+
+    def _acquire(self) -> smtplib.SMTP:
+        """풀에서 연결 하나를 꺼낸다. 없으면 새로 연결. (_slots 를 잡은 상태에서 호출)"""
+        while True:
+            with self._lock:
+                if not self._idle:
+                    break
+                server, last_used = self._idle.pop()
+
+            if time.monotonic() - last_used < SMTP_IDLE_CHECK_SECONDS:
+                return server
+            try:
+                # 오래 쉬던 연결은 서버 쪽에서 끊었을 수 있으니 확인
+                if server.noop()[0] == 250:
+                    return server
+            except smtplib.SMTPException:
+                pass
+            except OSError:
+                pass
+            _close_quietly(server)
+
+        return self._connect()
+
+    def _release(self, server: smtplib.SMTP) -> None:
+        with self._lock:
+            self._idle.append((server, time.monotonic()))
+
+    @staticmethod
+    def _backoff(failures: int) -> None:
+        """이 연결에서 연속으로 실패한 횟수만큼 지수 백오프 (첫 연결 / 정상 연결은 기다리지 않음)"""
+        if failures <= 0:
+            return
+        delay = min(
+            SMTP_BACKOFF_MAX_SECONDS,
+            SMTP_BACKOFF_BASE_SECONDS * (2 ** (failures - 1)),
+        )
+        time.sleep(delay)
+
+    def _connection_error(self) -> None:
+        with self._lock:
+            self._stats["connection_errors"] += 1
+
+    def close(self) -> None:
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for server, _ in idle:
+            try:
+                server.quit()
+            except Exception:
+                _close_quietly(server)
+
+    # -----------------------------
+    # 전송
+    # -----------------------------
+    def send(self, msg: EmailMessage) -> bool:
+        return self.send_many([msg]) == 1
+
+    def send_many(self, messages: Iterable[EmailMessage]) -> int:
+        """
+        메일 여러 개를 연결 하나로 순서대로 보낸다. 보낸 개수를 반환.
+        연결 오류가 나면 백오프 후 다시 연결해서 남은 메일부터 이어서 보낸다.
+        """
+        pending = list(messages)
+        sent = 0
+        if not pending:
+            return 0
+
+        with self._slots:
+            server: Optional[smtplib.SMTP] = None
+            # 이 슬롯에서 연속으로 실패한 횟수 (다른 스레드의 실패와 무관, 재연결할 때만 기다림)
+            failures = 0
+            while pending:
+                if server is None:
+                    if failures >= self.max_retries:
+                        break
+                    self._backoff(failures)
+                    try:
+                        server = self._acquire()
+                    except (smtplib.SMTPException, OSError) as e:
+                        failures += 1
+                        self._connection_error()
+                        print("[EMAIL] SMTP 연결 실패:", e)
+                        continue
+
+                msg = pending[0]
+                started = time.perf_counter()
+                try:
+                    server.send_message(msg)
+                except (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused,
+                        smtplib.SMTPDataError) as e:
+                    # 메일 자체 문제 -> 연결은 살아있으므로 이 메일만 실패 처리
+                    pending.pop(0)
+                    self._record(False, time.perf_counter() - started)
+                    print(f"[EMAIL] 메일 전송 실패 ({msg['To']}):", e)
+                    continue
+                except (smtplib.SMTPException, OSError) as e:
+                    # 연결 문제 -> 버리고 다시 연결해서 재시도
+                    _close_quietly(server)
+                    server = None
+                    failures += 1
+                    self._connection_error()
+                    print("[EMAIL] SMTP 연결 끊김, 재연결 시도:", e)
+                    continue
+
+                pending.pop(0)
+                sent += 1
+                failures = 0
+                self._record(True, time.perf_counter() - started)
+
+            if server is not None:
+                self._release(server)
+
+        for msg in pending:
+            self._record(False, 0.0)
+            print(f"[EMAIL] 메일 전송 포기 ({msg['To']})")
+        return sent
+
+    # -----------------------------
+    # 카운터
+    # -----------------------------
+    def _record(self, ok: bool, latency: float) -> None:
+        emails.labels("sent" if ok else "failed").inc()
+        if ok:
+            smtp_send_seconds.observe(latency)
+        with self._lock:
+            self._stats["sent" if ok else "failed"] += 1
+            if ok:
+                self._stats["latency_count"] += 1
+                self._stats["latency_total_seconds"] += latency
+                self._stats["latency_last_seconds"] = latency
+                if latency > self._stats["latency_max_seconds"]:
+                    self._stats["latency_max_seconds"] = latency
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            snapshot = dict(self._stats)
+            snapshot["idle_connections"] = len(self._idle)
+        count = snapshot["latency_count"]
+        snapshot["latency_avg_seconds"] = (
+            snapshot["latency_total_seconds"] / count if count else 0.0
+        )
+        return snapshot
+
+
+def _close_quietly(server: smtplib.SMTP) -> None:
+    try:
+        server.close()
+    except Exception:
+        pass
+
+
+def smtp_configured() -> bool:
+    if not SMTP_USER:
+        return False
+    return not SMTP_AUTH or bool(SMTP_PASS)
+
+
+_pool: Optional[SMTPPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_smtp_pool() -> SMTPPool:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = SMTPPool()
+        return _pool
+
+
+def build_alert_email(to_email: str, subject: str, body: str) -> EmailMessage:
     msg = EmailMessage()
     msg["Subject"] = subject
     msg["From"] = SMTP_USER
     msg["To"] = to_email
     msg.set_content(body)
+    return msg
 
-    try:
-        with smtplib.SMTP(SMTP_HOST, SMTP_PORT) as server:
-            server.starttls()
-            server.login(SMTP_USER, SMTP_PASS)
-            server.send_message(msg)
+
+def send_alert_email(to_email: str, subject: str, body: str) -> bool:
+    """
+    간단한 텍스트 메일 보내기. (풀에 있는 SMTP 연결을 재사용)
+    SMTP_USER / SMTP_PASS 가 설정돼 있지 않으면 그냥 로그만 찍고 넘어감.
+    재시도 후에도 보내지 못했으면 False (설정이 없어 보내지 않은 경우는 다시 시도해도 같으므로 True)
+    """
+    if not smtp_configured():
+        print("[EMAIL] SMTP 계정이 설정되어 있지 않습니다. 메일을 보내지 않습니다.")
+        return True
+
+    if get_smtp_pool().send(build_alert_email(to_email, subject, body)):
         print(f"[EMAIL] Alert sent to {to_email}")
-    except Exception as e:
-        print("[EMAIL] 메일 전송 실패:", e)
+        return True
+    return False
+
+
+def get_email_stats() -> Dict[str, float]:
+    """SMTP 전송 성공/실패 수 + 전송 지연 통계"""
+    if _pool is None:
+        return {}
+    return _pool.stats()
+
+
+def close_smtp_pool() -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+            _pool = None
@@ -0,0 +1,128 @@
+# export_utils.py
+import csv
+import io
+import json
+import zlib
+from datetime import datetime
+from typing import Iterable, Iterator, List, Optional, Sequence
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from database import ReadSessionLocal
+import models
+
+# 한 번에 DB 에서 가져와서 내보내는 행 수 (메모리 사용량은 이 크기에만 비례)
+EXPORT_CHUNK_ROWS = 1000
+
+EXPORT_COLUMNS: Sequence[str] = (
+    "id",
+    "created_at",
+    "temperature",
+    "humidity",
+    "pm25",
+    "air_quality",
+    "note",
+    "user_id",
+)
+
+EXPORT_FORMATS = {
+    # format: (media type, 파일 확장자)
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "csv": ("text/csv", "csv"),
+}
+
+
+def encode_ndjson(rows: Iterable[Sequence]) -> bytes:
+    lines: List[str] = []
+    for row in rows:
+        record = dict(zip(EXPORT_COLUMNS, row))
+        created_at = record["created_at"]
+        if isinstance(created_at, datetime):
+            record["created_at"] = created_at.isoformat()
+        lines.append(json.dumps(record, ensure_ascii=False))
+    return ("\n".join(lines) + "\n").encode("utf-8") if lines else b""
+
+
+def encode_csv(rows: Iterable[Sequence], header: bool = False) -> bytes:
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    if header:
+        writer.writerow(EXPORT_COLUMNS)
+    for row in rows:
+        writer.writerow(
+            [v.isoformat() if isinstance(v, datetime) else v for v in row]
+        )
+    return buf.getvalue().encode("utf-8")
+
+
+def encode_chunks(
+    chunks: Iterable[Sequence[Sequence]],
+    fmt: str,
+    gzip: bool = False,
+) -> Iterator[bytes]:
+    """행 묶음들 -> NDJSON/CSV 바이트 스트림 (gzip 이면 청크 단위로 압축해서 바로 내보냄)"""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if gzip else None
+
+    def emit(data: bytes) -> bytes:
+        if compressor is None:
+            return data
+        # SYNC_FLUSH: 압축된 바이트를 모아두지 않고 청크마다 바로 내보냄
+        return compressor.compress(data) + compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    if fmt == "csv":
+        yield emit(encode_csv([], header=True))
+
+    for rows in chunks:
+        data = encode_csv(rows) if fmt == "csv" else encode_ndjson(rows)
+        if data:
+            yield emit(data)
+
+    if compressor is not None:
+        yield compressor.flush()
+
+
+def iter_data_chunks(
+    db: Session,
+    user_id: Optional[int],
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    chunk_rows: int = EXPORT_CHUNK_ROWS,
+) -> Iterator[Sequence[Sequence]]:
+    """
+    data 행을 오래된 순으로 chunk_rows 개씩 가져온다.
+    ORM 객체 없이 컬럼 튜플만, yield_per 로 서버 측 커서에서 조금씩 읽는다.
+    """
+    Data = models.Data
+    stmt = select(*(getattr(Data, name) for name in EXPORT_COLUMNS))
+    if user_id is not None:
+        stmt = stmt.where(Data.user_id == user_id)
+    if start_date:
+        stmt = stmt.where(Data.created_at >= start_date)
+    if end_date:
+        stmt = stmt.where(Data.created_at <= end_date)
+    stmt = stmt.order_by(Data.created_at.asc(), Data.id.asc())
+
+    result = db.execute(stmt.execution_options(yield_per=chunk_rows))
+    for partition in result.partitions():
+        yield partition
+
+
+def stream_export(
+    user_id: int,
+    fmt: str,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    gzip: bool = False,
+) -> Iterator[bytes]:
+    """
+    StreamingResponse 용 제너레이터. 응답이 끝날 때까지 쓰는 세션을 직접 열고 닫는다.
+    (요청 의존성의 세션은 응답 스트리밍 전에 닫힐 수 있음)
+    """
+    db: Session = ReadSessionLocal()
+    try:
+        yield from encode_chunks(
+            iter_data_chunks(db, user_id, start_date, end_date), fmt, gzip
+        )
+    finally:
+        db.close()
@@ -0,0 +1,250 @@
+# ingest.py
+import os
+import queue
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from database import SessionLocal
+import models
+import rollups
+from metrics import db_commit_seconds, ingest_rows
+
+# 배치 적재 설정 (환경변수로 조절 가능)
+INGEST_BATCH_SIZE: int = int(os.getenv("INGEST_BATCH_SIZE", "200"))
+INGEST_MAX_DELAY_SECONDS: float = float(os.getenv("INGEST_MAX_DELAY_SECONDS", "1.0"))
+INGEST_QUEUE_SIZE: int = int(os.getenv("INGEST_QUEUE_SIZE", "10000"))
+
+
+@dataclass
+class Reading:
+    """MQTT 메시지 하나에서 파싱된 측정값 (DB에 쓰기 전 상태)"""
+    temperature: float
+    humidity: float
+    pm25: float
+    air_quality: str
+    user_id: Optional[int] = None
+    created_at: datetime = field(default_factory=datetime.utcnow)
+
+
+def _first_user_id(db: Session) -> Optional[int]:
+    """save_measurement_to_db 와 동일하게 가장 먼저 생성된 유저를 기본값으로 사용"""
+    first_user = db.query(models.User).order_by(models.User.User_ID.asc()).first()
+    return first_user.User_ID if first_user is not None else None
+
+
+def insert_data_rows(db: Session, rows: List[dict]) -> None:
+    """
+    data 행 dict 들을 executemany 한 번으로 INSERT (커밋은 호출한 쪽).
+    RETURNING 을 지원하는 DB 면 각 dict 에 "id" 를 채운다 (행을 다시 읽지 않음).
+    """
+    stmt = insert(models.Data)
+    dialect = db.get_bind().dialect
+    if not rows or not dialect.insert_executemany_returning:
+        db.execute(stmt, rows)
+        return
+    if dialect.name != "sqlite":
+        # RETURNING 순서는 보장되지 않으므로 SQLAlchemy 가 입력 순서대로 맞춰서 돌려주게 함
+        returned = db.execute(stmt.returning(models.Data.id, sort_by_parameter_order=True), rows)
+        for row, row_id in zip(rows, returned.scalars().all()):
+            row["id"] = row_id
+        return
+
+    # SQLite 는 sort_by_parameter_order=True 면 행마다 INSERT 로 바뀌어 느리므로
+    # 넣은 값을 같이 돌려받아 값으로 맞춘다 (REAL / 마이크로초 시각이 그대로 돌아옴).
+    # 값이 완전히 같은 행끼리는 어느 id 를 받아도 같은 행이다.
+    names = [name for name in rows[0] if name != "id"]
+    returned = db.execute(
+        stmt.returning(models.Data.id, *[getattr(models.Data, name) for name in names]), rows
+    ).all()
+    ids_by_values: Dict[tuple, List[int]] = {}
+    for row_id, *values in sorted(returned):
+        ids_by_values.setdefault(tuple(values), []).append(row_id)
+    for row in rows:
+        ids = ids_by_values.get(tuple(row[name] for name in names))
+        if ids:
+            row["id"] = ids.pop(0)
+
+
+def readings_to_rows(db: Session, readings: List[Reading]) -> List[dict]:
+    """Reading -> data 행 dict. user_id 없는 Reading 은 첫 번째 유저로 (한 번만 조회)"""
+    rows: List[dict] = []
+    default_user_id: Optional[int] = None
+    if any(reading.user_id is None for reading in readings):
+        default_user_id = _first_user_id(db)
+        if default_user_id is None:
+            print("[MQTT] No user found in DB. Skip saving.")
+
+    for reading in readings:
+        user_id = reading.user_id if reading.user_id is not None else default_user_id
+        if user_id is None:
+            continue
+        rows.append(
+            {
+                "temperature": reading.temperature,
+                "humidity": reading.humidity,
+                "pm25": reading.pm25,
+                "air_quality": reading.air_quality,
+                "created_at": reading.created_at,
+                "user_id": user_id,
+            }
+        )
+    return rows
+
+
+class MeasurementBatcher:
+    """
+    on_message 에서는 파싱된 Reading 을 큐에 넣기만 하고,
+    별도 writer 스레드가 큐를 비우면서 배치 단위로 한 번에 INSERT 한다.
+
+    - batch_size 개가 모이거나 max_delay 초가 지나면 flush
+    - 큐가 가득 차면 새 Reading 은 버리고 dropped 카운터만 올린다
+    - flush 가 끝나면 on_flushed(rows) 콜백으로 저장된 행을 넘겨준다
+    """
+
+    def __init__(
+        self,
+        batch_size: int = INGEST_BATCH_SIZE,
+        max_delay: float = INGEST_MAX_DELAY_SECONDS,
+        queue_size: int = INGEST_QUEUE_SIZE,
+        on_flushed: Optional[Callable[[List[dict]], None]] = None,
+    ) -> None:
+        self.batch_size = max(1, batch_size)
+        self.max_delay = max_delay
+        self.on_flushed = on_flushed
+
+        self._queue: "queue.Queue[Reading]" = queue.Queue(maxsize=queue_size)
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+        self._stats_lock = threading.Lock()
+        self._stats: Dict[str, int] = {
+            "batched": 0,   # 큐에 들어간 Reading 수
+            "flushed": 0,   # DB에 커밋된 Reading 수
+            "dropped": 0,   # 큐가 가득 차거나 저장 실패로 버려진 Reading 수
+            "batches": 0,   # 커밋된 배치(트랜잭션) 수
+        }
+
+    # -----------------------------
+    # 생산자 쪽 (paho 네트워크 스레드)
+    # -----------------------------
+    def submit(self, reading: Reading) -> bool:
+        """큐에 넣기만 하고 바로 반환. 큐가 가득 차 있으면 False."""
+        try:
+            self._queue.put_nowait(reading)
+        except queue.Full:
+            self._count("dropped")
+            return False
+        self._count("batched")
+        return True
+
+    def submit_many(self, readings: List[Reading]) -> int:
+        """메시지 하나에 담긴 여러 Reading 을 큐에 넣는다. 넣은 개수를 반환 (나머지는 dropped)"""
+        accepted = 0
+        for reading in readings:
+            try:
+                self._queue.put_nowait(reading)
+            except queue.Full:
+                break
+            accepted += 1
+        self._count("batched", accepted)
+        self._count("dropped", len(readings) - accepted)
+        return accepted
+
+    # -----------------------------
+    # writer 스레드
+    # -----------------------------
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="mqtt-ingest-writer", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """남은 Reading 을 모두 flush 한 뒤 writer 스레드를 멈춘다."""
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join(timeout)
+        self._thread = None
+
+    def _run(self) -> None:
+        while not self._stop.is_set() or not self._queue.empty():
+            batch = self._collect_batch()
+            if batch:
+                self._flush(batch)
+
+    def _collect_batch(self) -> List[Reading]:
+        """첫 Reading 을 기다린 뒤, batch_size 또는 max_delay 에 도달할 때까지 모은다."""
+        try:
+            first = self._queue.get(timeout=self.max_delay)
+        except queue.Empty:
+            return []
+
+        batch = [first]
+        deadline = time.monotonic() + self.max_delay
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _flush(self, batch: List[Reading]) -> None:
+        db: Session = SessionLocal()
+        try:
+            rows = readings_to_rows(db, batch)
+            if not rows:
+                self._count("dropped", len(batch))
+                return
+
+            # 배치 전체를 하나의 트랜잭션으로 INSERT (executemany) + 롤업 누적
+            with db_commit_seconds.labels("mqtt_batch").time():
+                insert_data_rows(db, rows)
+                rollups.apply_rows(db, rows)
+                db.commit()
+            ingest_rows.labels("mqtt_batch").inc(len(rows))
+
+            self._count("flushed", len(rows))
+            self._count("batches")
+            self._count("dropped", len(batch) - len(rows))
+            print(f"[MQTT] Flushed {len(rows)} readings")
+        except Exception as e:
+            db.rollback()
+            self._count("dropped", len(batch))
+            print("[MQTT] Batch DB error:", e)
+            return
+        finally:
+            db.close()
+
+        if self.on_flushed is not None:
+            try:
+                self.on_flushed(rows)
+            except Exception as e:
+                print("[MQTT] Post-flush hook error:", e)
+
+    # -----------------------------
+    # 카운터
+    # -----------------------------
+    def _count(self, name: str, n: int = 1) -> None:
+        if n <= 0:
+            return
+        with self._stats_lock:
+            self._stats[name] += n
+
+    def stats(self) -> Dict[str, int]:
+        with self._stats_lock:
+            snapshot = dict(self._stats)
+        snapshot["queue_depth"] = self._queue.qsize()
+        return snapshot
@@ -1,15 +1,46 @@
 # main.py
-from fastapi import FastAPI
+import os
+import time
+
+_import_started = time.perf_counter()
+
+from fastapi import FastAPI, Response
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import HTTPBearer
-from routes import user, measurement, graph 
-from database import engine, Base 
-from mqtt import start_mqtt
+from routes import user, measurement, graph, export, stream
+from database import engine, read_engine, async_engine, async_read_engine, dispose_async_engines
+from passwords import shutdown_hash_executor
+from recent_buffer import recent_readings
+from migrations import check_schema, run_migrations
+import metrics
+from mqtt import get_ingest_stats
+from coordination import start_ingest, stop_ingest, get_coordination_stats, get_ingest_status
 from fastapi.middleware.cors import CORSMiddleware
 
+# uvicorn / gunicorn 워커 프로세스 수 (uvicorn --workers 도 이 환경변수를 읽음)
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", "1"))
+
+# 워커가 import 될 때 스키마를 어떻게 다룰지
+# "migrate": 테이블 생성 + 빠진 컬럼 / 인덱스 추가 + 아직 적용하지 않은 데이터 마이그레이션 (manage.py migrate 와 동일)
+#            프로세스 하나로 띄울 때 기본값 (예전처럼 서버만 실행하면 DB 가 준비됨)
+# "check": 테이블 / 컬럼 / 데이터 마이그레이션이 적용됐는지만 확인. WEB_CONCURRENCY 가 2 이상이면 기본값
+#          -> 워커 여러 개로 배포할 때는 python manage.py migrate 를 먼저 한 번 실행해야 함
+# "skip": 아무것도 하지 않음
+DB_SCHEMA_ON_STARTUP = os.getenv("DB_SCHEMA_ON_STARTUP", "migrate" if WEB_CONCURRENCY <= 1 else "check")
+
 app = FastAPI()
 
-# DB 테이블 생성
-Base.metadata.create_all(bind=engine)
+if DB_SCHEMA_ON_STARTUP == "migrate":
+    run_migrations(engine)
+elif DB_SCHEMA_ON_STARTUP == "check":
+    missing = check_schema(engine)
+    if missing:
+        raise RuntimeError(
+            f"DB schema is missing {', '.join(missing)}. Run `python manage.py migrate` first."
+        )
+
+# 시작 완료 시각 (/ready)
+startup_state = {"ready": False, "startup_seconds": None}
 
 # ✅ CORS 설정 (개발용: 일단 전부 허용)
 app.add_middleware(
@@ -20,15 +51,77 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# 라우트별 요청 지연 시간 (/metrics)
+app.add_middleware(metrics.MetricsMiddleware)
+metrics.GaugeFunc(
+    "airzy_db_pool_connections",
+    "DB connection pool usage by engine and state",
+    metrics.pool_usage({
+        "write": engine,
+        "read": read_engine,
+        "async_write": async_engine,
+        "async_read": async_read_engine,
+    }),
+    ["engine", "state"],
+)
+metrics.GaugeFunc(
+    "airzy_startup_seconds",
+    "Seconds from importing main to the end of the startup hook",
+    lambda: startup_state["startup_seconds"],
+)
+
 # ✅ 라우터 등록 (한 번만)
 app.include_router(user.router)
 app.include_router(measurement.router)
 app.include_router(graph.router)
+app.include_router(export.router)
+app.include_router(stream.router)
 
 @app.on_event("startup")
 def startup_event():
-    # 서버 올라갈 때 MQTT도 같이 시작
-    start_mqtt()
+    # 서버 올라갈 때 MQTT도 같이 시작 (워커가 여러 개면 MQTT_COORDINATION 에 따라 하나만 구독)
+    # 보관 정책 주기 실행도 리더 워커 하나만 (coordination.leader_duties)
+    # 최근값 버퍼도 여기서 백그라운드로 DB 에서 채움 (끝나기 전 조회는 DB 로)
+    start_ingest()
+    # main import 부터 요청을 받을 수 있을 때까지 걸린 시간
+    startup_state["startup_seconds"] = time.perf_counter() - _import_started
+    startup_state["ready"] = True
+    print(f"[STARTUP] Ready in {startup_state['startup_seconds']:.3f}s")
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    # 큐에 남아있는 측정값까지 저장하고 종료 (블로킹 작업이라 스레드풀에서)
+    await run_in_threadpool(stop_ingest)
+    await run_in_threadpool(shutdown_hash_executor)
+    await dispose_async_engines()
+
+@app.get("/ingest/stats")
+def read_ingest_stats():
+    stats = get_ingest_stats()
+    stats["coordination"] = get_coordination_stats()
+    return stats
+
+@app.get("/ready")
+def read_ready(response: Response, require_ingest: bool = False):
+    """
+    시작이 끝났으면 200, 아니면 503.
+    require_ingest=true 면 이 프로세스가 MQTT 를 받고 있어야(브로커 연결) 200
+    """
+    ingest = get_ingest_status()
+    ready = startup_state["ready"] and (ingest["live"] or not require_ingest)
+    if not ready:
+        response.status_code = 503
+    return {
+        "ready": ready,
+        "startup_seconds": startup_state["startup_seconds"],
+        "recent_buffer": recent_readings.ready,
+        "ingest": ingest,
+    }
+
+@app.get("/metrics", include_in_schema=False)
+def read_metrics():
+    # Prometheus 텍스트 형식
+    return Response(metrics.render(), media_type=metrics.CONTENT_TYPE)
 
 @app.get("/")
 def read_root():
@@ -0,0 +1,104 @@
+# manage.py
+import argparse
+import signal
+import threading
+from datetime import datetime
+
+from sqlalchemy import func
+
+from database import engine, SessionLocal
+from migrations import run_migrations
+import models
+import retention
+import rollups
+
+
+def cmd_migrate(args: argparse.Namespace) -> None:
+    run_migrations(engine)
+    print("[MIGRATE] Done")
+
+
+def cmd_rebuild_rollups(args: argparse.Namespace) -> None:
+    since = None
+    if args.since:
+        # 1d 구간이 잘리지 않도록 하루 단위로 맞춤
+        since = datetime.strptime(args.since, "%Y-%m-%d")
+
+    db = SessionLocal()
+    try:
+        # retention 으로 원본이 지워진 날을 다시 계산하면 롤업까지 사라지므로
+        # 남아있는 가장 오래된 원본 행의 날짜부터만 계산
+        oldest_query = db.query(func.min(models.Data.created_at))
+        if args.user_id is not None:
+            oldest_query = oldest_query.filter(models.Data.user_id == args.user_id)
+        oldest = oldest_query.scalar()
+        if oldest is None:
+            print("[ROLLUP] 원본 data 가 없어서 다시 계산하지 않습니다.")
+            return
+        oldest_day = oldest.replace(hour=0, minute=0, second=0, microsecond=0)
+        if since is None or since < oldest_day:
+            since = oldest_day
+            print(f"[ROLLUP] {since:%Y-%m-%d} 부터 다시 계산 (그 이전은 원본이 없음)")
+
+        rollups.rebuild(db, user_id=args.user_id, since=since)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+    print("[ROLLUP] Rebuild done")
+
+
+def cmd_retention(args: argparse.Namespace) -> None:
+    if args.enable_incremental_vacuum:
+        retention.enable_incremental_vacuum()
+    retention.run_retention(archive_dir=args.archive_dir)
+
+
+def cmd_ingest(args: argparse.Namespace) -> None:
+    """
+    MQTT 적재 전용 프로세스. HTTP 워커는 MQTT_COORDINATION=off 로 띄우고 이걸 따로 실행.
+    여러 개 띄워두면 잠금을 잡은 하나만 구독 + 보관 정책 주기 실행을 하고 나머지는 대기 (죽으면 넘겨받음)
+    """
+    from coordination import ingest_leader, leader_duties
+
+    stop = threading.Event()
+    signal.signal(signal.SIGINT, lambda *_: stop.set())
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+
+    ingest_leader.start(leader_duties("lock"))
+    while not stop.wait(1.0):
+        pass
+    ingest_leader.stop()
+    print("[INGEST] Done")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Airzy 서버 관리 명령")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_migrate = sub.add_parser("migrate", help="테이블 생성 + 인덱스 등 스키마 변경 적용")
+    p_migrate.set_defaults(func=cmd_migrate)
+
+    p_rollups = sub.add_parser("rebuild-rollups", help="data 테이블에서 롤업(1m/1h/1d)을 다시 계산")
+    p_rollups.add_argument("--user-id", type=int, default=None, help="특정 유저만 다시 계산")
+    p_rollups.add_argument("--since", default=None, help="이 날짜(YYYY-MM-DD, UTC)부터만 다시 계산")
+    p_rollups.set_defaults(func=cmd_rebuild_rollups)
+
+    p_retention = sub.add_parser("retention", help="보관 기간이 지난 원본/롤업 정리 (압축 -> 아카이브 -> 삭제 -> incremental vacuum)")
+    p_retention.add_argument("--archive-dir", default=retention.RETENTION_ARCHIVE_DIR,
+                             help="지우기 전에 gzip NDJSON 으로 남길 폴더 (기본: RETENTION_ARCHIVE_DIR)")
+    p_retention.add_argument("--enable-incremental-vacuum", action="store_true",
+                             help="기존 DB 를 auto_vacuum=INCREMENTAL 로 바꿈 (전체 VACUUM, 한 번만)")
+    p_retention.set_defaults(func=cmd_retention)
+
+    p_ingest = sub.add_parser("ingest", help="MQTT 적재 전용 프로세스 (잠금을 잡은 하나만 구독, SIGINT/SIGTERM 으로 종료)")
+    p_ingest.set_defaults(func=cmd_ingest)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
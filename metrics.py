@@ -0,0 +1,385 @@
+# metrics.py
+"""
+Prometheus 텍스트 형식 /metrics 용 카운터 / 히스토그램 / 게이지.
+
+측정값마다 호출되는 경로에서도 켜둘 수 있도록:
+- 값은 스레드별 조각(shard)에 더하고 (자기 스레드만 쓰므로 락 없음), /metrics 를 읽을 때 합친다
+- 락은 스레드나 라벨 조합이 처음 나올 때만 잡는다
+"""
+import threading
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+# 초 단위 지연 히스토그램 기본 구간
+LATENCY_BUCKETS: Tuple[float, ...] = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(
+        '{}="{}"'.format(n, str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for n, v in zip(names, values)
+    )
+    return "{" + pairs + "}"
+
+
+class _Sharded:
+    """스레드별 float 리스트 조각. 쓰기는 자기 조각에만, 읽기는 전부 합산"""
+
+    __slots__ = ("_size", "_local", "_shards", "_lock")
+
+    def __init__(self, size: int) -> None:
+        self._size = size
+        self._local = threading.local()
+        self._shards: List[List[float]] = []
+        self._lock = threading.Lock()
+
+    def shard(self) -> List[float]:
+        try:
+            return self._local.shard
+        except AttributeError:
+            shard = [0.0] * self._size
+            with self._lock:
+                self._shards.append(shard)
+            self._local.shard = shard
+            return shard
+
+    def total(self) -> List[float]:
+        with self._lock:
+            shards = list(self._shards)
+        result = [0.0] * self._size
+        for shard in shards:
+            for i, v in enumerate(shard):
+                result[i] += v
+        return result
+
+
+class _CounterChild:
+    __slots__ = ("_values",)
+
+    def __init__(self) -> None:
+        self._values = _Sharded(1)
+
+    def inc(self, amount: float = 1.0) -> None:
+        self._values.shard()[0] += amount
+
+    def value(self) -> float:
+        return self._values.total()[0]
+
+
+class _HistogramChild:
+    __slots__ = ("_bounds", "_values")
+
+    def __init__(self, bounds: Tuple[float, ...]) -> None:
+        self._bounds = bounds
+        # [구간별 개수..., +Inf 개수, 합계]
+        self._values = _Sharded(len(bounds) + 2)
+
+    def observe(self, value: float) -> None:
+        shard = self._values.shard()
+        shard[bisect_left(self._bounds, value)] += 1
+        shard[-1] += value
+
+    def time(self) -> "_Timer":
+        return _Timer(self)
+
+    def snapshot(self) -> Tuple[List[float], float, float]:
+        """(누적 구간별 개수, 총 개수, 합계)"""
+        values = self._values.total()
+        cumulative: List[float] = []
+        running = 0.0
+        for v in values[:-1]:
+            running += v
+            cumulative.append(running)
+        return cumulative, running, values[-1]
+
+
+class _Timer:
+    """with histogram.time(): ... 블록의 실행 시간을 기록"""
+
+    __slots__ = ("_child", "_started")
+
+    def __init__(self, child: _HistogramChild) -> None:
+        self._child = child
+
+    def __enter__(self) -> "_Timer":
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._child.observe(time.perf_counter() - self._started)
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+        if not self.labelnames:
+            self._default = self._child(())
+        registry.register(self)
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def _child(self, values: Tuple[str, ...]):
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.get(values)
+                if child is None:
+                    child = self._children[values] = self._new_child()
+        return child
+
+    def labels(self, *values: str):
+        if len(values) != len(self.labelnames):
+            raise ValueError(f"{self.name}: expected labels {self.labelnames}")
+        return self._child(tuple(str(v) for v in values))
+
+    def _items(self):
+        with self._lock:
+            return sorted(self._children.items())
+
+    def collect(self) -> List[str]:
+        raise NotImplementedError
+
+    def _header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self) -> _CounterChild:
+        return _CounterChild()
+
+    def inc(self, amount: float = 1.0) -> None:
+        self._default.inc(amount)
+
+    def collect(self) -> List[str]:
+        lines = self._header()
+        for values, child in self._items():
+            lines.append(f"{self.name}{_format_labels(self.labelnames, values)} {_format_value(child.value())}")
+        return lines
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ) -> None:
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self) -> _HistogramChild:
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float) -> None:
+        self._default.observe(value)
+
+    def time(self) -> _Timer:
+        return self._default.time()
+
+    def collect(self) -> List[str]:
+        lines = self._header()
+        names = self.labelnames + ("le",)
+        for values, child in self._items():
+            cumulative, count, total = child.snapshot()
+            for bound, n in zip(self.buckets + (float("inf"),), cumulative):
+                lines.append(
+                    f"{self.name}_bucket{_format_labels(names, values + (_format_value(bound),))} {_format_value(n)}"
+                )
+            labels = _format_labels(self.labelnames, values)
+            lines.append(f"{self.name}_count{labels} {_format_value(count)}")
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+        return lines
+
+
+class GaugeFunc:
+    """
+    /metrics 를 읽을 때 func() 를 호출해서 값을 가져오는 게이지.
+    func 는 숫자 하나, 또는 {라벨 값 튜플: 숫자} 를 반환
+    """
+
+    kind = "gauge"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        func: Callable[[], object],
+        labelnames: Sequence[str] = (),
+    ) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.func = func
+        registry.register(self)
+
+    def collect(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        try:
+            result = self.func()
+        except Exception as e:
+            print(f"[METRICS] {self.name} 수집 실패:", e)
+            return lines
+        items = result.items() if isinstance(result, dict) else [((), result)]
+        for values, value in items:
+            if value is None:
+                continue
+            lines.append(f"{self.name}{_format_labels(self.labelnames, values)} {_format_value(value)}")
+        return lines
+
+
+class Registry:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._metrics: Dict[str, object] = {}
+
+    def register(self, metric) -> None:
+        with self._lock:
+            # 같은 이름으로 다시 등록하면 (모듈 재로딩 등) 새 것으로 교체
+            self._metrics[metric.name] = metric
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines: List[str] = []
+        for metric in metrics:
+            lines.extend(metric.collect())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+
+# -----------------------------
+# MQTT / 적재
+# -----------------------------
+mqtt_messages = Counter(
+    "airzy_mqtt_messages_total",
+    "MQTT messages by result (received, parsed, failed)",
+    ["result"],
+)
+mqtt_readings = Counter(
+    "airzy_mqtt_readings_total",
+    "Readings decoded from MQTT messages by payload format (json, msgpack, binary)",
+    ["format"],
+)
+db_commit_seconds = Histogram(
+    "airzy_db_commit_seconds",
+    "Measurement INSERT + rollup + commit latency",
+    ["path"],
+)
+ingest_rows = Counter(
+    "airzy_ingest_rows_total",
+    "Measurement rows committed",
+    ["path"],
+)
+
+# -----------------------------
+# 알림 / 메일
+# -----------------------------
+alert_evaluations = Counter(
+    "airzy_alert_evaluations_total",
+    "Alert threshold evaluations by outcome (no_target, below, suppressed, email, email_failed, error)",
+    ["outcome"],
+)
+emails = Counter(
+    "airzy_emails_total",
+    "Alert emails by result (sent, failed)",
+    ["result"],
+)
+smtp_send_seconds = Histogram(
+    "airzy_smtp_send_seconds",
+    "SMTP send_message latency for delivered emails",
+)
+
+# -----------------------------
+# HTTP
+# -----------------------------
+http_request_seconds = Histogram(
+    "airzy_http_request_seconds",
+    "HTTP request latency by route template",
+    ["method", "route", "status"],
+)
+
+
+def pool_usage(engines: Dict[str, object]) -> Callable[[], Dict[Tuple[str, str], Optional[float]]]:
+    """engine 이름 -> Engine. 커넥션 풀의 checked_out / idle / overflow 를 읽는 게이지 함수"""
+
+    def collect() -> Dict[Tuple[str, str], Optional[float]]:
+        result: Dict[Tuple[str, str], Optional[float]] = {}
+        for name, engine in engines.items():
+            pool = getattr(engine, "sync_engine", engine).pool
+            for state, method in (("checked_out", "checkedout"), ("idle", "checkedin"), ("overflow", "overflow")):
+                fn = getattr(pool, method, None)
+                if fn is not None:
+                    result[(name, state)] = max(0, fn())
+            size = getattr(pool, "size", None)
+            if size is not None:
+                result[(name, "size")] = size()
+        return result
+
+    return collect
+
+
+class MetricsMiddleware:
+    """
+    요청마다 라우트 템플릿(/users/{user_id} 등) 기준으로 지연 시간을 기록하는 ASGI 미들웨어.
+    (BaseHTTPMiddleware 를 쓰지 않아 SSE 같은 스트리밍 응답도 그대로 통과)
+    """
+
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status_code = 500
+
+        async def send_wrapper(message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            # 매칭되지 않은 경로는 라벨 수가 늘어나지 않도록 하나로 묶음
+            path = getattr(route, "path", None) or "<unmatched>"
+            http_request_seconds.labels(scope["method"], path, status_code).observe(
+                time.perf_counter() - started
+            )
+
+
+def render() -> str:
+    return registry.render()
@@ -0,0 +1,174 @@
+# migrations.py
+from typing import Callable, List, Set, Tuple
+
+from sqlalchemy import inspect, select, text
+from sqlalchemy.engine import Engine
+
+from sqlalchemy.orm import Session
+
+from database import Base
+import models
+import rollups
+
+
+def ensure_model_indexes(engine: Engine) -> None:
+    """
+    models.py 에 선언된 인덱스 중 기존 DB 에 없는 것만 생성.
+    (create_all 은 이미 있는 테이블에는 새 인덱스를 추가하지 않음)
+    """
+    inspector = inspect(engine)
+    existing_tables = set(inspector.get_table_names())
+
+    for table in Base.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue
+        existing = {ix["name"] for ix in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name in existing:
+                continue
+            print(f"[MIGRATE] Creating index {index.name} on {table.name}")
+            index.create(bind=engine)
+
+
+def add_missing_columns(engine: Engine) -> None:
+    """
+    models.py 에 새로 추가된 (nullable) 컬럼 중 기존 테이블에 없는 것을 ALTER TABLE 로 추가.
+    (create_all 은 이미 있는 테이블에 컬럼을 추가하지 않음)
+    """
+    inspector = inspect(engine)
+    existing_tables = set(inspector.get_table_names())
+    preparer = engine.dialect.identifier_preparer
+
+    for table in Base.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue
+        existing = {c["name"] for c in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing:
+                continue
+            print(f"[MIGRATE] Adding column {table.name}.{column.name}")
+            column_type = column.type.compile(dialect=engine.dialect)
+            with engine.begin() as conn:
+                conn.execute(
+                    text(
+                        f"ALTER TABLE {preparer.quote(table.name)} "
+                        f"ADD COLUMN {preparer.quote(column.name)} {column_type}"
+                    )
+                )
+                # 기존 행에는 모델의 기본값을 채워 넣음
+                default = column.default.arg if column.default is not None and column.default.is_scalar else None
+                if default is not None:
+                    conn.execute(
+                        text(f"UPDATE {preparer.quote(table.name)} SET {preparer.quote(column.name)} = :v"),
+                        {"v": default},
+                    )
+
+
+def normalize_sqlite_created_at(engine: Engine) -> None:
+    """
+    SQLite 는 DATETIME 을 문자열로 저장한다. func.now() 로 들어간 예전 행은
+    'YYYY-MM-DD HH:MM:SS', 파이썬에서 넣은 행은 '... HH:MM:SS.ffffff' 형식이라
+    문자열 비교(기간 조회 / 커서)가 어긋나므로 예전 행에 마이크로초를 붙여 맞춘다.
+    """
+    if engine.dialect.name != "sqlite":
+        return
+    with engine.begin() as conn:
+        result = conn.execute(
+            text(
+                "UPDATE data SET created_at = created_at || '.000000' "
+                "WHERE length(created_at) = 19"
+            )
+        )
+        if result.rowcount:
+            print(f"[MIGRATE] Normalized created_at of {result.rowcount} rows")
+
+
+def backfill_rollups(engine: Engine) -> None:
+    """롤업 테이블이 비어있는데 data 가 있으면(롤업 도입 전 DB) 한 번 전체 계산"""
+    with Session(bind=engine) as db:
+        if db.query(models.DataRollup.user_id).first() is not None:
+            return
+        if db.query(models.Data.id).first() is None:
+            return
+        print("[MIGRATE] Backfilling data_rollup from data")
+        rollups.rebuild(db)
+        db.commit()
+
+
+def fill_rollup_metric_counts(engine: Engine) -> None:
+    """
+    항목별 count 컬럼이 생기기 전의 롤업 행 채우기. 예전에는 None 인 값도 분모에 들어갔으므로
+    그 구간에 값이 하나라도 있었으면 count, 없었으면 0 으로 둔다 (정확히 하려면 manage.py rebuild-rollups)
+    """
+    with engine.begin() as conn:
+        for metric in rollups.METRICS:
+            result = conn.execute(
+                text(
+                    f"UPDATE data_rollup SET {metric}_count = "
+                    f"CASE WHEN {metric}_min IS NULL THEN 0 ELSE count END "
+                    f"WHERE {metric}_count IS NULL"
+                )
+            )
+            if result.rowcount:
+                print(f"[MIGRATE] Filled {metric}_count of {result.rowcount} rollup rows")
+
+
+# 매번 실행하는 단계: 카탈로그만 보고 모델과 다른 부분을 맞춘다 (여러 번 실행해도 안전)
+SCHEMA_STEPS: List[Tuple[str, Callable[[Engine], None]]] = [
+    ("model_columns", add_missing_columns),
+    ("model_indexes", ensure_model_indexes),
+]
+
+# 데이터를 훑는 단계: 순서대로 한 번만 실행하고 schema_migrations 에 기록 (새 단계는 끝에 추가)
+MIGRATIONS: List[Tuple[str, Callable[[Engine], None]]] = [
+    ("normalize_sqlite_created_at", normalize_sqlite_created_at),
+    ("backfill_rollups", backfill_rollups),
+    ("fill_rollup_metric_counts", fill_rollup_metric_counts),
+]
+
+
+def applied_migrations(engine: Engine) -> Set[str]:
+    if not inspect(engine).has_table(models.SchemaMigration.__tablename__):
+        return set()
+    with engine.connect() as conn:
+        return set(conn.execute(select(models.SchemaMigration.name)).scalars())
+
+
+def pending_migrations(engine: Engine) -> List[str]:
+    applied = applied_migrations(engine)
+    return [name for name, _ in MIGRATIONS if name not in applied]
+
+
+def run_migrations(engine: Engine) -> None:
+    """테이블 생성 후 기존 DB 에 필요한 스키마 변경과 아직 적용하지 않은 데이터 마이그레이션을 적용"""
+    Base.metadata.create_all(bind=engine)
+    for name, step in SCHEMA_STEPS:
+        step(engine)
+
+    applied = applied_migrations(engine)
+    for name, step in MIGRATIONS:
+        if name in applied:
+            continue
+        step(engine)
+        with Session(bind=engine) as db:
+            db.add(models.SchemaMigration(name=name))
+            db.commit()
+        print(f"[MIGRATE] Applied {name}")
+
+
+def check_schema(engine: Engine) -> List[str]:
+    """
+    마이그레이션 없이 테이블 / 컬럼이 모델과 맞고 데이터 마이그레이션이 다 적용됐는지만 확인
+    (카탈로그와 schema_migrations 만 읽으므로 DB 크기와 무관). 빠진 항목 목록을 반환 (비어 있으면 OK)
+    """
+    inspector = inspect(engine)
+    existing_tables = set(inspector.get_table_names())
+    missing: List[str] = []
+    for table in Base.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            missing.append(table.name)
+            continue
+        existing = {c["name"] for c in inspector.get_columns(table.name)}
+        missing.extend(f"{table.name}.{c.name}" for c in table.columns if c.name not in existing)
+    missing.extend(f"migration {name}" for name in pending_migrations(engine))
+    return missing
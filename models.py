@@ -1,4 +1,6 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey
+from datetime import datetime
+
+from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Boolean, Index
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
@@ -26,11 +28,17 @@ class Data(Base):
     pm25 = Column(Float)
     air_quality = Column(String(20))
     note = Column(String(255))
-    created_at = Column(DateTime, default=func.now())
+    # 파이썬에서 채워야 SQLite 에 마이크로초까지 같은 형식으로 저장됨 (func.now() 는 초까지만)
+    created_at = Column(DateTime, default=datetime.utcnow)
     
     user_id = Column(Integer, ForeignKey("User.User_ID"))
     owner = relationship("User", back_populates="data_points")
 
+    # 유저별 기간 조회 / 최신 N개 조회를 인덱스 범위 스캔으로 처리하기 위한 복합 인덱스
+    __table_args__ = (
+        Index("ix_data_user_id_created_at", "user_id", "created_at"),
+    )
+
 class AlertSetting(Base):
     __tablename__ = "alert_setting"
     
@@ -39,6 +47,64 @@ class AlertSetting(Base):
     temperature_threshold = Column(Integer, default=30)
     humidity_threshold = Column(Integer, default=60)
     interval_minutes = Column(Integer, default=1)
+    # 항목별 규칙: "above" (기준 이상이면 알림), "below" (기준 이하), "range" (기준 ~ upper 범위를 벗어나면)
+    pm25_rule = Column(String(10), default="above")
+    temperature_rule = Column(String(10), default="above")
+    humidity_rule = Column(String(10), default="above")
+    # "range" 규칙의 상한
+    pm25_upper_threshold = Column(Integer, nullable=True)
+    temperature_upper_threshold = Column(Integer, nullable=True)
+    humidity_upper_threshold = Column(Integer, nullable=True)
     updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
     
-    owner = relationship("User", back_populates="alert_setting")
\ No newline at end of file
+    owner = relationship("User", back_populates="alert_setting")
+
+class AlertState(Base):
+    __tablename__ = "alert_state"
+
+    # (유저, 항목)별 알림 쿨다운 상태. 재시작 후에도 interval_minutes 를 지키기 위해 저장
+    user_id = Column(Integer, ForeignKey("User.User_ID"), primary_key=True)
+    metric = Column(String(20), primary_key=True)
+    active = Column(Boolean, default=False)
+    last_sent_at = Column(DateTime, nullable=True)
+    # 지금 초과 구간에 대해 메일을 보냈는지 (이 컬럼 전에 저장된 행은 보낸 것으로 봄)
+    notified = Column(Boolean, default=True)
+    suppressed_count = Column(Integer, default=0)
+    peak_value = Column(Float, nullable=True)
+    updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
+
+class DataRollup(Base):
+    __tablename__ = "data_rollup"
+
+    # (유저, 해상도, 구간)별 누적 집계. data 에 INSERT 할 때 같이 갱신된다.
+    # bucket_epoch: 구간 시작 시각 (UTC epoch 초), resolution: "1m" / "1h" / "1d"
+    user_id = Column(Integer, ForeignKey("User.User_ID"), primary_key=True)
+    resolution = Column(String(4), primary_key=True)
+    bucket_epoch = Column(Integer, primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
+
+    temperature_sum = Column(Float)
+    temperature_min = Column(Float)
+    temperature_max = Column(Float)
+    humidity_sum = Column(Float)
+    humidity_min = Column(Float)
+    humidity_max = Column(Float)
+    pm25_sum = Column(Float)
+    pm25_min = Column(Float)
+    pm25_max = Column(Float)
+    # 항목별로 값이 있었던 행 수 (평균의 분모, 값이 None 인 행은 빠짐 = 원본 AVG() 와 같음)
+    temperature_count = Column(Integer)
+    humidity_count = Column(Integer)
+    pm25_count = Column(Integer)
+
+    # 공기질 등급별 개수 (구간 대표 등급 계산용)
+    aq_good = Column(Integer, nullable=False, default=0)
+    aq_normal = Column(Integer, nullable=False, default=0)
+    aq_bad = Column(Integer, nullable=False, default=0)
+
+class SchemaMigration(Base):
+    __tablename__ = "schema_migrations"
+
+    # 한 번만 실행하는 데이터 마이그레이션 중 적용이 끝난 것 (migrations.MIGRATIONS)
+    name = Column(String(100), primary_key=True)
+    applied_at = Column(DateTime, default=datetime.utcnow)
@@ -1,18 +1,56 @@
 # mqtt.py
-import json
-from typing import Optional
+import os
+from datetime import datetime
+from typing import Dict, List, Optional
 
+import numpy as np
 import paho.mqtt.client as mqtt
 from sqlalchemy.orm import Session
 
-from database import SessionLocal
+from database import ReadSessionLocal, SessionLocal
 import models
-from email_utils import send_alert_email
-
-MQTT_BROKER: str = "broker.hivemq.com"
-MQTT_PORT: int = 1883
+import rollups
+from email_utils import send_alert_email, get_email_stats, close_smtp_pool
+from ingest import MeasurementBatcher, Reading, insert_data_rows, readings_to_rows
+from payloads import PayloadError, decode_payload
+from alerts import AlertDispatcher, AlertEvent
+from alert_cache import alert_targets
+from alert_cooldown import alert_cooldown, AlertDecision
+from alert_rules import (
+    METRICS,
+    alert_rules,
+    compile_bounds,
+    evaluate_bounds,
+    readings_to_array,
+    violated_threshold,
+)
+from pubsub import pubsub
+from recent_buffer import recent_readings
+from relay import row_relay
+from metrics import GaugeFunc, alert_evaluations, db_commit_seconds, ingest_rows, mqtt_messages, mqtt_readings
+
+MQTT_BROKER: str = os.getenv("MQTT_BROKER", "broker.hivemq.com")
+MQTT_PORT: int = int(os.getenv("MQTT_PORT", "1883"))
 MQTT_TOPIC: str = "slide/D~HT"
 
+# 연결이 끊기거나 처음 연결에 실패하면 1초부터 두 배씩 늘려가며 (최대 이 값까지) 백그라운드에서 재연결
+MQTT_RECONNECT_MAX_SECONDS: int = int(os.getenv("MQTT_RECONNECT_MAX_SECONDS", "60"))
+
+# "batch": on_message 는 큐에 넣기만 하고 writer 스레드가 묶어서 저장 (기본값)
+# "direct": 기존처럼 메시지마다 save_measurement_to_db 호출
+MQTT_INGEST_MODE: str = os.getenv("MQTT_INGEST_MODE", "batch")
+
+# 여러 워커가 같은 토픽을 나눠 받는 경우 (coordination.py 의 MQTT_COORDINATION=shared)
+# 브로커가 그룹 안의 구독자 하나에게만 메시지를 전달
+MQTT_COORDINATION: str = os.getenv("MQTT_COORDINATION", "lock")
+MQTT_SHARED_GROUP: str = os.getenv("MQTT_SHARED_GROUP", "airzy-ingest")
+
+
+def subscription_topic() -> str:
+    if MQTT_COORDINATION == "shared":
+        return f"$share/{MQTT_SHARED_GROUP}/{MQTT_TOPIC}"
+    return MQTT_TOPIC
+
 
 def get_air_quality(pm25: float) -> str:
     """PM2.5 값으로 공기질 등급 계산"""
@@ -24,6 +62,45 @@ def get_air_quality(pm25: float) -> str:
         return "bad"
 
 
+ALERT_LABELS: Dict[str, str] = {
+    "pm25": "PM2.5",
+    "temperature": "Temperature",
+    "humidity": "Humidity",
+}
+
+ALERT_MESSAGES: Dict[str, str] = {
+    "pm25": "미세먼지(PM2.5)가 설정 기준을 초과했습니다.",
+    "temperature": "온도가 설정 기준을 초과했습니다.",
+    "humidity": "습도가 설정 기준을 초과했습니다.",
+}
+
+# "below" / "range" 규칙용 문구
+ALERT_RULE_MESSAGES: Dict[str, str] = {
+    "below": "{label} 값이 설정 기준 아래로 내려갔습니다.",
+    "range": "{label} 값이 설정 범위를 벗어났습니다.",
+}
+
+
+def format_alert_reason(decision: AlertDecision, rule: str = "above") -> str:
+    """메일 본문의 항목 하나 (쿨다운 중 억제된 초과가 있으면 요약 포함)"""
+    message = (
+        ALERT_RULE_MESSAGES[rule].format(label=ALERT_LABELS[decision.metric])
+        if rule in ALERT_RULE_MESSAGES
+        else ALERT_MESSAGES[decision.metric]
+    )
+    reason = (
+        f"{message}\n"
+        f"- 현재 값: {decision.value}\n"
+        f"- 기준 값: {decision.threshold}"
+    )
+    if decision.suppressed > 0:
+        reason += (
+            f"\n- 지난 알림 이후 추가 초과: {decision.suppressed}회"
+            f" (최고 값: {decision.peak})"
+        )
+    return reason
+
+
 def check_and_send_alert(
     db: Session,
     user_id: int,
@@ -32,107 +109,105 @@ def check_and_send_alert(
     pm25: float,
 ) -> None:
     """
-    - 해당 user_id의 AlertSetting을 읽어서
-    - pm25 / 온도 / 습도 중 하나라도 임계값 이상이면
-    - 그 유저 이메일로 알림 메일 전송
-    - ⚠ AlertSetting 값이 None이면 기본값으로 강제 사용 (응급처치)
+    db 는 조회용 (읽기 세션). 쿨다운 상태는 save_alert_state 가 따로 쓰기 세션으로 저장한다.
+    - 해당 user_id의 AlertSetting을 (캐시에서) 읽어서
+    - pm25 / 온도 / 습도 중 규칙(above / below / range)을 벗어난 항목이 있으면
+    - 항목별 쿨다운(interval_minutes)이 지난 것만 모아서 그 유저 이메일로 알림 메일 전송
+    - ⚠ AlertSetting 값이 None이면 기본값으로 강제 사용 (alert_cache.AlertTarget 참고)
     """
     try:
-        # 1) 유저 조회
-        user = (
-            db.query(models.User)
-            .filter(models.User.User_ID == user_id)
-            .first()
-        )
-        if user is None:
-            print("[ALERT] No user found for id:", user_id)
-            return
-
-        # 2) 알림 설정 조회
-        setting = (
-            db.query(models.AlertSetting)
-            .filter(models.AlertSetting.user_id == user_id)
-            .first()
-        )
-        if setting is None:
-            print("[ALERT] No AlertSetting for user:", user_id)
+        # 1) 유저 + 알림 설정 조회 (캐시 hit 이면 DB 조회 없음)
+        target = alert_targets.get(db, user_id)
+        if target is None:
+            alert_evaluations.labels("no_target").inc()
             return
 
-        # ⚠ 여기서 None 이면 기본값 강제 적용 (응급용 하드코딩)
-        pm25_threshold = (
-            float(setting.pm25_threshold)
-            if setting.pm25_threshold is not None
-            else 50.0
-        )
-        temp_threshold = (
-            float(setting.temperature_threshold)
-            if setting.temperature_threshold is not None
-            else 1.0    # 🔥 온도 기준이 None이면 무조건 1도로 사용
-        )
-        humi_threshold = (
-            float(setting.humidity_threshold)
-            if setting.humidity_threshold is not None
-            else 40.0
-        )
-
-        # 디버깅용: 현재 값과 임계값 로그
+        # 디버깅용: 현재 값과 규칙 로그
         print(
             "[ALERT] Current values  -> "
             f"temp={temperature}, humi={humidity}, pm25={pm25}"
         )
         print(
-            "[ALERT] Thresholds(fixed) -> "
-            f"temp={temp_threshold}, humi={humi_threshold}, pm25={pm25_threshold}"
+            "[ALERT] Rules -> "
+            + ", ".join(f"{metric}={target.rule(metric)}" for metric in METRICS)
         )
 
-        alert_reason: Optional[str] = None
-
-        # 1) 미세먼지 기준
-        if pm25 is not None:
-            if pm25 >= pm25_threshold:
-                alert_reason = (
-                    f"미세먼지(PM2.5)가 설정 기준을 초과했습니다.\n"
-                    f"- 현재 값: {pm25}\n"
-                    f"- 기준 값: {pm25_threshold}"
-                )
-                print("[ALERT] PM2.5 threshold exceeded")
-
-        # 2) 온도 기준 (아직 알림 안 잡혔을 때만)
-        if alert_reason is None and temperature is not None:
-            if temperature >= temp_threshold:
-                alert_reason = (
-                    f"온도가 설정 기준을 초과했습니다.\n"
-                    f"- 현재 값: {temperature}\n"
-                    f"- 기준 값: {temp_threshold}"
-                )
-                print("[ALERT] Temperature threshold exceeded")
-
-        # 3) 습도 기준
-        if alert_reason is None and humidity is not None:
-            if humidity >= humi_threshold:
-                alert_reason = (
-                    f"습도가 설정 기준을 초과했습니다.\n"
-                    f"- 현재 값: {humidity}\n"
-                    f"- 기준 값: {humi_threshold}"
-                )
-                print("[ALERT] Humidity threshold exceeded")
-
-        # 어느 기준도 넘지 않았으면 메일 X
-        if alert_reason is None:
-            print("[ALERT] No threshold exceeded. No email.")
+        # alert_rules 와 같은 방식으로 항목 전부를 한 번에 평가 (초과한 항목 전부 보고)
+        readings = {"pm25": pm25, "temperature": temperature, "humidity": humidity}
+        values = np.array(
+            [[np.nan if readings[m] is None else readings[m] for m in METRICS]], dtype=np.float64
+        )
+        breached, cleared = evaluate_bounds(
+            compile_bounds([target], alert_cooldown.hysteresis_ratio), values
+        )
+
+        # 항목별로 쿨다운(interval_minutes) + 히스테리시스 적용
+        # 쿨다운 중인 초과는 억제되고, 다음 메일에 횟수/최고값으로 합쳐서 안내
+        reasons: List[str] = []
+        decisions: List[AlertDecision] = []
+        suppressed = False
+        for j, metric in enumerate(METRICS):
+            value = readings[metric]
+            if value is None:
+                continue
+            rule = target.rule(metric)[0]
+            decision = alert_cooldown.evaluate(
+                db,
+                user_id,
+                metric,
+                value,
+                violated_threshold(target, metric, value),
+                target.interval_minutes,
+                breached=bool(breached[0, j]),
+                cleared=bool(cleared[0, j]),
+            )
+            if not breached[0, j]:
+                continue
+
+            print(f"[ALERT] {ALERT_LABELS[metric]} rule '{rule}' breached")
+            if decision is None:
+                print(f"[ALERT] {ALERT_LABELS[metric]} suppressed (cooldown)")
+                suppressed = True
+                continue
+            decisions.append(decision)
+            reasons.append(format_alert_reason(decision, rule))
+
+        # 어느 기준도 넘지 않았거나 전부 쿨다운 중이면 메일 X (상태는 flush_interval 마다 모아서 저장)
+        if not reasons:
+            if alert_cooldown.flush_due():
+                save_alert_state()
+            print("[ALERT] No alert to send.")
+            alert_evaluations.labels("suppressed" if suppressed else "below").inc()
             return
 
+        alert_reason = "\n\n".join(reasons)
+
         subject = "[AIRZY] 공기질 알림"
         body = (
-            f"{user.username}님,\n\n"
+            f"{target.username}님,\n\n"
             f"{alert_reason}\n\n"
             "실내 공기 상태를 확인해 주세요."
         )
 
         # email_utils.py 의 send_alert_email 사용
-        send_alert_email(user.useremail, subject, body)
+        # 보내지 못했으면 evaluate 가 기록한 전송을 되돌려서 같은 구간의 다음 초과 때 다시 보냄
+        sent = False
+        try:
+            sent = send_alert_email(target.useremail, subject, body)
+        finally:
+            if not sent:
+                for decision in decisions:
+                    alert_cooldown.send_failed(user_id, decision)
+            # 전송 결과까지 반영한 상태를 바로 저장
+            save_alert_state()
+        if not sent:
+            alert_evaluations.labels("email_failed").inc()
+            print("[ALERT] 알림 메일 전송 실패 (다음 초과 때 다시 시도)")
+            return
+        alert_evaluations.labels("email").inc()
 
     except Exception as e:
+        alert_evaluations.labels("error").inc()
         # 알림 처리 중 에러가 나도 MQTT 저장 자체는 실패시키지 않도록 로깅만
         print("[ALERT] 알림 처리 중 오류:", e)
 
@@ -168,69 +243,314 @@ def save_measurement_to_db(
             pm25=pm25,
             air_quality=air_quality,
             user_id=user_id,
+            created_at=datetime.utcnow(),
         )
         db.add(new_data)
-        db.commit()
+        with db_commit_seconds.labels("mqtt_direct").time():
+            rollups.apply_rows(db, [rollups.row_from_data(new_data)])
+            db.commit()
+        ingest_rows.labels("mqtt_direct").inc()
         db.refresh(new_data)
+        row_relay.publish_data([new_data])
+
+    except Exception as e:
+        db.rollback()
+        print("[MQTT] DB error:", e)
+        return
+    finally:
+        # 알림 처리가 쓰기 세션을 다시 열 수 있으므로 (워커가 없으면 이 스레드에서 바로) 먼저 닫는다
+        db.close()
+
+    # 저장 성공 후 알림 기준 체크 + 이메일 전송은 알림 워커에 맡김
+    alert_flushed_rows([{
+        "user_id": user_id,
+        "temperature": temperature,
+        "humidity": humidity,
+        "pm25": pm25,
+    }])
 
-        # 저장 성공 후 알림 기준 체크 + 이메일 전송 시도
-        check_and_send_alert(
-            db=db,
-            user_id=user_id,
-            temperature=temperature,
-            humidity=humidity,
-            pm25=pm25,
-        )
 
+def save_readings_to_db(readings: List[Reading]) -> None:
+    """
+    메시지 하나에 담긴 여러 측정값을 한 트랜잭션으로 저장 (direct 모드).
+    저장 후 처리는 배치 모드의 flush 와 같음 (handle_flushed_rows)
+    """
+    db: Session = SessionLocal()
+    try:
+        rows = readings_to_rows(db, readings)
+        if not rows:
+            return
+        with db_commit_seconds.labels("mqtt_direct").time():
+            insert_data_rows(db, rows)
+            rollups.apply_rows(db, rows)
+            db.commit()
+        ingest_rows.labels("mqtt_direct").inc(len(rows))
+        print(f"[MQTT] Saved {len(rows)} readings")
     except Exception as e:
         db.rollback()
         print("[MQTT] DB error:", e)
+        return
+    finally:
+        db.close()
+
+    handle_flushed_rows(rows)
+
+
+def handle_alert_event(event: AlertEvent) -> None:
+    """알림 워커 스레드에서 호출: 이벤트 하나에 대해 알림 기준 체크 + 메일 전송"""
+    # 설정 / 쿨다운 상태 조회는 읽기 풀에서 (쓰기 커넥션은 적재가 쓰도록 비워 둠)
+    db: Session = ReadSessionLocal()
+    try:
+        check_and_send_alert(
+            db=db,
+            user_id=event.user_id,
+            temperature=event.temperature,
+            humidity=event.humidity,
+            pm25=event.pm25,
+        )
+    finally:
+        db.close()
+
+
+def save_alert_state() -> None:
+    """메모리의 알림 쿨다운 상태를 alert_state 에 저장 (짧게 쓰기 세션을 열고 바로 닫음)"""
+    db: Session = SessionLocal()
+    try:
+        alert_cooldown.flush(db)
     finally:
         db.close()
 
 
-def on_connect(client: mqtt.Client, userdata, flags, rc):
-    if rc == 0:
+_alert_dispatcher: Optional[AlertDispatcher] = None
+
+
+def submit_alert(
+    user_id: int,
+    temperature: float,
+    humidity: float,
+    pm25: float,
+) -> None:
+    """알림 체크를 큐에 넣는다. 워커가 없으면(시작 전) 호출한 스레드에서 바로 처리."""
+    event = AlertEvent(
+        user_id=user_id,
+        temperature=temperature,
+        humidity=humidity,
+        pm25=pm25,
+    )
+    if _alert_dispatcher is None:
+        handle_alert_event(event)
+        return
+    _alert_dispatcher.submit(event)
+
+
+# shared 모드에서는 모든 워커가 측정값을 받아 저장하지만 알림(쿨다운 상태, 메일 전송)은 리더 워커 하나만 맡는다.
+# 리더는 자기가 저장한 행 + row_relay 가 읽어온 다른 워커의 행을 평가 (coordination.leader_duties 가 켜고 끔)
+_alerts_enabled: bool = MQTT_COORDINATION != "shared"
+
+
+def start_leader_alerts() -> None:
+    """shared 모드에서 리더가 되었을 때: 다른 워커가 저장한 행까지 이 프로세스에서 알림 평가"""
+    global _alerts_enabled
+    start_ingest_workers()
+    # 이전 리더가 저장한 쿨다운 상태부터 다시 읽음
+    alert_cooldown.reset()
+    row_relay.add_listener(alert_flushed_rows)
+    _alerts_enabled = True
+
+
+def stop_leader_alerts() -> None:
+    global _alerts_enabled
+    _alerts_enabled = False
+    row_relay.remove_listener(alert_flushed_rows)
+    # 다음 리더가 이어받도록 쿨다운 상태 저장
+    save_alert_state()
+
+
+def alert_flushed_rows(rows: List[dict]) -> None:
+    """
+    배치 저장이 끝난 뒤 배치 전체를 alert_rules 로 한 번에 평가해서
+    규칙을 벗어났거나 (초과 중인 항목이) 해제될 수 있는 행만 알림 큐에 넣는다.
+    """
+    if not rows or not _alerts_enabled:
+        return
+    try:
+        user_ids, values = readings_to_array(rows)
+        result = alert_rules.evaluate(user_ids, values)
+    except Exception as e:
+        print("[ALERT] 알림 규칙 평가 오류:", e)
+        return
+
+    candidates = result.breached.any(axis=1)
+    active = alert_cooldown.active_user_ids()
+    if active:
+        candidates |= result.cleared.any(axis=1) & np.isin(user_ids, list(active))
+
+    for i in np.flatnonzero(candidates):
+        row = rows[i]
+        submit_alert(row["user_id"], row["temperature"], row["humidity"], row["pm25"])
+
+
+def handle_flushed_rows(rows: List[dict]) -> None:
+    """배치 저장 후 훅: 최근값 버퍼 + 구독 중인 대시보드에 전달 + 알림 체크"""
+    row_relay.publish_rows(rows)
+    alert_flushed_rows(rows)
+
+
+_batcher: Optional[MeasurementBatcher] = None
+
+
+def _queue_depths() -> Dict[tuple, int]:
+    depths: Dict[tuple, int] = {}
+    if _batcher is not None:
+        depths[("ingest",)] = _batcher.stats()["queue_depth"]
+    if _alert_dispatcher is not None:
+        depths[("alerts",)] = _alert_dispatcher.stats()["queue_depth"]
+    return depths
+
+
+GaugeFunc("airzy_queue_depth", "Items waiting in background queues", _queue_depths, ["queue"])
+
+
+def get_ingest_stats() -> Dict[str, object]:
+    """배치 적재 카운터 (batched / flushed / dropped 등) + 알림 큐 상태"""
+    stats: Dict[str, object] = {"mode": MQTT_INGEST_MODE, "mqtt": get_mqtt_status()}
+    if _batcher is not None:
+        stats.update(_batcher.stats())
+    if _alert_dispatcher is not None:
+        stats["alerts"] = _alert_dispatcher.stats()
+    stats["email"] = get_email_stats()
+    stats["alert_rules"] = alert_rules.stats()
+    stats["pubsub"] = pubsub.stats()
+    stats["recent_buffer"] = recent_readings.stats()
+    return stats
+
+
+# 브로커 연결 상태 (/ready, /ingest/stats)
+# "stopped" -> start_mqtt() -> "connecting" -> "connected" <-> "reconnecting"
+_connection: Dict[str, object] = {
+    "state": "stopped",
+    "connected_since": None,
+    "connects": 0,
+    "disconnects": 0,
+    "last_error": None,
+}
+
+
+def get_mqtt_status() -> Dict[str, object]:
+    status = dict(_connection)
+    status["broker"] = f"{MQTT_BROKER}:{MQTT_PORT}"
+    status["live"] = status["state"] == "connected"
+    return status
+
+
+GaugeFunc(
+    "airzy_mqtt_connected",
+    "1 while this process is connected to the MQTT broker",
+    lambda: 1 if _connection["state"] == "connected" else 0,
+)
+
+
+def on_connect(client: mqtt.Client, userdata, flags, reason_code, properties=None):
+    if not reason_code.is_failure:
         print("[MQTT] Connected to broker")
-        client.subscribe(MQTT_TOPIC)
-        print(f"[MQTT] Subscribed to topic: {MQTT_TOPIC}")
+        topic = subscription_topic()
+        client.subscribe(topic)
+        print(f"[MQTT] Subscribed to topic: {topic}")
+        _connection.update(state="connected", connected_since=datetime.utcnow(), last_error=None)
+        _connection["connects"] += 1
     else:
-        print(f"[MQTT] Connection failed with code {rc}")
+        # 인증 실패 등: paho 가 reconnect_delay_set 간격으로 다시 시도
+        print(f"[MQTT] Connection failed: {reason_code}")
+        _connection.update(state="reconnecting", last_error=str(reason_code))
 
 
-def on_message(client: mqtt.Client, userdata, msg: mqtt.MQTTMessage):
-    try:
-        payload_str = msg.payload.decode("utf-8")
-        payload = json.loads(payload_str)
-        print(f"[MQTT] Received on {msg.topic}: {payload}")
+def on_disconnect(client: mqtt.Client, userdata, flags, reason_code, properties=None):
+    if _client is None:
+        return  # stop_mqtt() 로 끊은 경우
+    if _connection["state"] == "connected":
+        # 연결돼 있다가 끊긴 경우만 출력 (연결 실패는 조용히 재시도)
+        print(f"[MQTT] Disconnected ({reason_code}), reconnecting in background")
+        _connection["disconnects"] += 1
+    _connection.update(state="reconnecting", connected_since=None, last_error=str(reason_code))
 
-        # raw 값 먼저 꺼내서 None 여부 검사
-        temp_raw = payload.get("temperature")
-        humi_raw = payload.get("humidity")
-        pm25_raw = payload.get("pm25")
 
-        if temp_raw is None or humi_raw is None or pm25_raw is None:
-            print("[MQTT] Missing fields in payload. Skip.")
-            return
+def on_connect_fail(client: mqtt.Client, userdata):
+    # 브로커에 닿지 않음 (DNS / TCP 실패)
+    _connection.update(state="reconnecting", last_error="connect failed")
 
-        temperature = float(temp_raw)
-        humidity = float(humi_raw)
-        pm25 = float(pm25_raw)
 
-        save_measurement_to_db(
-            temperature=temperature,
-            humidity=humidity,
-            pm25=pm25,
-            user_id=None,  # None이면 save_measurement_to_db에서 첫 번째 유저 사용
-        )
+def on_message(client: mqtt.Client, userdata, msg: mqtt.MQTTMessage):
+    mqtt_messages.labels("received").inc()
+    try:
+        # JSON / MessagePack / 바이너리, 측정값 하나 또는 여러 개 (payloads.py)
+        decoded = decode_payload(msg.payload)
+        if _batcher is None:
+            print(f"[MQTT] Received {len(decoded.readings)} reading(s) ({decoded.format}) on {msg.topic}")
+        if decoded.invalid:
+            print(f"[MQTT] Missing or invalid fields in {decoded.invalid} reading(s). Skip.")
+        if not decoded.readings:
+            mqtt_messages.labels("failed").inc()
+            return
+        mqtt_messages.labels("parsed").inc()
+        mqtt_readings.labels(decoded.format).inc(len(decoded.readings))
+
+        received_at = datetime.utcnow()
+        readings = [
+            Reading(
+                temperature=r.temperature,
+                humidity=r.humidity,
+                pm25=r.pm25,
+                air_quality=get_air_quality(r.pm25),
+                created_at=r.created_at or received_at,
+            )
+            for r in decoded.readings
+        ]
+
+        if _batcher is not None:
+            # 배치 모드: 파싱 결과만 큐에 넣고 바로 반환 (DB 작업은 writer 스레드에서)
+            # 큐가 가득 차면 버려지고 dropped 카운터만 증가
+            _batcher.submit_many(readings)
+            return
+
+        first = decoded.readings[0]
+        if len(readings) == 1 and first.created_at is None:
+            save_measurement_to_db(
+                temperature=first.temperature,
+                humidity=first.humidity,
+                pm25=first.pm25,
+                user_id=None,  # None이면 save_measurement_to_db에서 첫 번째 유저 사용
+            )
+            return
+        # 여러 개 / 기기 시각이 있는 측정값은 한 번에 INSERT
+        save_readings_to_db(readings)
 
+    except PayloadError as e:
+        mqtt_messages.labels("failed").inc()
+        print("[MQTT] Unreadable payload:", e)
     except Exception as e:
+        mqtt_messages.labels("failed").inc()
         print("[MQTT] Error handling message:", e)
 
 
 _client: Optional[mqtt.Client] = None
 
 
+def start_ingest_workers() -> None:
+    """
+    알림 워커 + (배치 모드) writer 스레드를 시작한다.
+    브로커 없이 on_message 를 직접 호출하는 경우(벤치마크 등)에도 사용.
+    """
+    global _batcher, _alert_dispatcher
+
+    if _alert_dispatcher is None:
+        _alert_dispatcher = AlertDispatcher(handler=handle_alert_event, worse=alert_rules.worse)
+        _alert_dispatcher.start()
+
+    if MQTT_INGEST_MODE == "batch" and _batcher is None:
+        _batcher = MeasurementBatcher(on_flushed=handle_flushed_rows)
+        _batcher.start()
+
+
 def start_mqtt() -> None:
     """애플리케이션 시작 시 한 번만 호출해서 MQTT 클라이언트를 구동한다."""
     global _client
@@ -239,12 +559,44 @@ def start_mqtt() -> None:
         # 이미 시작되어 있으면 재시작하지 않음
         return
 
-    client = mqtt.Client()
+    start_ingest_workers()
+
+    client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2)
     client.on_connect = on_connect
+    client.on_disconnect = on_disconnect
+    client.on_connect_fail = on_connect_fail
     client.on_message = on_message
+    client.reconnect_delay_set(min_delay=1, max_delay=MQTT_RECONNECT_MAX_SECONDS)
 
-    client.connect(MQTT_BROKER, MQTT_PORT, keepalive=60)
+    # 연결은 loop 스레드에서 (브로커가 없거나 느려도 서버 시작을 막지 않음)
+    _connection.update(state="connecting", connected_since=None)
+    client.connect_async(MQTT_BROKER, MQTT_PORT, keepalive=60)
+    _client = client
     client.loop_start()
+    print(f"[MQTT] MQTT client started (connecting to {MQTT_BROKER}:{MQTT_PORT} in background)")
 
-    _client = client
-    print("[MQTT] MQTT client started")
+
+def stop_mqtt() -> None:
+    """애플리케이션 종료 시 MQTT 루프를 멈추고 큐에 남은 측정값을 flush 한다."""
+    global _client, _batcher, _alert_dispatcher
+
+    if _client is not None:
+        client, _client = _client, None
+        client.disconnect()
+        client.loop_stop()
+        _connection.update(state="stopped", connected_since=None)
+
+    if _batcher is not None:
+        _batcher.stop()
+        _batcher = None
+
+    # 적재가 끝난 뒤 알림 워커 정리 (flush 중 들어온 알림까지 처리)
+    if _alert_dispatcher is not None:
+        _alert_dispatcher.stop()
+        _alert_dispatcher = None
+
+    close_smtp_pool()
+
+    # 아직 저장하지 않은 알림 쿨다운 상태 저장
+    save_alert_state()
+    print("[MQTT] MQTT client stopped")
@@ -0,0 +1,92 @@
+# passwords.py
+import asyncio
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import Optional, Tuple
+
+from passlib.context import CryptContext
+
+# pbkdf2_sha256 반복 횟수. 올리면 이보다 낮은 횟수로 저장된 해시는 다음 로그인 때 다시 해시된다.
+PBKDF2_ROUNDS: int = int(os.getenv("PBKDF2_ROUNDS", "29000"))
+# 이 서버의 uvicorn / gunicorn 워커 프로세스 수 (uvicorn --workers 도 이 환경변수를 읽음)
+WEB_CONCURRENCY: int = int(os.getenv("WEB_CONCURRENCY", "1"))
+# 워커 하나가 기본으로 띄우는 해시 프로세스 상한
+PASSWORD_HASH_WORKERS_CAP: int = 2
+
+
+def default_hash_workers(cpu_count: Optional[int] = None, web_workers: int = WEB_CONCURRENCY) -> int:
+    """
+    워커마다 풀을 따로 만들기 때문에 코어를 워커 수로 나눠 갖는다 (최소 1, 최대 PASSWORD_HASH_WORKERS_CAP).
+    예: 8코어에 워커 4개 -> 워커당 2개, 워커 8개 -> 1개
+    """
+    cores = cpu_count if cpu_count is not None else (os.cpu_count() or 1)
+    return max(1, min(PASSWORD_HASH_WORKERS_CAP, cores // max(1, web_workers)))
+
+
+# 해시 계산 전용 프로세스 수 (워커 하나 기준, 0 이면 프로세스 풀 없이 스레드풀에서 계산)
+PASSWORD_HASH_WORKERS: int = int(os.getenv("PASSWORD_HASH_WORKERS", str(default_hash_workers())))
+
+# ✅ bcrypt 대신 pbkdf2_sha256 사용 (추가 설치 필요 없음)
+pwd_context = CryptContext(
+    schemes=["pbkdf2_sha256"],
+    deprecated="auto",
+    pbkdf2_sha256__default_rounds=PBKDF2_ROUNDS,
+    # 반복 횟수가 이보다 적은 기존 해시는 needs_update -> 로그인 성공 시 재해시
+    pbkdf2_sha256__min_rounds=PBKDF2_ROUNDS,
+)
+
+
+def verify_password(plain_password: str, hashed_password: str) -> bool:
+    return pwd_context.verify(plain_password, hashed_password)
+
+
+def get_password_hash(password: str) -> str:
+    return pwd_context.hash(password)
+
+
+def verify_and_update(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """(일치 여부, 새 해시). 해시 설정이 바뀌어 다시 저장해야 하면 새 해시, 아니면 None"""
+    return pwd_context.verify_and_update(plain_password, hashed_password)
+
+
+_executor: Optional[Executor] = None
+_executor_lock = threading.Lock()
+
+
+def get_hash_executor() -> Optional[Executor]:
+    """해시 계산용 프로세스 풀 (처음 쓸 때 생성). PASSWORD_HASH_WORKERS=0 이면 None"""
+    global _executor
+    if PASSWORD_HASH_WORKERS <= 0:
+        return None
+    with _executor_lock:
+        if _executor is None:
+            # fork 는 MQTT / 이벤트 루프 스레드가 있는 프로세스를 복제하므로 spawn 사용
+            _executor = ProcessPoolExecutor(
+                max_workers=PASSWORD_HASH_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _executor
+
+
+async def hash_password(password: str) -> str:
+    """get_password_hash 를 해시 전용 프로세스에서 실행 (요청 스레드/이벤트 루프를 막지 않음)"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_hash_executor(), get_password_hash, password)
+
+
+async def check_password(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """verify_and_update 를 해시 전용 프로세스에서 실행"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        get_hash_executor(), verify_and_update, plain_password, hashed_password
+    )
+
+
+def shutdown_hash_executor() -> None:
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=True, cancel_futures=True)
+            _executor = None
@@ -0,0 +1,194 @@
+# payloads.py
+"""
+MQTT 측정값 페이로드 디코딩. 메시지마다 첫 바이트로 형식을 판별한다.
+
+1) JSON (첫 글자 "{" 또는 "[")
+   - 측정값 하나:   {"temperature": 23.1, "humidity": 40, "pm25": 12, "ts": 1760000000}
+   - 여러 개:       [{...}, {...}]  또는  {"readings": [{...}, {...}]}
+   - 기기 시각(선택): "ts" (epoch 초, UTC) 또는 "created_at" (ISO 8601). 없으면 서버 수신 시각
+2) MessagePack (map / array) : JSON 과 같은 구조
+3) 고정 struct 바이너리 (첫 두 바이트 b"AZ", 리틀 엔디언)
+   - 헤더 8바이트  <2sBBI : b"AZ", 버전(1), 측정값 수(1~255), base_ts (epoch 초, 0 = 기기 시계 없음)
+   - 측정값 8바이트 <HhHH : base_ts 기준 초, 온도 x100, 습도 x100, PM2.5 x10
+   - base_ts 가 0 이면 마지막 측정값을 수신 시각으로 보고 나머지는 offset 차이만큼 이전 시각
+   -> 1분치 60개가 488 바이트 (JSON 한 개씩이면 60번 publish)
+"""
+import json
+import math
+import os
+import struct
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Iterable, List, NamedTuple, Optional, Sequence
+
+import msgpack
+import numpy as np
+
+try:
+    import orjson
+
+    _json_loads = orjson.loads
+except ImportError:
+    _json_loads = json.loads
+
+# 기기가 보낸 시각이 서버 시각보다 이만큼 넘게 미래면 그 측정값은 버림 (/measurement/batch 와 같은 설정)
+PAYLOAD_MAX_CLOCK_SKEW_SECONDS: float = float(os.getenv("MEASUREMENT_MAX_CLOCK_SKEW_SECONDS", "300"))
+
+BINARY_MAGIC = b"AZ"
+BINARY_VERSION = 1
+BINARY_HEADER = struct.Struct("<2sBBI")
+BINARY_RECORD = np.dtype([
+    ("offset", "<u2"),
+    ("temperature", "<i2"),
+    ("humidity", "<u2"),
+    ("pm25", "<u2"),
+])
+BINARY_MAX_READINGS = 255
+
+_EPOCH = datetime(1970, 1, 1)
+# msgpack 의 map / array 시작 바이트 (fixmap, fixarray, array16/32, map16/32)
+_MSGPACK_FIRST = frozenset(range(0x80, 0xA0)) | {0xDC, 0xDD, 0xDE, 0xDF}
+_JSON_FIRST = frozenset(b"{[ \t\r\n")
+
+
+class PayloadError(ValueError):
+    """메시지 전체를 해석할 수 없음 (형식을 모르거나 깨진 경우)"""
+
+
+class DecodedReading(NamedTuple):
+    temperature: float
+    humidity: float
+    pm25: float
+    created_at: Optional[datetime]  # naive UTC, 기기 시각이 없으면 None
+
+
+@dataclass
+class DecodedPayload:
+    format: str                   # "json" | "msgpack" | "binary"
+    readings: List[DecodedReading]
+    invalid: int = 0              # 필드가 빠졌거나 값 / 시각이 잘못되어 버린 측정값 수
+
+
+def decode_payload(data: bytes, now: Optional[datetime] = None) -> DecodedPayload:
+    if not data:
+        raise PayloadError("empty payload")
+    now = now or datetime.utcnow()
+    max_created_at = now + timedelta(seconds=PAYLOAD_MAX_CLOCK_SKEW_SECONDS)
+
+    if data[:2] == BINARY_MAGIC:
+        return _decode_binary(data, now, max_created_at)
+
+    first = data[0]
+    if first in _JSON_FIRST:
+        try:
+            obj = _json_loads(data)
+        except ValueError as e:
+            raise PayloadError(f"invalid JSON: {e}") from None
+        fmt = "json"
+    elif first in _MSGPACK_FIRST:
+        try:
+            obj = msgpack.unpackb(data, raw=False)
+        except (ValueError, msgpack.UnpackException) as e:
+            raise PayloadError(f"invalid MessagePack: {e or type(e).__name__}") from None
+        fmt = "msgpack"
+    else:
+        raise PayloadError(f"unknown payload format (first byte 0x{first:02x})")
+
+    if isinstance(obj, dict) and "readings" in obj:
+        obj = obj["readings"]
+    items = obj if isinstance(obj, list) else [obj]
+    return _decode_items(fmt, items, max_created_at)
+
+
+def _measurement(value: object, signed: bool = False) -> float:
+    """
+    유한한 숫자만. 습도 / PM2.5 는 0 이상 (signed=True 인 온도는 영하도 허용:
+    기존 MQTT 수신과 바이너리 형식(<i2)이 음수 온도를 받으므로 HTTP 스키마의 ge=0 과 다름)
+    """
+    if value is None or isinstance(value, bool):
+        raise ValueError("not a number")
+    value = float(value)
+    if not math.isfinite(value) or (value < 0 and not signed):
+        raise ValueError("out of range")
+    return value
+
+
+def _decode_items(fmt: str, items: Iterable[object], max_created_at: datetime) -> DecodedPayload:
+    readings: List[DecodedReading] = []
+    invalid = 0
+    for item in items:
+        try:
+            temperature = _measurement(item["temperature"], signed=True)
+            humidity = _measurement(item["humidity"])
+            pm25 = _measurement(item["pm25"])
+            created_at = _parse_created_at(item)
+            if created_at is not None and created_at > max_created_at:
+                raise ValueError("created_at in the future")
+            readings.append(DecodedReading(temperature, humidity, pm25, created_at))
+        except (KeyError, TypeError, ValueError, OverflowError):
+            invalid += 1
+    return DecodedPayload(fmt, readings, invalid)
+
+
+def _parse_created_at(item: dict) -> Optional[datetime]:
+    ts = item.get("ts")
+    if ts is not None:
+        return _EPOCH + timedelta(seconds=float(ts))
+    created_at = item.get("created_at")
+    if created_at is None:
+        return None
+    value = datetime.fromisoformat(created_at)
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def _decode_binary(data: bytes, now: datetime, max_created_at: datetime) -> DecodedPayload:
+    if len(data) < BINARY_HEADER.size:
+        raise PayloadError("binary payload shorter than header")
+    _, version, count, base_ts = BINARY_HEADER.unpack_from(data)
+    if version != BINARY_VERSION:
+        raise PayloadError(f"unsupported binary payload version {version}")
+    if len(data) != BINARY_HEADER.size + count * BINARY_RECORD.itemsize:
+        raise PayloadError(f"binary payload length does not match {count} readings")
+
+    # 측정값 배열 전체를 한 번에 변환 (측정값마다 struct.unpack 하지 않음)
+    records = np.frombuffer(data, dtype=BINARY_RECORD, count=count, offset=BINARY_HEADER.size)
+    offsets = records["offset"].tolist()
+    temperatures = (records["temperature"] / 100.0).tolist()
+    humidities = (records["humidity"] / 100.0).tolist()
+    pm25s = (records["pm25"] / 10.0).tolist()
+
+    if base_ts:
+        base = _EPOCH + timedelta(seconds=base_ts)
+    else:
+        # 기기 시계 없음: 마지막 측정값 = 수신 시각
+        base = now - timedelta(seconds=max(offsets, default=0))
+
+    readings: List[DecodedReading] = []
+    invalid = 0
+    for offset, temperature, humidity, pm25 in zip(offsets, temperatures, humidities, pm25s):
+        created_at = base + timedelta(seconds=offset)
+        # 정수 필드라 항상 유한함. 온도(<i2)는 영하도 그대로 저장
+        if created_at > max_created_at:
+            invalid += 1
+            continue
+        readings.append(DecodedReading(temperature, humidity, pm25, created_at))
+    return DecodedPayload("binary", readings, invalid)
+
+
+def encode_binary(readings: Sequence[Sequence[float]], base_ts: int = 0) -> bytes:
+    """
+    (offset 초, 온도, 습도, PM2.5) 목록 -> 바이너리 페이로드 (기기 펌웨어 / 테스트 / 벤치마크용).
+    base_ts 가 0 이면 기기 시계 없음 (마지막 측정값 = 수신 시각)
+    """
+    if not 1 <= len(readings) <= BINARY_MAX_READINGS:
+        raise ValueError(f"binary payload holds 1..{BINARY_MAX_READINGS} readings")
+    records = np.array(
+        [
+            (offset, round(temperature * 100), round(humidity * 100), round(pm25 * 10))
+            for offset, temperature, humidity, pm25 in readings
+        ],
+        dtype=BINARY_RECORD,
+    )
+    return BINARY_HEADER.pack(BINARY_MAGIC, BINARY_VERSION, len(readings), base_ts) + records.tobytes()
@@ -0,0 +1,177 @@
+# pubsub.py
+import asyncio
+import json
+import os
+import threading
+from collections import deque
+from datetime import datetime
+from typing import Deque, Dict, Iterable, List, Optional, Set, Tuple
+
+import models
+
+# 구독자(대시보드 연결) 하나가 쌓아둘 수 있는 최대 메시지 수
+PUBSUB_CLIENT_BUFFER: int = int(os.getenv("PUBSUB_CLIENT_BUFFER", "256"))
+# 버퍼가 가득 찼을 때 (느린 구독자)
+# - "drop_old": 가장 오래된 메시지를 버리고 새 메시지를 넣음 (기본값)
+# - "drop_new": 새 메시지를 버림
+# - "disconnect": 연결을 끊음 (클라이언트가 다시 연결해서 /graph 로 동기화)
+PUBSUB_OVERFLOW_POLICY: str = os.getenv("PUBSUB_OVERFLOW_POLICY", "drop_old")
+
+POINT_FIELDS = ("id", "created_at", "temperature", "humidity", "pm25", "air_quality", "note")
+
+
+def _encode_points(points: List[dict]) -> str:
+    """구독자 수와 관계없이 메시지당 한 번만 JSON 으로 만든다"""
+    return json.dumps(
+        [
+            {k: (v.isoformat() if isinstance(v, datetime) else v) for k, v in p.items()}
+            for p in points
+        ],
+        ensure_ascii=False,
+        separators=(",", ":"),
+    )
+
+
+class Subscription:
+    """
+    구독자 하나의 버퍼. push() 는 아무 스레드에서나 (MQTT writer 스레드 등),
+    get() 은 구독자를 만든 이벤트 루프에서 호출한다.
+    """
+
+    def __init__(
+        self,
+        user_id: int,
+        loop: asyncio.AbstractEventLoop,
+        max_size: int = PUBSUB_CLIENT_BUFFER,
+        overflow_policy: str = PUBSUB_OVERFLOW_POLICY,
+    ) -> None:
+        self.user_id = user_id
+        self.max_size = max(1, max_size)
+        self.overflow_policy = overflow_policy
+        self.closed = False
+
+        self._loop = loop
+        self._lock = threading.Lock()
+        self._buffer: Deque[str] = deque()
+        self._ready = asyncio.Event()
+        self._dropped = 0
+
+    def push(self, message: str) -> Tuple[bool, bool]:
+        """메시지를 버퍼에 넣는다. (넣었는지, 새 것이든 오래된 것이든 메시지를 버렸는지)"""
+        with self._lock:
+            if self.closed:
+                return False, True
+            accepted = True
+            overflow = len(self._buffer) >= self.max_size
+            if overflow:
+                self._dropped += 1
+                if self.overflow_policy == "drop_new":
+                    accepted = False
+                elif self.overflow_policy == "disconnect":
+                    self.closed = True
+                    accepted = False
+                else:
+                    self._buffer.popleft()
+            if accepted:
+                self._buffer.append(message)
+        self._wake()
+        return accepted, overflow
+
+    def close(self) -> None:
+        with self._lock:
+            self.closed = True
+        self._wake()
+
+    async def get(self, timeout: float) -> Optional[Tuple[List[str], int]]:
+        """
+        쌓인 메시지를 전부 꺼낸다: (메시지들, 그 사이 버려진 개수).
+        timeout 동안 아무것도 없으면 None.
+        """
+        try:
+            await asyncio.wait_for(self._ready.wait(), timeout)
+        except asyncio.TimeoutError:
+            return None
+        with self._lock:
+            self._ready.clear()
+            messages = list(self._buffer)
+            self._buffer.clear()
+            dropped, self._dropped = self._dropped, 0
+        return messages, dropped
+
+    def _wake(self) -> None:
+        try:
+            self._loop.call_soon_threadsafe(self._ready.set)
+        except RuntimeError:
+            # 이벤트 루프가 이미 닫힘 (서버 종료 중)
+            pass
+
+
+class PubSub:
+    """
+    user_id 별 새 측정값 fan-out (프로세스 안에서만).
+    저장이 끝난 뒤 publish_rows / publish_data 를 호출하면 그 유저의 구독자 전부에게 전달.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._subscribers: Dict[int, Set[Subscription]] = {}
+        self._stats: Dict[str, int] = {"published": 0, "delivered": 0, "dropped": 0}
+
+    def subscribe(self, user_id: int) -> Subscription:
+        """이벤트 루프 안에서 호출"""
+        sub = Subscription(user_id, asyncio.get_running_loop())
+        with self._lock:
+            self._subscribers.setdefault(user_id, set()).add(sub)
+        return sub
+
+    def unsubscribe(self, sub: Subscription) -> None:
+        sub.close()
+        with self._lock:
+            subs = self._subscribers.get(sub.user_id)
+            if subs is not None:
+                subs.discard(sub)
+                if not subs:
+                    del self._subscribers[sub.user_id]
+
+    def publish(self, user_id: int, points: List[dict]) -> None:
+        with self._lock:
+            subs = list(self._subscribers.get(user_id, ()))
+        if not subs or not points:
+            return
+
+        message = _encode_points(points)
+        delivered = dropped = 0
+        for sub in subs:
+            accepted, overflow = sub.push(message)
+            delivered += accepted
+            dropped += overflow
+        with self._lock:
+            self._stats["published"] += 1
+            self._stats["delivered"] += delivered
+            self._stats["dropped"] += dropped
+
+    def publish_rows(self, rows: Iterable[dict]) -> None:
+        """INSERT 에 쓴 행 dict 들 (id 가 채워져 있으면 같이 전달)"""
+        by_user: Dict[int, List[dict]] = {}
+        for row in rows:
+            by_user.setdefault(row["user_id"], []).append(
+                {name: row.get(name) for name in POINT_FIELDS}
+            )
+        for user_id, points in by_user.items():
+            self.publish(user_id, points)
+
+    def publish_data(self, items: Iterable[models.Data]) -> None:
+        """커밋된 ORM Data 객체들"""
+        self.publish_rows(
+            {"user_id": d.user_id, **{name: getattr(d, name) for name in POINT_FIELDS}}
+            for d in items
+        )
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            snapshot = dict(self._stats)
+            snapshot["subscribers"] = sum(len(s) for s in self._subscribers.values())
+        return snapshot
+
+
+pubsub = PubSub()
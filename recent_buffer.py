@@ -0,0 +1,419 @@
+# recent_buffer.py
+import os
+import threading
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from database import ReadSessionLocal
+from aggregation import AIR_QUALITY_CLASSES, to_epoch
+from pubsub import POINT_FIELDS
+from retention import raw_cutoff
+import models
+
+# 유저별로 메모리에 들고 있는 최근 측정값 수.
+# 슬롯 하나 = id(8) + 시각(8) + 측정값 3개(8*3) + 등급(1) = 41 바이트 -> 기본 1024 개면 유저당 약 41KB
+RECENT_BUFFER_SIZE: int = int(os.getenv("RECENT_BUFFER_SIZE", "1024"))
+
+# 시간 순서보다 늦게 들어온 행을 ring 중간에 끼워넣을 때 최대 이동 슬롯 수 (넘으면 보장 범위만 줄임)
+_MAX_INSERT_SHIFT = 64
+
+_MIN_TS = -(2 ** 63)
+_MAX_ID = 2 ** 63 - 1
+
+
+
+class Point(NamedTuple):
+    """ring 에서 꺼낸 측정값 한 개 (POINT_FIELDS 순서, ORM Data 처럼 속성으로도 접근)"""
+
+    id: int
+    created_at: datetime
+    temperature: float
+    humidity: float
+    pm25: float
+    air_quality: Optional[str]
+    note: Optional[str]
+
+
+def to_epoch_us(dt: datetime) -> int:
+    return to_epoch(dt) * 1_000_000 + dt.microsecond
+
+
+def _from_epoch_us(ts: int) -> datetime:
+    return datetime(1970, 1, 1) + timedelta(microseconds=ts)
+
+
+class _KeyView:
+    """ring 의 논리 순서(오래된 것 -> 최신)로 (시각, id) 를 보여주는 bisect 용 시퀀스"""
+
+    __slots__ = ("ring",)
+
+    def __init__(self, ring: "ReadingRing") -> None:
+        self.ring = ring
+
+    def __len__(self) -> int:
+        return self.ring.count
+
+    def __getitem__(self, j: int) -> Tuple[int, int]:
+        i = self.ring.slot(j)
+        return self.ring.ts[i], self.ring.ids[i]
+
+
+class ReadingRing:
+    """
+    유저 한 명의 최근 측정값 고정 크기 ring buffer (컬럼별 array).
+
+    covered_from: created_at >= covered_from 인 그 유저의 행은 전부 이 ring 안에 있다.
+    - ring 이 가득 차서 가장 오래된 행을 덮어쓰면 그 시각 이후로 올림
+    - 시간 순서보다 늦게 들어온 행(배치 업로드, 게이트웨이 재전송 등)은 최근 쪽이면 제자리에 끼워넣고,
+      너무 오래된 것이면 저장하지 않고 그 시각 이후로 올림
+    """
+
+    __slots__ = (
+        "capacity", "ids", "ts", "temperature", "humidity", "pm25", "air_quality",
+        "notes", "count", "head", "covered_from", "last_ts",
+    )
+
+    def __init__(self, capacity: int = RECENT_BUFFER_SIZE) -> None:
+        self.capacity = max(1, capacity)
+        # 처음부터 전체 크기로 잡아서 유저당 메모리 사용량이 일정
+        self.ids = array("q", bytes(8 * self.capacity))
+        self.ts = array("q", bytes(8 * self.capacity))
+        self.temperature = array("d", bytes(8 * self.capacity))
+        self.humidity = array("d", bytes(8 * self.capacity))
+        self.pm25 = array("d", bytes(8 * self.capacity))
+        self.air_quality = array("b", bytes(self.capacity))
+        self.notes: Dict[int, str] = {}  # note 가 있는 슬롯만 (드묾)
+        self.count = 0
+        self.head = 0  # 다음에 쓸 슬롯
+        self.covered_from = _MIN_TS
+        self.last_ts = _MIN_TS
+
+    def slot(self, j: int) -> int:
+        """논리 위치 j (0 = 가장 오래된 것) -> 실제 슬롯 번호"""
+        return (self.head - self.count + j) % self.capacity
+
+    def append(self, row_id: int, ts: int, temperature: float, humidity: float,
+               pm25: float, air_quality: Optional[str], note: Optional[str]) -> None:
+        if ts < self.last_ts:
+            self._insert(row_id, ts, temperature, humidity, pm25, air_quality, note)
+            return
+
+        i = self.head
+        if self.count == self.capacity:
+            self.covered_from = max(self.covered_from, self.ts[i] + 1)
+        else:
+            self.count += 1
+
+        self.ids[i] = row_id
+        self.ts[i] = ts
+        self.temperature[i] = temperature
+        self.humidity[i] = humidity
+        self.pm25[i] = pm25
+        self.air_quality[i] = (
+            AIR_QUALITY_CLASSES.index(air_quality) if air_quality in AIR_QUALITY_CLASSES else -1
+        )
+        if note is not None:
+            self.notes[i] = note
+        else:
+            self.notes.pop(i, None)
+
+        self.head = (i + 1) % self.capacity
+        self.last_ts = ts
+
+    def _insert(self, row_id: int, ts: int, temperature: float, humidity: float,
+                pm25: float, air_quality: Optional[str], note: Optional[str]) -> None:
+        """(시각, id) 순서를 지키도록 중간에 끼워넣는다 (뒤쪽 슬롯을 한 칸씩 민다)"""
+        if ts < self.covered_from:
+            return  # 어차피 보장 범위 밖
+        p = bisect_right(_KeyView(self), (ts, row_id))
+        if self.count - p > _MAX_INSERT_SHIFT or (p == 0 and self.count == self.capacity):
+            self.covered_from = max(self.covered_from, ts + 1)
+            return
+
+        if self.count == self.capacity:
+            # 가장 오래된 행을 버리고 자리 확보
+            oldest = self.slot(0)
+            self.covered_from = max(self.covered_from, self.ts[oldest] + 1)
+            self.notes.pop(oldest, None)
+            self.count -= 1
+            p -= 1
+
+        columns = (self.ids, self.ts, self.temperature, self.humidity, self.pm25, self.air_quality)
+        for j in range(self.count, p, -1):
+            dst, src = self.slot(j), self.slot(j - 1)
+            for column in columns:
+                column[dst] = column[src]
+            if src in self.notes:
+                self.notes[dst] = self.notes.pop(src)
+            else:
+                self.notes.pop(dst, None)
+
+        # head 와 count 를 같이 늘려서 slot() 계산은 그대로
+        self.count += 1
+        self.head = (self.head + 1) % self.capacity
+        i = self.slot(p)
+        self.ids[i] = row_id
+        self.ts[i] = ts
+        self.temperature[i] = temperature
+        self.humidity[i] = humidity
+        self.pm25[i] = pm25
+        self.air_quality[i] = (
+            AIR_QUALITY_CLASSES.index(air_quality) if air_quality in AIR_QUALITY_CLASSES else -1
+        )
+        if note is not None:
+            self.notes[i] = note
+        else:
+            self.notes.pop(i, None)
+
+    def add(self, values: Sequence) -> None:
+        """POINT_FIELDS 순서의 값들 (created_at 은 datetime)"""
+        row_id, created_at, temperature, humidity, pm25, air_quality, note = values
+        ts = to_epoch_us(created_at)
+        if row_id is None or temperature is None or humidity is None or pm25 is None:
+            # id 를 모르는 행 (RETURNING 미지원 DB 의 executemany) 등은 보관할 수 없으므로 그 이후만 보장
+            self.covered_from = max(self.covered_from, ts + 1)
+            return
+        self.append(row_id, ts, temperature, humidity, pm25, air_quality, note)
+
+    def trim_before(self, ts: int) -> int:
+        """시각이 ts 보다 이전인 행을 버리고 보장 범위를 ts 이후로 올림. 버린 행 수를 반환"""
+        k = bisect_left(_KeyView(self), (ts, -1))
+        for j in range(k):
+            self.notes.pop(self.slot(j), None)
+        # 가장 오래된 쪽부터 k 개를 빼면 slot() 계산이 그만큼 뒤로 밀림 (head 는 그대로)
+        self.count -= k
+        self.covered_from = max(self.covered_from, ts)
+        return k
+
+    def point(self, i: int) -> Point:
+        code = self.air_quality[i]
+        return Point(
+            self.ids[i],
+            _from_epoch_us(self.ts[i]),
+            self.temperature[i],
+            self.humidity[i],
+            self.pm25[i],
+            AIR_QUALITY_CLASSES[code] if code >= 0 else None,
+            self.notes.get(i),
+        )
+
+    def query(
+        self,
+        start: Optional[int],
+        end: Optional[int],
+        after: Optional[Tuple[int, int]],
+        limit: int,
+    ) -> List[Point]:
+        """[start, end] 범위, (시각, id) < after 인 행을 최신순으로 최대 limit 개"""
+        keys = _KeyView(self)
+        lo = bisect_left(keys, (start, -1)) if start is not None else 0
+        hi = bisect_right(keys, (end, _MAX_ID)) if end is not None else self.count
+        if after is not None:
+            hi = min(hi, bisect_left(keys, after))
+        return [self.point(self.slot(j)) for j in range(hi - 1, max(lo, hi - limit) - 1, -1)]
+
+
+class RecentBuffer:
+    """
+    user_id -> ReadingRing. 저장 경로(MQTT / HTTP)에서 커밋 후 add_rows / add_data 로 채우고,
+    시작할 때 DB 에서 유저별 최근 RECENT_BUFFER_SIZE 개를 읽어 채운다 (warm_up).
+    warm_up 이 끝나기 전이나 범위가 ring 밖이면 None -> 호출한 쪽이 DB 에서 조회.
+    """
+
+    def __init__(self, capacity: int = RECENT_BUFFER_SIZE) -> None:
+        self.capacity = capacity
+        self.ready = False
+        self._lock = threading.Lock()
+        self._rings: Dict[int, ReadingRing] = {}
+        self._pending: List[Tuple[int, tuple]] = []  # warm_up 중에 들어온 행
+        self._thread: Optional[threading.Thread] = None
+        self._trimmed_before: Optional[datetime] = None
+        self.hits = 0
+        self.misses = 0
+
+    # -----------------------------
+    # 채우기
+    # -----------------------------
+    def add_rows(self, rows: Iterable[dict], skip_known: bool = False) -> None:
+        """
+        INSERT 에 쓴 행 dict 들 (id 가 채워져 있어야 함).
+        skip_known: 이미 들고 있는 id 는 건너뜀 (다른 프로세스에서 온 행이 warm_up 과 겹칠 수 있을 때)
+        """
+        # 배치 업로드는 created_at 순서가 뒤섞여 있을 수 있으므로 시간순으로 넣는다
+        self._add(
+            (
+                (
+                    row["user_id"],
+                    (row.get("id"), row["created_at"], row["temperature"], row["humidity"],
+                     row["pm25"], row.get("air_quality"), row.get("note")),
+                )
+                for row in sorted(rows, key=lambda r: r["created_at"])
+            ),
+            skip_known,
+        )
+
+    def add_data(self, items: Iterable[models.Data]) -> None:
+        """커밋된 ORM Data 객체들"""
+        self._add(
+            (d.user_id, tuple(getattr(d, name) for name in POINT_FIELDS))
+            for d in items
+        )
+
+    def _add(self, entries: Iterable[Tuple[int, tuple]], skip_known: bool = False) -> None:
+        with self._lock:
+            for user_id, values in entries:
+                if user_id is None:
+                    continue
+                if not self.ready:
+                    self._pending.append((user_id, values))
+                    continue
+                if skip_known:
+                    ring = self._rings.get(user_id)
+                    # 이미 있는 행이면 시각이 마지막 행보다 늦을 수 없으므로 그때만 id 를 찾아봄
+                    if (
+                        ring is not None
+                        and to_epoch_us(values[1]) <= ring.last_ts
+                        and values[0] in ring.ids
+                    ):
+                        continue
+                self._append(user_id, values)
+
+    def _append(self, user_id: int, values: tuple) -> None:
+        """self._lock 을 잡은 상태에서 호출"""
+        ring = self._rings.get(user_id)
+        if ring is None:
+            # warm_up 이후 처음 보는 유저 = 그 전에는 행이 없던 유저 -> 처음부터 전부 들고 있음
+            ring = self._rings[user_id] = ReadingRing(self.capacity)
+        ring.add(values)
+
+    def trim_before(self, cutoff: datetime) -> int:
+        """
+        보관 기간(RETENTION_RAW_DAYS)이 지나 DB 에서 지워지는 행을 ring 에서도 버린다.
+        보장 범위를 cutoff 이후로 올리므로 cutoff 이전을 묻는 조회는 DB 로 넘어간다
+        (retention 이 아직 돌지 않았거나 다른 프로세스에서 돌아도 결과가 DB 와 같음)
+        """
+        ts = to_epoch_us(cutoff)
+        with self._lock:
+            self._trimmed_before = cutoff
+            return sum(ring.trim_before(ts) for ring in self._rings.values())
+
+    def _trim_expired(self) -> None:
+        """보관 기준 시각(하루 단위)이 바뀌었으면 ring 들을 잘라냄"""
+        cutoff = raw_cutoff()
+        if cutoff is not None and (self._trimmed_before is None or cutoff > self._trimmed_before):
+            self.trim_before(cutoff)
+
+    def forget_user(self, user_id: int) -> None:
+        with self._lock:
+            self._rings.pop(user_id, None)
+
+    # -----------------------------
+    # 시작 시 DB 에서 채우기
+    # -----------------------------
+    def warm_up(self) -> None:
+        started = time.perf_counter()
+        db: Session = ReadSessionLocal()
+        try:
+            user_ids = [row[0] for row in db.query(models.User.User_ID).all()]
+            Data = models.Data
+            columns = [getattr(Data, name) for name in POINT_FIELDS]
+            rings: Dict[int, ReadingRing] = {}
+            for user_id in user_ids:
+                # (user_id, created_at) 인덱스로 최신 capacity 개만
+                rows = db.execute(
+                    select(*columns)
+                    .where(Data.user_id == user_id)
+                    .order_by(Data.created_at.desc(), Data.id.desc())
+                    .limit(self.capacity)
+                ).all()
+                ring = ReadingRing(self.capacity)
+                for row in reversed(rows):
+                    ring.add(row)
+                if len(rows) >= self.capacity:
+                    # 더 오래된 행이 (같은 시각에) 남아있을 수 있으므로 가장 오래된 시각 다음부터만 보장
+                    ring.covered_from = ring.ts[ring.slot(0)] + 1
+                rings[user_id] = ring
+        finally:
+            db.close()
+
+        with self._lock:
+            self._rings = rings
+            self.ready = True
+            pending, self._pending = self._pending, []
+            for user_id, values in pending:
+                ring = self._rings.get(user_id)
+                if ring is not None and values[0] in ring.ids:
+                    continue  # 이미 DB 에서 읽어온 행
+                self._append(user_id, values)
+
+        print(f"[BUFFER] Warmed {len(rings)} users in {time.perf_counter() - started:.2f}s")
+
+    def start_warm_up(self) -> None:
+        """서버 시작을 막지 않도록 백그라운드 스레드에서 warm_up"""
+        if self._thread is not None:
+            return
+
+        def run() -> None:
+            try:
+                self.warm_up()
+            except Exception as e:
+                print("[BUFFER] Warm-up error:", e)
+
+        self._thread = threading.Thread(target=run, name="recent-buffer-warmup", daemon=True)
+        self._thread.start()
+
+    # -----------------------------
+    # 조회
+    # -----------------------------
+    def query(
+        self,
+        user_id: int,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        after: Optional[Tuple[datetime, int]] = None,
+        limit: int = 100,
+    ) -> Optional[List[Point]]:
+        """
+        /graph 와 같은 조건으로 최신순 조회. ring 만으로 DB 와 같은 결과를 낼 수 없으면 None.
+        - start 가 covered_from 이후면 범위 전체가 ring 안에 있음
+        - 아니어도 limit 개를 채웠고 가장 오래된 것이 covered_from 이후면 그 페이지는 정확함
+          (start 없이 "최신 N 개" 를 묻는 경우)
+        """
+        start = to_epoch_us(start_date) if start_date is not None else None
+        end = to_epoch_us(end_date) if end_date is not None else None
+        after_key = (to_epoch_us(after[0]), after[1]) if after is not None else None
+
+        if self.ready:
+            self._trim_expired()
+        with self._lock:
+            ring = self._rings.get(user_id) if self.ready else None
+            if ring is not None:
+                points = ring.query(start, end, after_key, limit)
+                if (start if start is not None else _MIN_TS) >= ring.covered_from or (
+                    len(points) == limit and to_epoch_us(points[-1].created_at) >= ring.covered_from
+                ):
+                    self.hits += 1
+                    return points
+            self.misses += 1
+            return None
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            users = len(self._rings)
+            return {
+                "ready": self.ready,
+                "users": users,
+                "capacity": self.capacity,
+                "memory_bytes": users * self.capacity * 41,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+recent_readings = RecentBuffer()
@@ -0,0 +1,185 @@
+# relay.py
+import os
+import threading
+from collections import deque
+from typing import Callable, Deque, List, Optional, Set
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from database import ReadSessionLocal
+from pubsub import POINT_FIELDS, pubsub
+from recent_buffer import recent_readings
+import models
+
+# 다른 워커 프로세스가 저장한 행을 가져오는 주기 (초, 0 이면 끔)
+ROW_RELAY_POLL_SECONDS: float = float(os.getenv("ROW_RELAY_POLL_SECONDS", "1.0"))
+# 한 번에 가져오는 최대 행 수
+ROW_RELAY_BATCH_ROWS: int = int(os.getenv("ROW_RELAY_BATCH_ROWS", "2000"))
+# 이미 전달한 id 를 기억하는 개수 (직접 저장한 행과 poll 로 읽은 행이 겹치지 않도록)
+_SEEN_IDS_LIMIT = 100_000
+
+
+class RowRelay:
+    """
+    새 측정값을 최근값 버퍼 + 대시보드 구독자(pubsub)에 전달한다.
+
+    - 이 프로세스에서 저장한 행: publish_rows / publish_data 로 바로 전달
+    - 다른 워커 프로세스(MQTT 를 맡은 워커, 다른 HTTP 워커)가 저장한 행:
+      poll 스레드가 id 순으로 새 행을 읽어와 전달. 이미 직접 전달한 id 는 건너뜀.
+      add_listener 로 등록한 함수도 이 행들로 호출 (shared 모드 리더의 알림 평가)
+    (gunicorn 워커가 여러 개여도 어느 워커에 연결된 대시보드든 같은 데이터를 받도록)
+    """
+
+    def __init__(
+        self,
+        poll_seconds: float = ROW_RELAY_POLL_SECONDS,
+        batch_rows: int = ROW_RELAY_BATCH_ROWS,
+    ) -> None:
+        self.poll_seconds = poll_seconds
+        self.batch_rows = max(1, batch_rows)
+
+        self._lock = threading.Lock()
+        self._seen_ids: Set[int] = set()
+        self._seen_order: Deque[int] = deque()
+        self._last_id: Optional[int] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._listeners: List[Callable[[List[dict]], None]] = []
+        self._stats = {"local": 0, "relayed": 0, "polls": 0, "errors": 0}
+
+    def add_listener(self, listener: Callable[[List[dict]], None]) -> None:
+        """다른 프로세스가 저장한 행을 poll 로 읽을 때마다 호출 (poll 스레드에서)"""
+        with self._lock:
+            if listener not in self._listeners:
+                self._listeners.append(listener)
+
+    def remove_listener(self, listener: Callable[[List[dict]], None]) -> None:
+        with self._lock:
+            if listener in self._listeners:
+                self._listeners.remove(listener)
+
+    # -----------------------------
+    # 이 프로세스에서 저장한 행
+    # -----------------------------
+    def publish_rows(self, rows: List[dict]) -> None:
+        """INSERT 에 쓴 행 dict 들 (커밋 후)"""
+        with self._lock:
+            rows = self._unseen(rows, lambda row: row.get("id"))
+            self._stats["local"] += len(rows)
+            recent_readings.add_rows(rows)
+            pubsub.publish_rows(rows)
+
+    def publish_data(self, items: List[models.Data]) -> None:
+        """커밋된 ORM Data 객체들"""
+        with self._lock:
+            items = self._unseen(items, lambda d: d.id)
+            self._stats["local"] += len(items)
+            recent_readings.add_data(items)
+            pubsub.publish_data(items)
+
+    def _unseen(self, items: list, get_id: Callable[[object], Optional[int]]) -> list:
+        """
+        self._lock 을 잡은 상태에서 호출. 아직 전달하지 않은 것만 남기고 전달한 것으로 기록.
+        커밋 직후 poll 이 먼저 읽어간 행을 다시 보내지 않도록 (반대 순서도 마찬가지)
+        """
+        if self._thread is None:
+            return items  # poll 하지 않으면 겹칠 일이 없음
+        fresh = []
+        for item in items:
+            row_id = get_id(item)
+            if row_id is not None:
+                if row_id in self._seen_ids:
+                    continue
+                self._seen_ids.add(row_id)
+                self._seen_order.append(row_id)
+            fresh.append(item)
+        while len(self._seen_order) > _SEEN_IDS_LIMIT:
+            self._seen_ids.discard(self._seen_order.popleft())
+        return fresh
+
+    # -----------------------------
+    # 다른 프로세스에서 저장한 행
+    # -----------------------------
+    def poll_once(self, db: Session) -> int:
+        """마지막으로 본 id 이후의 행을 읽어서 전달. 읽은 행 수를 반환"""
+        Data = models.Data
+        if self._last_id is None:
+            # 시작 시점까지의 행은 warm_up 이 DB 에서 직접 읽음
+            self._last_id = db.execute(select(func.max(Data.id))).scalar() or 0
+            return 0
+
+        rows = db.execute(
+            select(Data.user_id, *[getattr(Data, name) for name in POINT_FIELDS])
+            .where(Data.id > self._last_id)
+            .order_by(Data.id)
+            .limit(self.batch_rows)
+        ).all()
+        if not rows:
+            return 0
+        self._last_id = rows[-1].id
+
+        with self._lock:
+            fresh = self._unseen([dict(row._mapping) for row in rows], lambda row: row["id"])
+            self._stats["polls"] += 1
+            self._stats["relayed"] += len(fresh)
+            if fresh:
+                # 시작 직후에는 warm_up 이 DB 에서 이미 읽은 행과 겹칠 수 있음
+                recent_readings.add_rows(fresh, skip_known=True)
+                pubsub.publish_rows(fresh)
+            listeners = list(self._listeners)
+
+        for listener in listeners if fresh else ():
+            try:
+                listener(fresh)
+            except Exception as e:
+                print("[RELAY] Listener error:", e)
+        return len(rows)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.poll_seconds):
+            db: Session = ReadSessionLocal()
+            try:
+                # 밀려 있으면 쉬지 않고 이어서 읽음
+                while self.poll_once(db) >= self.batch_rows and not self._stop.is_set():
+                    pass
+            except Exception as e:
+                with self._lock:
+                    self._stats["errors"] += 1
+                print("[RELAY] Poll error:", e)
+            finally:
+                db.close()
+
+    def start(self) -> None:
+        if self._thread is not None or self.poll_seconds <= 0:
+            return
+        db: Session = ReadSessionLocal()
+        try:
+            self.poll_once(db)  # 시작 위치(max id) 기록
+        finally:
+            db.close()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="row-relay", daemon=True)
+        self._thread.start()
+        print(f"[RELAY] Polling new rows every {self.poll_seconds}s (from id > {self._last_id})")
+
+    def stop(self, timeout: float = 5.0) -> None:
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join(timeout)
+        self._thread = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None
+
+    def stats(self) -> dict:
+        with self._lock:
+            snapshot = dict(self._stats)
+        snapshot["running"] = self._thread is not None
+        snapshot["last_id"] = self._last_id
+        return snapshot
+
+
+row_relay = RowRelay()
@@ -0,0 +1,361 @@
+# retention.py
+import os
+import threading
+import time
+import zlib
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import delete, func, select, text, tuple_
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from database import SessionLocal, ReadSessionLocal, engine
+from aggregation import BUCKET_SECONDS, bucket_start_expr, to_epoch
+from export_utils import EXPORT_COLUMNS, encode_ndjson
+import models
+import rollups
+
+# 나이별 보관 정책 (0 이면 그 단계는 지우지 않고 계속 보관)
+# - 원본 data: RETENTION_RAW_DAYS 일 (지나면 롤업만 남기고 삭제, 필요하면 먼저 아카이브)
+# - 1m 롤업:   RETENTION_ROLLUP_1M_DAYS 일
+# - 1h 롤업:   RETENTION_ROLLUP_1H_DAYS 일
+# - 1d 롤업:   계속 보관
+RETENTION_RAW_DAYS: int = int(os.getenv("RETENTION_RAW_DAYS", "30"))
+RETENTION_ROLLUP_1M_DAYS: int = int(os.getenv("RETENTION_ROLLUP_1M_DAYS", "90"))
+RETENTION_ROLLUP_1H_DAYS: int = int(os.getenv("RETENTION_ROLLUP_1H_DAYS", "0"))
+
+# 지정하면 원본 행을 지우기 전에 이 폴더에 하루 단위 gzip NDJSON 으로 남긴다 (data-YYYY-MM-DD.ndjson.gz)
+RETENTION_ARCHIVE_DIR: str = os.getenv("RETENTION_ARCHIVE_DIR", "")
+
+# 한 트랜잭션에서 지우는 행 수 / 트랜잭션 사이 쉬는 시간 -> 쓰기 락을 오래 잡지 않음
+RETENTION_CHUNK_ROWS: int = int(os.getenv("RETENTION_CHUNK_ROWS", "1000"))
+RETENTION_CHUNK_PAUSE_SECONDS: float = float(os.getenv("RETENTION_CHUNK_PAUSE_SECONDS", "0.05"))
+# PRAGMA incremental_vacuum 한 번에 돌려주는 페이지 수
+RETENTION_VACUUM_PAGES: int = int(os.getenv("RETENTION_VACUUM_PAGES", "500"))
+
+# 서버 안에서 주기적으로 실행 (0 이면 python manage.py retention 으로만 실행)
+RETENTION_INTERVAL_HOURS: float = float(os.getenv("RETENTION_INTERVAL_HOURS", "0"))
+
+_DAY_SECONDS = BUCKET_SECONDS["1d"]
+
+
+@dataclass
+class RetentionReport:
+    compacted_days: int = 0
+    archived_rows: int = 0
+    deleted_rows: int = 0
+    deleted_rollups: int = 0
+    vacuumed_pages: int = 0
+
+
+def cutoff_for(days: int, now: Optional[datetime] = None) -> Optional[datetime]:
+    """now 기준 days 일 전 (UTC 자정으로 내림). days <= 0 이면 None (무기한 보관)"""
+    if days <= 0:
+        return None
+    if now is None:
+        now = datetime.utcnow()
+    cutoff = now - timedelta(days=days)
+    return cutoff.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def raw_cutoff(now: Optional[datetime] = None) -> Optional[datetime]:
+    return cutoff_for(RETENTION_RAW_DAYS, now)
+
+
+def _pause(stop: Optional[threading.Event]) -> bool:
+    """청크 사이에 쉰다. 그동안 중단 요청이 오면 True (이미 처리한 청크는 커밋된 상태)"""
+    if stop is None:
+        time.sleep(RETENTION_CHUNK_PAUSE_SECONDS)
+        return False
+    return stop.wait(RETENTION_CHUNK_PAUSE_SECONDS)
+
+
+# -----------------------------
+# 1) 압축: 지울 원본이 롤업에 전부 반영돼 있는지 확인
+# -----------------------------
+def compact(cutoff: datetime, stop: Optional[threading.Event] = None) -> int:
+    """
+    cutoff 이전 (유저, 날짜) 별로 원본 행 수와 1d 롤업 count 를 비교해서
+    롤업이 모자란 날만 원본에서 다시 계산. 다시 계산한 날 수를 반환.
+
+    롤업은 INSERT 할 때 같이 누적되므로 보통은 할 일이 없다.
+    원본이 일부 지워진 날은 원본 < 롤업 이 되어 다시 계산하지 않는다 (이미 압축된 날).
+    """
+    read_db: Session = ReadSessionLocal()
+    try:
+        day = bucket_start_expr(read_db, models.Data.created_at, _DAY_SECONDS).label("day")
+        raw_counts = (
+            read_db.query(models.Data.user_id, day, func.count())
+            .filter(models.Data.user_id.is_not(None), models.Data.created_at < cutoff)
+            .group_by(models.Data.user_id, day)
+            .all()
+        )
+        R = models.DataRollup
+        rollup_counts: Dict[Tuple[int, int], int] = {
+            (user_id, bucket): count
+            for user_id, bucket, count in read_db.query(R.user_id, R.bucket_epoch, R.count)
+            .filter(R.resolution == "1d", R.bucket_epoch < to_epoch(cutoff))
+            .all()
+        }
+    finally:
+        read_db.close()
+
+    compacted = 0
+    for user_id, day_epoch, count in raw_counts:
+        if count <= rollup_counts.get((user_id, day_epoch), 0):
+            continue
+        since = datetime.utcfromtimestamp(day_epoch)
+        db: Session = SessionLocal()
+        try:
+            rollups.rebuild(db, user_id=user_id, since=since, until=since + timedelta(days=1))
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+        compacted += 1
+        if _pause(stop):
+            break
+    return compacted
+
+
+# -----------------------------
+# 2) 아카이브 + 삭제
+# -----------------------------
+def _archive(rows: Sequence[Sequence], archive_dir: str) -> None:
+    """행들을 날짜별 파일에 gzip member 로 이어붙인다 (gzip 은 여러 member 를 이어서 읽을 수 있음)"""
+    created_at_index = EXPORT_COLUMNS.index("created_at")
+    by_day: Dict[str, List[Sequence]] = defaultdict(list)
+    for row in rows:
+        by_day[row[created_at_index].strftime("%Y-%m-%d")].append(row)
+
+    for day, day_rows in by_day.items():
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+        data = compressor.compress(encode_ndjson(day_rows)) + compressor.flush()
+        path = os.path.join(archive_dir, f"data-{day}.ndjson.gz")
+        with open(path, "ab") as f:
+            f.write(data)
+            f.flush()
+            # 파일에 확실히 남은 뒤에 DB 에서 지운다
+            os.fsync(f.fileno())
+
+
+def purge_raw(
+    cutoff: datetime,
+    archive_dir: str = RETENTION_ARCHIVE_DIR,
+    stop: Optional[threading.Event] = None,
+) -> Tuple[int, int]:
+    """
+    cutoff 이전 원본 행을 유저별로 오래된 순서대로 RETENTION_CHUNK_ROWS 개씩 (아카이브 후) 삭제.
+    청크마다 커밋하고 세션을 닫아서 MQTT 배치 저장 / HTTP 쓰기가 사이사이 끼어들 수 있게 한다.
+    아카이브 후 삭제 전에 중단되면 다음 실행 때 같은 행이 다시 아카이브될 수 있다 (id 로 중복 제거).
+    (archived, deleted) 를 반환.
+    """
+    if archive_dir:
+        os.makedirs(archive_dir, exist_ok=True)
+
+    Data = models.Data
+    columns = [getattr(Data, name) for name in EXPORT_COLUMNS]
+    id_index = EXPORT_COLUMNS.index("id")
+
+    read_db: Session = ReadSessionLocal()
+    try:
+        user_ids = [row[0] for row in read_db.query(Data.user_id).distinct().all()]
+    finally:
+        read_db.close()
+
+    archived = deleted = 0
+    for user_id in user_ids:
+        owner = Data.user_id.is_(None) if user_id is None else Data.user_id == user_id
+        while True:
+            # 읽기 + 아카이브(fsync 포함)는 읽기 전용 커넥션에서, 쓰기 커넥션은 DELETE 동안만 잡는다
+            read_db = ReadSessionLocal()
+            try:
+                # (user_id, created_at) 인덱스 범위 스캔
+                rows = read_db.execute(
+                    select(*columns)
+                    .where(owner, Data.created_at < cutoff)
+                    .order_by(Data.created_at.asc(), Data.id.asc())
+                    .limit(RETENTION_CHUNK_ROWS)
+                ).all()
+            finally:
+                read_db.close()
+            if not rows:
+                break
+            if archive_dir:
+                _archive(rows, archive_dir)
+                archived += len(rows)
+
+            db: Session = SessionLocal()
+            try:
+                db.execute(delete(Data).where(Data.id.in_([row[id_index] for row in rows])))
+                db.commit()
+            except Exception:
+                db.rollback()
+                raise
+            finally:
+                db.close()
+            deleted += len(rows)
+            if _pause(stop):
+                return archived, deleted
+    return archived, deleted
+
+
+def purge_rollups(resolution: str, cutoff: datetime, stop: Optional[threading.Event] = None) -> int:
+    """cutoff 이전 resolution 롤업 행을 청크 단위로 삭제"""
+    R = models.DataRollup
+    deleted = 0
+    while True:
+        db: Session = SessionLocal()
+        try:
+            keys = db.query(R.user_id, R.bucket_epoch).filter(
+                R.resolution == resolution, R.bucket_epoch < to_epoch(cutoff)
+            ).limit(RETENTION_CHUNK_ROWS).all()
+            if not keys:
+                break
+            db.execute(
+                delete(R).where(
+                    R.resolution == resolution,
+                    tuple_(R.user_id, R.bucket_epoch).in_([tuple(k) for k in keys]),
+                )
+            )
+            db.commit()
+            deleted += len(keys)
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+        if _pause(stop):
+            break
+    return deleted
+
+
+# -----------------------------
+# 3) 빈 페이지 반환 (SQLite)
+# -----------------------------
+def incremental_vacuum(bind: Engine = engine, stop: Optional[threading.Event] = None) -> int:
+    """
+    auto_vacuum=INCREMENTAL 인 SQLite 에서 빈 페이지를 조금씩 파일에서 돌려준다. 반환한 페이지 수.
+    기존 DB 는 한 번 enable_incremental_vacuum() 을 해야 적용된다.
+    """
+    if bind.dialect.name != "sqlite":
+        return 0
+
+    with bind.connect() as conn:
+        mode = conn.execute(text("PRAGMA auto_vacuum")).scalar()
+    if mode != 2:
+        print("[RETENTION] auto_vacuum 이 INCREMENTAL 이 아닙니다. "
+              "python manage.py retention --enable-incremental-vacuum 을 한 번 실행하세요.")
+        return 0
+
+    freed = 0
+    while True:
+        with bind.connect() as conn:
+            free_pages = conn.execute(text("PRAGMA freelist_count")).scalar() or 0
+            if free_pages <= 0:
+                break
+            pages = min(free_pages, RETENTION_VACUUM_PAGES)
+            # sqlite3 모듈의 execute() 는 결과 없는 문장을 한 번만 step 해서 1페이지만 처리됨
+            # -> executescript() 로 끝까지 실행
+            conn.connection.driver_connection.executescript(f"PRAGMA incremental_vacuum({pages});")
+            remaining = conn.execute(text("PRAGMA freelist_count")).scalar() or 0
+        if remaining >= free_pages:
+            break
+        freed += free_pages - remaining
+        if _pause(stop):
+            break
+    return freed
+
+
+def enable_incremental_vacuum(bind: Engine = engine) -> None:
+    """auto_vacuum=INCREMENTAL 로 바꾸고 전체 VACUUM (DB 크기만큼 걸리고 그동안 쓰기가 막힘, 한 번만)"""
+    if bind.dialect.name != "sqlite":
+        return
+    with bind.connect() as conn:
+        conn = conn.execution_options(isolation_level="AUTOCOMMIT")
+        conn.exec_driver_sql("PRAGMA auto_vacuum=INCREMENTAL")
+        conn.exec_driver_sql("VACUUM")
+    print("[RETENTION] auto_vacuum=INCREMENTAL 적용 완료")
+
+
+# -----------------------------
+# 전체 실행
+# -----------------------------
+def run_retention(
+    now: Optional[datetime] = None,
+    archive_dir: str = RETENTION_ARCHIVE_DIR,
+    stop: Optional[threading.Event] = None,
+) -> RetentionReport:
+    """
+    보관 정책 한 번 실행. stop 이 설정되면 진행 중인 청크까지만 커밋하고 멈춘다
+    (남은 행은 다음 실행 때 이어서 처리)
+    """
+    report = RetentionReport()
+    started = time.perf_counter()
+
+    def stopping() -> bool:
+        return stop is not None and stop.is_set()
+
+    cutoff = raw_cutoff(now)
+    if cutoff is not None:
+        report.compacted_days = compact(cutoff, stop)
+        if not stopping():
+            report.archived_rows, report.deleted_rows = purge_raw(cutoff, archive_dir, stop)
+
+    for resolution, days in (("1m", RETENTION_ROLLUP_1M_DAYS), ("1h", RETENTION_ROLLUP_1H_DAYS)):
+        rollup_cutoff = cutoff_for(days, now)
+        if rollup_cutoff is not None and not stopping():
+            report.deleted_rollups += purge_rollups(resolution, rollup_cutoff, stop)
+
+    if (report.deleted_rows or report.deleted_rollups) and not stopping():
+        report.vacuumed_pages = incremental_vacuum(stop=stop)
+
+    print(
+        f"[RETENTION] compacted_days={report.compacted_days} archived={report.archived_rows} "
+        f"deleted={report.deleted_rows} deleted_rollups={report.deleted_rollups} "
+        f"vacuumed_pages={report.vacuumed_pages} ({time.perf_counter() - started:.1f}s)"
+        + (" - stopped" if stopping() else "")
+    )
+    return report
+
+
+class RetentionWorker:
+    """RETENTION_INTERVAL_HOURS 마다 run_retention() 을 실행하는 백그라운드 스레드"""
+
+    def __init__(self, interval_hours: float = RETENTION_INTERVAL_HOURS) -> None:
+        self.interval = interval_hours * 3600
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        if self._thread is not None or self.interval <= 0:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="retention", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """
+        실행 중이면 지금 청크를 커밋한 뒤 멈출 때까지 기다린다 (시간 제한 없음).
+        리더 잠금을 놓기 전에 호출 -> 다음 리더와 retention 이 겹쳐 돌지 않음
+        """
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                run_retention(stop=self._stop)
+            except Exception as e:
+                print("[RETENTION] Error:", e)
+
+
+# 서버에서는 리더 프로세스 하나만 시작 (coordination.leader_duties)
+retention_worker = RetentionWorker()
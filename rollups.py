@@ -0,0 +1,301 @@
+# rollups.py
+import os
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import case, delete, func, literal, select, union_all
+from sqlalchemy.dialects import mysql, sqlite
+from sqlalchemy.orm import Session
+
+import models
+from aggregation import (
+    AIR_QUALITY_CLASSES,
+    BUCKET_SECONDS,
+    MAX_BUCKETS,
+    METRICS,
+    bucket_row_to_point,
+    bucket_start_expr,
+    to_epoch,
+)
+
+# 유지하는 롤업 해상도 (작은 것부터)
+ROLLUP_RESOLUTIONS: Tuple[str, ...] = ("1m", "1h", "1d")
+
+# 조회 기간이 이 시간보다 길면 원본 data 대신 롤업 테이블에서 집계
+GRAPH_ROLLUP_MIN_RANGE_HOURS: float = float(os.getenv("GRAPH_ROLLUP_MIN_RANGE_HOURS", "6"))
+
+_SUM_COLUMNS = (
+    ["count"]
+    + [f"{m}_sum" for m in METRICS]
+    + [f"{m}_count" for m in METRICS]
+    + [f"aq_{c}" for c in AIR_QUALITY_CLASSES]
+)
+_MIN_COLUMNS = [f"{m}_min" for m in METRICS]
+_MAX_COLUMNS = [f"{m}_max" for m in METRICS]
+
+
+def _empty_partial(user_id: int, resolution: str, bucket_epoch: int) -> dict:
+    partial = {
+        "user_id": user_id,
+        "resolution": resolution,
+        "bucket_epoch": bucket_epoch,
+    }
+    for col in _SUM_COLUMNS:
+        partial[col] = 0
+    for col in _MIN_COLUMNS + _MAX_COLUMNS:
+        partial[col] = None
+    return partial
+
+
+def _accumulate(partial: dict, row: dict) -> None:
+    partial["count"] += 1
+    for metric in METRICS:
+        value = row.get(metric)
+        if value is None:
+            continue
+        partial[f"{metric}_sum"] += value
+        partial[f"{metric}_count"] += 1
+        lo, hi = partial[f"{metric}_min"], partial[f"{metric}_max"]
+        partial[f"{metric}_min"] = value if lo is None else min(lo, value)
+        partial[f"{metric}_max"] = value if hi is None else max(hi, value)
+    aq = row.get("air_quality")
+    if aq in AIR_QUALITY_CLASSES:
+        partial[f"aq_{aq}"] += 1
+
+
+def row_from_data(data: models.Data) -> dict:
+    """ORM Data 객체 -> apply_rows 가 받는 dict (created_at 은 미리 채워져 있어야 함)"""
+    return {
+        "user_id": data.user_id,
+        "created_at": data.created_at,
+        "temperature": data.temperature,
+        "humidity": data.humidity,
+        "pm25": data.pm25,
+        "air_quality": data.air_quality,
+    }
+
+
+def apply_rows(db: Session, rows: Iterable[dict]) -> None:
+    """
+    새로 INSERT 하는 측정값들을 롤업 테이블에 누적 (같은 트랜잭션 안에서 호출, 커밋은 호출한 쪽).
+    rows: user_id / created_at / temperature / humidity / pm25 / air_quality 를 가진 dict
+    배치 안에서 같은 구간끼리 먼저 합친 뒤 구간당 한 번만 UPSERT 한다.
+    """
+    partials: Dict[Tuple[int, str, int], dict] = {}
+    for row in rows:
+        epoch = to_epoch(row["created_at"])
+        for resolution in ROLLUP_RESOLUTIONS:
+            seconds = BUCKET_SECONDS[resolution]
+            key = (row["user_id"], resolution, epoch - epoch % seconds)
+            partial = partials.get(key)
+            if partial is None:
+                partial = partials[key] = _empty_partial(*key)
+            _accumulate(partial, row)
+
+    if partials:
+        db.execute(_upsert_statement(db), list(partials.values()))
+
+
+def _upsert_statement(db: Session):
+    """(user_id, resolution, bucket_epoch) 가 이미 있으면 누적, 없으면 INSERT"""
+    table = models.DataRollup.__table__
+    dialect = db.get_bind().dialect.name
+
+    if dialect == "sqlite":
+        stmt = sqlite.insert(table)
+        new = stmt.excluded
+        least, greatest = func.min, func.max  # SQLite 의 2-인자 min/max 는 스칼라 함수
+    elif dialect == "mysql":
+        stmt = mysql.insert(table)
+        new = stmt.inserted
+        least, greatest = func.least, func.greatest
+    else:
+        raise NotImplementedError(f"Rollup upsert is not supported for {dialect}")
+
+    updates = {}
+    for col in _SUM_COLUMNS:
+        updates[col] = table.c[col] + new[col]
+    for col in _MIN_COLUMNS:
+        updates[col] = func.coalesce(least(table.c[col], new[col]), new[col], table.c[col])
+    for col in _MAX_COLUMNS:
+        updates[col] = func.coalesce(greatest(table.c[col], new[col]), new[col], table.c[col])
+
+    if dialect == "sqlite":
+        return stmt.on_conflict_do_update(
+            index_elements=["user_id", "resolution", "bucket_epoch"],
+            set_=updates,
+        )
+    return stmt.on_duplicate_key_update(**updates)
+
+
+def rebuild(
+    db: Session,
+    user_id: Optional[int] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+) -> None:
+    """
+    원본 data 에서 롤업을 다시 계산 (백필 / 복구용, 커밋은 호출한 쪽).
+    since / until 은 하루 단위로 맞춰서 처리해야 1d 구간이 잘리지 않는다.
+    """
+    table = models.DataRollup.__table__
+    raw = models.Data
+
+    for resolution in ROLLUP_RESOLUTIONS:
+        seconds = BUCKET_SECONDS[resolution]
+
+        cleanup = delete(table).where(table.c.resolution == resolution)
+        if user_id is not None:
+            cleanup = cleanup.where(table.c.user_id == user_id)
+        if since is not None:
+            cleanup = cleanup.where(table.c.bucket_epoch >= to_epoch(since))
+        if until is not None:
+            cleanup = cleanup.where(table.c.bucket_epoch < to_epoch(until))
+        db.execute(cleanup)
+
+        bucket = bucket_start_expr(db, raw.created_at, seconds)
+        columns = [
+            raw.user_id,
+            literal(resolution),
+            bucket,
+            func.count(),
+        ]
+        names = ["user_id", "resolution", "bucket_epoch", "count"]
+        for metric in METRICS:
+            col = getattr(raw, metric)
+            columns += [func.sum(col), func.min(col), func.max(col), func.count(col)]
+            names += [f"{metric}_sum", f"{metric}_min", f"{metric}_max", f"{metric}_count"]
+        for name in AIR_QUALITY_CLASSES:
+            columns.append(func.sum(case((raw.air_quality == name, 1), else_=0)))
+            names.append(f"aq_{name}")
+
+        source = select(*columns).where(raw.user_id.is_not(None))
+        if user_id is not None:
+            source = source.where(raw.user_id == user_id)
+        if since is not None:
+            source = source.where(raw.created_at >= since)
+        if until is not None:
+            source = source.where(raw.created_at < until)
+        source = source.group_by(raw.user_id, bucket)
+
+        db.execute(table.insert().from_select(names, source))
+
+
+def resolution_for(seconds: int) -> Optional[str]:
+    """요청한 구간 크기를 나눠떨어지게 만드는 가장 굵은 롤업 해상도"""
+    for resolution in reversed(ROLLUP_RESOLUTIONS):
+        if seconds % BUCKET_SECONDS[resolution] == 0:
+            return resolution
+    return None
+
+
+def should_use_rollups(start_date: Optional[datetime], end_date: Optional[datetime]) -> bool:
+    """조회 기간이 길면(또는 시작이 없으면) 롤업에서 읽는다"""
+    if start_date is None:
+        return True
+    end = end_date or datetime.utcnow()
+    return (to_epoch(end) - to_epoch(start_date)) / 3600 > GRAPH_ROLLUP_MIN_RANGE_HOURS
+
+
+def _raw_edge(db: Session, user_id: int, seconds: int, since: datetime, before: Optional[datetime], until: Optional[datetime]):
+    """롤업 한 칸을 다 채우지 못하는 가장자리 구간은 원본에서 롤업 행과 같은 형태로 집계"""
+    Data = models.Data
+    columns = [bucket_start_expr(db, Data.created_at, seconds).label("bucket"), func.count().label("count")]
+    for metric in METRICS:
+        col = getattr(Data, metric)
+        columns += [
+            func.min(col).label(f"{metric}_min"),
+            func.sum(col).label(f"{metric}_sum"),
+            func.count(col).label(f"{metric}_count"),
+            func.max(col).label(f"{metric}_max"),
+        ]
+    for name in AIR_QUALITY_CLASSES:
+        columns.append(func.sum(case((Data.air_quality == name, 1), else_=0)).label(f"aq_{name}"))
+
+    query = select(*columns).where(Data.user_id == user_id, Data.created_at >= since)
+    if before is not None:
+        query = query.where(Data.created_at < before)
+    if until is not None:
+        query = query.where(Data.created_at <= until)
+    return query.group_by("bucket")
+
+
+def aggregate_rollups(
+    db: Session,
+    user_id: int,
+    seconds: int,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    limit: int = MAX_BUCKETS,
+) -> List[dict]:
+    """
+    가장 굵은 롤업에서 seconds 단위로 다시 묶어 집계 (aggregation.aggregate_raw 와 같은 형태 반환).
+    예: 5m 요청 -> 1m 롤업 5개씩, 1d 요청 -> 1d 롤업 그대로
+
+    start_date / end_date 가 롤업 경계에 걸치면 그 가장자리 칸은 원본 data 에서 집계해서 합친다
+    (요청 범위 밖의 값이 섞이지 않도록). 보관 정책으로 원본이 이미 지워진 칸만 롤업 한 칸 단위로 포함.
+    """
+    from retention import raw_cutoff  # retention 이 rollups 를 import 함
+
+    resolution = resolution_for(seconds)
+    step = BUCKET_SECONDS[resolution]
+    cutoff = raw_cutoff()
+    raw_since = to_epoch(cutoff) if cutoff is not None else None
+
+    def raw_kept(bucket_epoch: int) -> bool:
+        return raw_since is None or bucket_epoch >= raw_since
+
+    # 롤업에서 읽는 범위 [full_lo, full_hi) 와 원본에서 읽는 가장자리 (since, before, until)
+    full_lo: Optional[int] = None
+    full_hi: Optional[int] = None
+    edges: List[Tuple[datetime, Optional[datetime], Optional[datetime]]] = []
+    if start_date:
+        start = to_epoch(start_date)
+        lead = start - start % step
+        full_lo = lead
+        if (start != lead or start_date.microsecond) and raw_kept(lead):
+            full_lo = lead + step
+            edges.append((start_date, datetime.utcfromtimestamp(full_lo), end_date))
+    if end_date:
+        trail = to_epoch(end_date) // step * step
+        full_hi = trail + step
+        if raw_kept(trail):
+            full_hi = trail
+            edges.append((datetime.utcfromtimestamp(trail), None, end_date))
+    if full_lo is not None and full_hi is not None and full_lo > full_hi:
+        # 시작과 끝이 같은 롤업 칸 안: 전부 원본에서
+        edges = [(start_date, None, end_date)]
+        full_hi = full_lo
+
+    R = models.DataRollup
+    columns = [((R.bucket_epoch // seconds) * seconds).label("bucket"), R.count.label("count")]
+    for metric in METRICS:
+        columns += [
+            getattr(R, f"{metric}_{stat}").label(f"{metric}_{stat}")
+            for stat in ("min", "sum", "count", "max")
+        ]
+    for name in AIR_QUALITY_CLASSES:
+        columns.append(getattr(R, f"aq_{name}").label(f"aq_{name}"))
+    full = select(*columns).where(R.user_id == user_id, R.resolution == resolution)
+    if full_lo is not None:
+        full = full.where(R.bucket_epoch >= full_lo)
+    if full_hi is not None:
+        full = full.where(R.bucket_epoch < full_hi)
+
+    parts = [full] + [_raw_edge(db, user_id, seconds, *edge) for edge in edges]
+    source = union_all(*parts).subquery() if len(parts) > 1 else full.subquery()
+
+    out = [source.c.bucket, func.sum(source.c.count).label("count")]
+    for metric in METRICS:
+        # 값이 있었던 행 수로 나눔 (원본 집계의 AVG() 처럼 None 은 빠짐)
+        metric_count = func.nullif(func.sum(source.c[f"{metric}_count"]), 0)
+        out += [
+            func.min(source.c[f"{metric}_min"]).label(f"{metric}_min"),
+            (func.sum(source.c[f"{metric}_sum"]) * 1.0 / metric_count).label(f"{metric}_avg"),
+            func.max(source.c[f"{metric}_max"]).label(f"{metric}_max"),
+        ]
+    for name in AIR_QUALITY_CLASSES:
+        out.append(func.sum(source.c[f"aq_{name}"]).label(f"aq_{name}"))
+
+    query = select(*out).group_by(source.c.bucket).order_by(source.c.bucket.desc()).limit(limit)
+    return [bucket_row_to_point(row._mapping) for row in db.execute(query)]
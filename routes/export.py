@@ -0,0 +1,36 @@
+from fastapi import APIRouter, Depends, Query
+from fastapi.responses import StreamingResponse
+from typing import Literal, Optional
+from datetime import datetime
+
+from routes.user import get_current_user
+from auth_cache import AuthUser
+from aggregation import to_naive_utc
+from export_utils import EXPORT_FORMATS, stream_export
+
+router = APIRouter(
+    tags=["Export"]
+)
+
+
+@router.get("/export")
+async def export_measurements(
+    start_date: Optional[datetime] = Query(None, description="내보낼 시작 날짜/시간 (ISO 8601 형식)"),
+    end_date: Optional[datetime] = Query(None, description="내보낼 종료 날짜/시간 (ISO 8601 형식)"),
+    format: Literal["ndjson", "csv"] = Query("ndjson", description="출력 형식"),
+    gzip: bool = Query(False, description="gzip 압축 여부"),
+    current_user: AuthUser = Depends(get_current_user),
+):
+    # 전체 결과를 메모리에 올리지 않고 DB 커서에서 읽는 대로 바로 흘려보냄
+    # (stream_export 는 동기 제너레이터라 StreamingResponse 가 스레드풀에서 순회)
+    media_type, ext = EXPORT_FORMATS[format]
+    filename = f"measurements.{ext}"
+    if gzip:
+        media_type = "application/gzip"
+        filename += ".gz"
+
+    return StreamingResponse(
+        stream_export(current_user.User_ID, format, to_naive_utc(start_date), to_naive_utc(end_date), gzip),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
@@ -1,29 +1,165 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Request
+from sqlalchemy import tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, Query as OrmQuery
 import schemas  
 import models   
-from database import get_db 
-from typing import Optional
-from datetime import datetime
+from database import get_async_read_db
+from routes.user import get_current_user
+from auth_cache import AuthUser
+from aggregation import BUCKET_SECONDS, MAX_BUCKETS, aggregate_raw, to_naive_utc
+from recent_buffer import recent_readings
+import rollups
+import columnar
+from typing import Literal, Optional, Tuple
+from datetime import datetime, timedelta
+import base64
+import json
+import os
 
 router = APIRouter(
     tags=["Graph Data"]
 )
 
+# /graph 한 페이지 최대 크기 (limit 를 이보다 크게 줘도 여기까지만)
+GRAPH_MAX_PAGE_SIZE = int(os.getenv("GRAPH_MAX_PAGE_SIZE", "1000"))
+
+
+def encode_cursor(created_at: datetime, row_id: int) -> str:
+    """마지막 행의 (created_at, id) -> 클라이언트에 넘겨줄 불투명한 커서 문자열"""
+    raw = json.dumps([created_at.isoformat(), row_id]).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, row_id = json.loads(base64.urlsafe_b64decode(padded))
+        return datetime.fromisoformat(created_at), int(row_id)
+    except (ValueError, TypeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor",
+        )
+
+
+def build_graph_query(
+    db: Session,
+    user_id: int,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    after: Optional[Tuple[datetime, int]] = None,
+) -> OrmQuery:
+    """
+    유저 한 명의 기간 조회 쿼리 (최신순).
+    (user_id, created_at) 복합 인덱스 범위 스캔으로 처리되도록 user_id 조건을 항상 건다.
+    after 가 있으면 그 (created_at, id) 보다 오래된 행부터 (keyset 페이지네이션)
+    """
+    query = db.query(models.Data).filter(models.Data.user_id == user_id)
+
+    if start_date:
+        query = query.filter(models.Data.created_at >= start_date)
+    if end_date:
+        query = query.filter(models.Data.created_at <= end_date)
+    if after is not None:
+        # OFFSET 없이 인덱스에서 바로 이어서 읽으므로 몇 번째 페이지든 비용이 같다
+        query = query.filter(tuple_(models.Data.created_at, models.Data.id) < after)
+
+    return query.order_by(models.Data.created_at.desc(), models.Data.id.desc())
+
+
 @router.get("/graph", response_model=schemas.GraphResponse)
-def get_data_for_graph(
+async def get_data_for_graph(
+    request: Request,
     start_date: Optional[datetime] = Query(None, description="조회 시작 날짜/시간 (ISO 8601 형식)"), 
     end_date: Optional[datetime] = Query(None, description="조회 종료 날짜/시간 (ISO 8601 형식)"), 
-    db: Session = Depends(get_db)
+    bucket: Optional[Literal["1m", "5m", "1h", "1d"]] = Query(None, description="구간별 집계 단위 (지정하면 min/avg/max 집계 반환)"),
+    limit: int = Query(100, ge=1, description=f"한 페이지 크기 (최대 {GRAPH_MAX_PAGE_SIZE})"),
+    cursor: Optional[str] = Query(None, description="이전 응답의 next_cursor (다음 페이지 조회)"),
+    format: Optional[Literal["json", "columnar", "binary"]] = Query(None, description="응답 형식 (없으면 Accept 헤더로 결정, 기본 json)"),
+    db: AsyncSession = Depends(get_async_read_db),
+    current_user: AuthUser = Depends(get_current_user),
 ):
+    fmt = columnar.negotiate_format(format, request.headers.get("accept"))
+    # 최근값 버퍼 / 원본 / 롤업 어느 경로든 같은 기준(naive UTC)으로 비교하도록 한 번만 변환
+    start_date, end_date = to_naive_utc(start_date), to_naive_utc(end_date)
+
+    if bucket is not None:
+        # 구간별 min / avg / max 집계 (DB 에서 GROUP BY)
+        # 긴 기간은 롤업 테이블에서, 짧은 기간은 원본 data 에서 바로 집계
+        aggregate = (
+            rollups.aggregate_rollups
+            if rollups.should_use_rollups(start_date, end_date)
+            else aggregate_raw
+        )
+        # 동기 집계 함수를 그대로 재사용 (run_sync 안의 DB I/O 도 이벤트 루프에서 대기)
+        buckets = await db.run_sync(
+            aggregate,
+            current_user.User_ID,
+            BUCKET_SECONDS[bucket],
+            start_date,
+            end_date,
+            limit=MAX_BUCKETS,
+        )
+        if fmt != "json":
+            return columnar.columnar_response(
+                columnar.bucket_columns(buckets), {"bucket": bucket}, fmt
+            )
+        return {"bucket": bucket, "buckets": buckets}
     
-    query = db.query(models.Data)
-    
-    if start_date:
-        query = query.filter(models.Data.created_at >= start_date)
-    if end_date:
-        query = query.filter(models.Data.created_at <= end_date)
-        
-    data_list = query.order_by(models.Data.created_at.desc()).limit(100).all()
+    after = decode_cursor(cursor) if cursor else None
+    page_size = min(limit, GRAPH_MAX_PAGE_SIZE)
+
+    def fetch_page(sync_db: Session, columns_only: bool) -> list:
+        query = build_graph_query(sync_db, current_user.User_ID, start_date, end_date, after)
+        if columns_only:
+            query = query.with_entities(*columnar.POINT_COLUMNS)
+        return query.limit(page_size + 1).all()
+
+    # 최근 구간이면 메모리의 최근값 버퍼에서 바로 (DB 조회 없음)
+    recent = recent_readings.query(current_user.User_ID, start_date, end_date, after, page_size + 1)
+
+    if fmt != "json":
+        # 컬럼형 응답: ORM 객체 / DataPoint 모델 없이 행 튜플에서 바로 배열 생성
+        if recent is not None:
+            rows = [point[:6] for point in recent]
+        else:
+            rows = await db.run_sync(fetch_page, True)
+        next_cursor = None
+        if len(rows) > page_size:
+            rows = rows[:page_size]
+            next_cursor = encode_cursor(rows[-1][1], rows[-1][0])
+        return columnar.columnar_response(
+            columnar.point_columns(rows), {"next_cursor": next_cursor}, fmt
+        )
+
+    # 한 개 더 읽어서 다음 페이지가 있는지 확인
+    data_list = recent if recent is not None else await db.run_sync(fetch_page, False)
+
+    next_cursor = None
+    if len(data_list) > page_size:
+        data_list = data_list[:page_size]
+        last = data_list[-1]
+        next_cursor = encode_cursor(last.created_at, last.id)
+
+    return {"points": data_list, "next_cursor": next_cursor}
+
+
+@router.get("/latest", response_model=schemas.LatestResponse)
+async def get_latest(
+    minutes: int = Query(0, ge=0, le=1440, description="최신값과 함께 돌려줄 최근 구간 (분, 0 이면 최신값만)"),
+    db: AsyncSession = Depends(get_async_read_db),
+    current_user: AuthUser = Depends(get_current_user),
+):
+    """대시보드 현재값 카드용. 보통 최근값 버퍼에서 DB 조회 없이 응답"""
+    start_date = datetime.utcnow() - timedelta(minutes=minutes) if minutes else None
+    limit = GRAPH_MAX_PAGE_SIZE if minutes else 1
+
+    points = recent_readings.query(current_user.User_ID, start_date, None, None, limit)
+    if points is None:
+        def fetch(sync_db: Session) -> list:
+            return build_graph_query(sync_db, current_user.User_ID, start_date).limit(limit).all()
+
+        points = await db.run_sync(fetch)
 
-    return {"points": data_list}
\ No newline at end of file
+    return {"latest": points[0] if points else None, "points": points if minutes else []}
@@ -1,17 +1,32 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Body, Depends, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
+from pydantic import TypeAdapter, ValidationError
+from sqlalchemy.ext.asyncio import AsyncSession
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+import os
 
 import schemas  
 import models   
-from database import get_db 
-from routes.user import get_current_user 
+from database import get_async_db
+from routes.user import get_current_user
+from auth_cache import AuthUser
+import rollups
+from aggregation import classify_air_quality, to_naive_utc
+from ingest import insert_data_rows
+from relay import row_relay
 
 router = APIRouter(
     tags=["Measurement & Storage"]
 )
 
+# /measurement/batch 한 요청에 받을 수 있는 최대 측정값 수
+MEASUREMENT_BATCH_MAX_ITEMS = int(os.getenv("MEASUREMENT_BATCH_MAX_ITEMS", "10000"))
+# 클라이언트가 보낸 created_at 이 서버 시각보다 이만큼 넘게 미래면 거부 (기기 시계 오차 허용치)
+MEASUREMENT_MAX_CLOCK_SKEW_SECONDS = float(os.getenv("MEASUREMENT_MAX_CLOCK_SKEW_SECONDS", "300"))
+
 @router.post("/measurement", response_model=schemas.DataPoint, status_code=status.HTTP_201_CREATED)
-def record_measurement(data: schemas.MeasurementCreate, db: Session = Depends(get_db),  current_user: models.User = Depends(get_current_user)):
+async def record_measurement(data: schemas.MeasurementCreate, db: AsyncSession = Depends(get_async_db),  current_user: AuthUser = Depends(get_current_user)):
     
     air_quality = "good" if data.pm25 < 15 else ("normal" if data.pm25 < 50 else "bad")
     
@@ -20,17 +35,21 @@ def record_measurement(data: schemas.MeasurementCreate, db: Session = Depends(ge
         humidity=data.humidity,
         pm25=data.pm25,
         air_quality=air_quality,
-        user_id=current_user.User_ID
+        user_id=current_user.User_ID,
+        created_at=datetime.utcnow(),
     )
     
     db.add(new_data)
-    db.commit()
-    db.refresh(new_data)
+    # 롤업 UPSERT 는 동기 헬퍼를 그대로 재사용 (같은 트랜잭션)
+    await db.run_sync(rollups.apply_rows, [rollups.row_from_data(new_data)])
+    await db.commit()
+    await db.refresh(new_data)
+    row_relay.publish_data([new_data])
     
     return new_data
 
 @router.post("/storage", response_model=schemas.DataPoint, status_code=status.HTTP_200_OK)
-def store_data(data: schemas.StorageCreate, db: Session = Depends(get_db), current_user: models.User = Depends(get_current_user)):
+async def store_data(data: schemas.StorageCreate, db: AsyncSession = Depends(get_async_db), current_user: AuthUser = Depends(get_current_user)):
     
 
     air_quality = "good" if data.pm25 < 15 else ("normal" if data.pm25 < 50 else "bad")
@@ -41,11 +60,118 @@ def store_data(data: schemas.StorageCreate, db: Session = Depends(get_db), curre
         pm25=data.pm25,
         note=data.note,
         air_quality=air_quality,
-        user_id=current_user.User_ID 
+        user_id=current_user.User_ID,
+        created_at=datetime.utcnow(),
     )
     
     db.add(new_data)
-    db.commit()
-    db.refresh(new_data)
+    # 롤업 UPSERT 는 동기 헬퍼를 그대로 재사용 (같은 트랜잭션)
+    await db.run_sync(rollups.apply_rows, [rollups.row_from_data(new_data)])
+    await db.commit()
+    await db.refresh(new_data)
+    row_relay.publish_data([new_data])
     
-    return new_data
\ No newline at end of file
+    return new_data
+
+
+def _validation_message(errors: List[dict]) -> str:
+    return "; ".join(
+        f"{'.'.join(str(p) for p in err['loc']) or 'item'}: {err['msg']}"
+        for err in errors
+    )
+
+
+# 배열 전체를 한 번에 검증 (항목마다 model_validate 를 부르지 않음)
+_batch_adapter = TypeAdapter(List[schemas.BatchMeasurementItem])
+
+
+def _parse_batch(
+    items: List[Any], user_id: int, now: datetime
+) -> Tuple[List[schemas.BatchItemResult], List[dict], List[schemas.BatchItemResult]]:
+    """
+    검증 + air_quality 분류 -> (항목별 결과, INSERT 할 행 dict, 저장될 항목의 결과).
+    최대 MEASUREMENT_BATCH_MAX_ITEMS 개를 다루는 CPU 작업이라 threadpool 에서 실행한다.
+    """
+    latest_allowed = now + timedelta(seconds=MEASUREMENT_MAX_CLOCK_SKEW_SECONDS)
+
+    # 1) 검증: 실패하면 오류를 항목 index 별로 모으고, 나머지만 다시 한 번에 검증
+    errors: Dict[int, List[dict]] = {}
+    try:
+        parsed = _batch_adapter.validate_python(items)
+        indexes = list(range(len(items)))
+    except ValidationError as e:
+        for err in e.errors():
+            index, *loc = err["loc"]
+            errors.setdefault(index, []).append({**err, "loc": tuple(loc)})
+        indexes = [i for i in range(len(items)) if i not in errors]
+        parsed = _batch_adapter.validate_python([items[i] for i in indexes])
+
+    results: List[Optional[schemas.BatchItemResult]] = [None] * len(items)
+    for index, errs in errors.items():
+        results[index] = schemas.BatchItemResult(index=index, status="invalid", error=_validation_message(errs))
+
+    valid: List[schemas.BatchMeasurementItem] = []
+    valid_results: List[schemas.BatchItemResult] = []
+    timestamps: List[datetime] = []
+    for index, item in zip(indexes, parsed):
+        # DB 는 naive UTC 로 저장
+        created_at = to_naive_utc(item.created_at or now)
+        if created_at > latest_allowed:
+            results[index] = schemas.BatchItemResult(index=index, status="invalid", error="created_at: in the future")
+            continue
+        result = schemas.BatchItemResult(index=index, status="created")
+        results[index] = result
+        valid.append(item)
+        valid_results.append(result)
+        timestamps.append(created_at)
+
+    # 2) air_quality 한 번에 계산 후 행 dict 생성
+    air_qualities = classify_air_quality(item.pm25 for item in valid)
+    rows = [
+        {
+            "temperature": item.temperature,
+            "humidity": item.humidity,
+            "pm25": item.pm25,
+            "note": item.note,
+            "air_quality": air_quality,
+            "user_id": user_id,
+            "created_at": created_at,
+        }
+        for item, air_quality, created_at in zip(valid, air_qualities, timestamps)
+    ]
+    return results, rows, valid_results
+
+
+@router.post("/measurement/batch", response_model=schemas.BatchMeasurementResponse, status_code=status.HTTP_200_OK)
+async def record_measurements_batch(
+    items: List[Any] = Body(..., description="MeasurementCreate / StorageCreate 배열 (created_at 선택)"),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: AuthUser = Depends(get_current_user),
+):
+    # 오프라인 동안 쌓인 측정값을 한 번에 저장. 잘못된 항목만 invalid 로 돌려주고 나머지는 저장한다.
+    if len(items) > MEASUREMENT_BATCH_MAX_ITEMS:
+        raise HTTPException(
+            status_code=413,  # Content Too Large
+            detail=f"한 번에 최대 {MEASUREMENT_BATCH_MAX_ITEMS}개까지 보낼 수 있습니다.",
+        )
+
+    # 검증/분류는 이벤트 루프를 막지 않도록 threadpool 에서
+    results, rows, valid_results = await run_in_threadpool(
+        _parse_batch, items, current_user.User_ID, datetime.utcnow()
+    )
+
+    # 3) 한 트랜잭션으로 INSERT (executemany) + 롤업 누적, 행을 다시 읽지 않음
+    if rows:
+        await db.run_sync(insert_data_rows, rows)
+        await db.run_sync(rollups.apply_rows, rows)
+        await db.commit()
+        for result, row in zip(valid_results, rows):
+            result.id = row.get("id")
+        # 최근값 버퍼 + 구독 중인 대시보드에 바로 전달
+        row_relay.publish_rows(rows)
+
+    return {
+        "created": len(rows),
+        "failed": len(results) - len(rows),
+        "results": results,
+    }
@@ -0,0 +1,80 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from fastapi.responses import StreamingResponse
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import AsyncIterator, Optional
+import json
+import os
+
+from database import get_async_read_db
+from routes.user import authenticate_token
+from pubsub import pubsub, Subscription
+
+router = APIRouter(
+    tags=["Realtime"]
+)
+
+# 보낼 데이터가 없을 때 연결 유지용 주석을 보내는 간격 (초)
+STREAM_KEEPALIVE_SECONDS = float(os.getenv("STREAM_KEEPALIVE_SECONDS", "15"))
+
+optional_bearer = HTTPBearer(auto_error=False)
+
+
+async def event_stream(request: Request, sub: Subscription) -> AsyncIterator[str]:
+    """
+    Server-Sent Events 형식:
+      event: readings  data: [DataPoint, ...]   새로 저장된 측정값
+      event: dropped   data: {"dropped": n}      느려서 버려진 메시지 수 -> /graph 로 다시 맞추면 됨
+    """
+    try:
+        # 연결 직후 바로 헤더/첫 바이트를 내보내고, 끊겼을 때 재연결 간격을 알려줌
+        yield "retry: 3000\n\n"
+        while True:
+            batch = await sub.get(STREAM_KEEPALIVE_SECONDS)
+            if await request.is_disconnected():
+                break
+            if batch is None:
+                yield ": keepalive\n\n"
+                continue
+
+            messages, dropped = batch
+            if dropped:
+                yield f"event: dropped\ndata: {json.dumps({'dropped': dropped})}\n\n"
+            for message in messages:
+                yield f"event: readings\ndata: {message}\n\n"
+            if sub.closed:
+                # overflow_policy=disconnect 로 끊긴 경우
+                break
+    finally:
+        pubsub.unsubscribe(sub)
+
+
+@router.get("/stream")
+async def stream_measurements(
+    request: Request,
+    token: Optional[str] = Query(None, description="Authorization 헤더를 쓸 수 없는 EventSource 용 access token"),
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(optional_bearer),
+    db: AsyncSession = Depends(get_async_read_db),
+):
+    # 새 측정값이 저장될 때마다 바로 밀어줌 -> 대시보드가 /graph 를 주기적으로 다시 조회할 필요 없음
+    if credentials is not None and credentials.scheme.lower() == "bearer":
+        token = credentials.credentials
+    if not token:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Not authenticated",
+        )
+    current_user = await authenticate_token(token, db)
+    # 스트림이 열려있는 동안 읽기 커넥션을 잡고 있지 않도록 바로 반납
+    await db.close()
+
+    sub = pubsub.subscribe(current_user.User_ID)
+    return StreamingResponse(
+        event_stream(request, sub),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            # nginx 등 프록시가 응답을 모아두지 않도록
+            "X-Accel-Buffering": "no",
+        },
+    )
@@ -1,15 +1,21 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy import delete, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 
-from passlib.context import CryptContext
 from typing import Optional
 from datetime import datetime, timedelta
 from jose import JWTError, jwt
 
 import schemas
 import models
-from database import get_db
+from database import async_writer_session, get_async_db, get_async_read_db
+from alert_cache import alert_targets, AlertTarget
+from alert_cooldown import alert_cooldown
+from alert_rules import alert_rules
+from auth_cache import auth_users, AuthUser
+from passwords import check_password, hash_password
+from recent_buffer import recent_readings
 
 # -----------------------------
 # 공통 설정 (보안 / JWT / Router)
@@ -21,18 +27,6 @@ router = APIRouter(
 )
 
 
-# ✅ bcrypt 대신 pbkdf2_sha256 사용 (추가 설치 필요 없음)
-pwd_context = CryptContext(schemes=["pbkdf2_sha256"], deprecated="auto")
-
-
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
-
-
-def get_password_hash(password: str) -> str:
-    return pwd_context.hash(password)
-
-
 SECRET_KEY = "This!Is-My#32CHAR.Secure@Code~Key"  # 실제 서비스에서는 env로 분리 추천
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60
@@ -53,10 +47,10 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
     return token
 
 
-def get_current_user(
+async def get_current_user(
     token: HTTPAuthorizationCredentials = Depends(oauth2_scheme),
-    db: Session = Depends(get_db),
-) -> models.User:
+    db: AsyncSession = Depends(get_async_read_db),
+) -> AuthUser:
     # Authorization 헤더가 없거나 Bearer가 아니면
     if token is None or token.scheme.lower() != "bearer":
         raise HTTPException(
@@ -64,7 +58,15 @@ def get_current_user(
             detail="Not authenticated",
         )
 
-    token_str = token.credentials
+    return await authenticate_token(token.credentials, db)
+
+
+async def authenticate_token(token_str: str, db: AsyncSession) -> AuthUser:
+    """JWT 문자열 검증 + 유저 조회 (헤더를 못 쓰는 EventSource 등은 쿼리 파라미터 토큰으로 호출)"""
+    # 이미 검증한 토큰이면 JWT 디코딩 / DB 조회 없이 바로 반환
+    cached = auth_users.get(token_str)
+    if cached is not None:
+        return cached
 
     try:
         payload = jwt.decode(token_str, SECRET_KEY, algorithms=[ALGORITHM])
@@ -81,43 +83,50 @@ def get_current_user(
             detail="Could not validate credentials",
         )
 
-    user = db.query(models.User).filter(models.User.User_ID == user_id).first()
+    user = await db.get(models.User, user_id)
     if user is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="User not found",
         )
 
-    return user
+    current_user = AuthUser.from_user(user)
+    auth_users.put(token_str, current_user, payload.get("exp"))
+    return current_user
 
 
 # -----------------------------
 # 1) 회원가입
 # -----------------------------
 @router.post("/users", response_model=schemas.UserInfo, status_code=status.HTTP_201_CREATED)
-def register_user(user: schemas.UserCreate, db: Session = Depends(get_db)):
+async def register_user(user: schemas.UserCreate, db: AsyncSession = Depends(get_async_read_db)):
     # 이메일 중복 체크
-    if db.query(models.User).filter(models.User.useremail == user.useremail).first():
+    if await db.scalar(select(models.User).filter(models.User.useremail == user.useremail)):
         raise HTTPException(
             status_code=status.HTTP_409_CONFLICT,
             detail="Useremail already exists",
         )
 
     # 닉네임 중복 체크
-    if db.query(models.User).filter(models.User.username == user.username).first():
+    if await db.scalar(select(models.User).filter(models.User.username == user.username)):
         raise HTTPException(
             status_code=status.HTTP_409_CONFLICT,
             detail="Username already exists",
         )
 
+    await db.close()
+
     new_user = models.User(
         username=user.username,
         useremail=user.useremail,
-        userpassword=get_password_hash(user.password),
+        # 해시 계산은 CPU 작업이라 요청 처리와 분리된 해시 전용 프로세스 풀에서
+        userpassword=await hash_password(user.password),
     )
-    db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    # 중복 체크 / 해시 계산은 읽기 세션으로 하고 쓰기 잠금은 INSERT 하는 동안만 잡음 (MQTT 저장 등을 막지 않음)
+    async with async_writer_session() as write_db:
+        write_db.add(new_user)
+        await write_db.commit()
+        await write_db.refresh(new_user)
 
     # UserInfo(response_model)가 ORM 객체에서 알아서 필드 매핑 (from_attributes=True)
     return new_user
@@ -127,19 +136,38 @@ def register_user(user: schemas.UserCreate, db: Session = Depends(get_db)):
 # 2) 로그인 (JWT 발급)
 # -----------------------------
 @router.post("/users/login", response_model=schemas.TokenResponse)
-def login_user(user_login: schemas.UserLogin, db: Session = Depends(get_db)):
-    db_user = (
-        db.query(models.User)
-        .filter(models.User.useremail == user_login.useremail)
-        .first()
+async def login_user(user_login: schemas.UserLogin, db: AsyncSession = Depends(get_async_read_db)):
+    db_user = await db.scalar(
+        select(models.User).filter(models.User.useremail == user_login.useremail)
     )
 
-    if db_user is None or not verify_password(user_login.password, db_user.userpassword):
+    if db_user is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid email or password",
+        )
+
+    # 조회는 읽기 세션으로, 해시 계산 동안에는 커넥션을 돌려줌
+    # (expire_on_commit=False 라 db_user 속성은 그대로 읽을 수 있음)
+    await db.close()
+
+    valid, new_hash = await check_password(user_login.password, db_user.userpassword)
+    if not valid:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid email or password",
         )
 
+    # 예전 설정(PBKDF2_ROUNDS 미만 등)으로 저장된 해시면 새 설정으로 다시 저장
+    if new_hash is not None:
+        async with async_writer_session() as write_db:
+            await write_db.execute(
+                update(models.User)
+                .where(models.User.User_ID == db_user.User_ID)
+                .values(userpassword=new_hash)
+            )
+            await write_db.commit()
+
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
         data={"sub": str(db_user.User_ID)},
@@ -157,8 +185,8 @@ def login_user(user_login: schemas.UserLogin, db: Session = Depends(get_db)):
 # 3) 내 정보 조회
 # -----------------------------
 @router.get("/user/info", response_model=schemas.UserInfo)
-def get_current_user_info(current_user: models.User = Depends(get_current_user)):
-    # current_user는 get_current_user에서 JWT 검증 후 가져온 User ORM 객체
+async def get_current_user_info(current_user: AuthUser = Depends(get_current_user)):
+    # current_user는 get_current_user에서 JWT 검증 후 가져온 유저 스냅샷 (DB 조회 없음)
     return current_user
 
 
@@ -170,10 +198,10 @@ def get_current_user_info(current_user: models.User = Depends(get_current_user))
     response_model=schemas.AlertResponse,
     status_code=status.HTTP_200_OK,
 )
-def update_alert_settings(
+async def update_alert_settings(
     settings: schemas.AlertThreshold,
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: AuthUser = Depends(get_current_user),
 ):
     # ✅ 세 항목이 전부 None이면만 에러 (여러 개 동시에 설정 허용)
     if (
@@ -187,11 +215,7 @@ def update_alert_settings(
         )
 
     # 현재 유저의 AlertSetting 조회 (없으면 새로 생성)
-    db_settings = (
-        db.query(models.AlertSetting)
-        .filter(models.AlertSetting.user_id == current_user.User_ID)
-        .first()
-    )
+    db_settings = await db.get(models.AlertSetting, current_user.User_ID)
     if not db_settings:
         db_settings = models.AlertSetting(user_id=current_user.User_ID)
         db.add(db_settings)
@@ -208,11 +232,20 @@ def update_alert_settings(
     if settings.humidity_check is not None:
         db_settings.humidity_threshold = settings.humidity_check
 
+    # 항목별 규칙 (above / below / range) 과 range 상한
+    for metric in ("pm25", "temperature", "humidity"):
+        setattr(db_settings, f"{metric}_rule", getattr(settings, f"{metric}_rule") or "above")
+        setattr(db_settings, f"{metric}_upper_threshold", getattr(settings, f"{metric}_upper_check"))
+
     # 알림 주기(분)
     db_settings.interval_minutes = settings.minutes
 
-    db.commit()
-    db.refresh(db_settings)
+    await db.commit()
+    await db.refresh(db_settings)
+
+    # MQTT 알림 경로의 캐시도 바로 갱신 (write-through)
+    alert_targets.put(AlertTarget.from_rows(current_user, db_settings))
+    alert_rules.invalidate()
 
     return db_settings
 
@@ -224,10 +257,10 @@ def update_alert_settings(
 # 5) 계정 삭제
 # -----------------------------
 @router.delete("/users/{user_id}", status_code=status.HTTP_200_OK)
-def delete_user(
+async def delete_user(
     user_id: int,
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: AuthUser = Depends(get_current_user),
 ):
     # 자기 자신만 삭제 가능
     if current_user.User_ID != user_id:
@@ -236,13 +269,23 @@ def delete_user(
             detail="Not allowed to delete this user",
         )
 
-    db_user_query = db.query(models.User).filter(models.User.User_ID == user_id)
-    if not db_user_query.first():
+    if await db.get(models.User, user_id) is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="User not found",
         )
 
-    db_user_query.delete(synchronize_session=False)
-    db.commit()
+    await db.execute(
+        delete(models.User)
+        .where(models.User.User_ID == user_id)
+        .execution_options(synchronize_session=False)
+    )
+    await db.commit()
+
+    # 삭제된 유저의 토큰으로는 더 이상 인증되지 않고, 알림도 나가지 않도록 캐시 제거
+    auth_users.invalidate_user(user_id)
+    alert_targets.invalidate(user_id)
+    alert_rules.invalidate()
+    alert_cooldown.forget_user(user_id)
+    recent_readings.forget_user(user_id)
     return {"detail": "성공"}
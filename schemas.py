@@ -1,6 +1,6 @@
-from pydantic import BaseModel, EmailStr, Field
+from pydantic import BaseModel, EmailStr, Field, model_validator
 from datetime import datetime
-from typing import Optional, List
+from typing import Literal, Optional, List
 
 
 # -----------------------------
@@ -45,15 +45,34 @@ class TokenResponse(BaseModel):
 # 2) 측정/그래프 관련
 # -----------------------------
 class MeasurementCreate(BaseModel):
-    temperature: float = Field(..., ge=0)
-    humidity: float = Field(..., ge=0)
-    pm25: float = Field(..., ge=0)
+    # 0 이상의 유한한 값만 (MQTT 페이로드는 payloads._measurement: 온도만 음수 허용)
+    temperature: float = Field(..., ge=0, allow_inf_nan=False)
+    humidity: float = Field(..., ge=0, allow_inf_nan=False)
+    pm25: float = Field(..., ge=0, allow_inf_nan=False)
 
 
 class StorageCreate(MeasurementCreate):
     note: Optional[str] = None
 
 
+class BatchMeasurementItem(StorageCreate):
+    # 게이트웨이가 오프라인 동안 모아둔 값이면 실제 측정 시각 (없으면 서버 수신 시각)
+    created_at: Optional[datetime] = None
+
+
+class BatchItemResult(BaseModel):
+    index: int
+    status: str  # "created" | "invalid"
+    id: Optional[int] = None
+    error: Optional[str] = None
+
+
+class BatchMeasurementResponse(BaseModel):
+    created: int
+    failed: int
+    results: List[BatchItemResult]
+
+
 class DataPoint(BaseModel):
     id: int
     created_at: datetime
@@ -68,25 +87,87 @@ class DataPoint(BaseModel):
         populate_by_name = True
 
 
+class BucketPoint(BaseModel):
+    # 구간 시작 시각 (UTC) 과 구간 안의 측정 개수
+    bucket_start: datetime
+    count: int
+
+    temperature_min: Optional[float] = None
+    temperature_avg: Optional[float] = None
+    temperature_max: Optional[float] = None
+    humidity_min: Optional[float] = None
+    humidity_avg: Optional[float] = None
+    humidity_max: Optional[float] = None
+    pm25_min: Optional[float] = None
+    pm25_avg: Optional[float] = None
+    pm25_max: Optional[float] = None
+
+    # 구간 안에서 가장 많이 나온 공기질 등급
+    air_quality: Optional[str] = None
+
+
 class GraphResponse(BaseModel):
-    points: List[DataPoint]
+    points: List[DataPoint] = []
+    # 다음 페이지가 있으면 다음 요청의 cursor 로 그대로 넘기면 됨
+    next_cursor: Optional[str] = None
+    # bucket 파라미터를 준 경우에만 채워짐
+    bucket: Optional[str] = None
+    buckets: Optional[List[BucketPoint]] = None
+
+
+class LatestResponse(BaseModel):
+    # 가장 최근 측정값 (아직 없으면 None)
+    latest: Optional[DataPoint] = None
+    # minutes 를 준 경우 그 구간의 측정값 (최신순)
+    points: List[DataPoint] = []
 
 
 # -----------------------------
 # 3) 알림 설정 관련
 # -----------------------------
+AlertRule = Literal["above", "below", "range"]
+
+
 class AlertThreshold(BaseModel):
     pm25_check: Optional[int] = Field(None, gt=0)
     temperature_check: Optional[int] = Field(None, gt=0)
     humidity_check: Optional[int] = Field(None, gt=0)
     minutes: int = Field(..., ge=1, le=60)
 
+    # 항목별 규칙 (없으면 "above": 기준 이상이면 알림)
+    # "below": 기준 이하면 알림, "range": *_check ~ *_upper_check 범위를 벗어나면 알림
+    pm25_rule: Optional[AlertRule] = None
+    temperature_rule: Optional[AlertRule] = None
+    humidity_rule: Optional[AlertRule] = None
+    pm25_upper_check: Optional[int] = Field(None, gt=0)
+    temperature_upper_check: Optional[int] = Field(None, gt=0)
+    humidity_upper_check: Optional[int] = Field(None, gt=0)
+
+    @model_validator(mode="after")
+    def check_ranges(self) -> "AlertThreshold":
+        for metric in ("pm25", "temperature", "humidity"):
+            if getattr(self, f"{metric}_rule") != "range":
+                continue
+            lower = getattr(self, f"{metric}_check")
+            upper = getattr(self, f"{metric}_upper_check")
+            if lower is None or upper is None:
+                raise ValueError(f"{metric}_rule=range 는 {metric}_check 와 {metric}_upper_check 가 모두 필요합니다.")
+            if lower >= upper:
+                raise ValueError(f"{metric}_check 는 {metric}_upper_check 보다 작아야 합니다.")
+        return self
+
 
 class AlertResponse(BaseModel):
     pm25_threshold: Optional[int] = None
     temperature_threshold: Optional[int] = None
     humidity_threshold: Optional[int] = None
     interval_minutes: int
+    pm25_rule: Optional[str] = None
+    temperature_rule: Optional[str] = None
+    humidity_rule: Optional[str] = None
+    pm25_upper_threshold: Optional[int] = None
+    temperature_upper_threshold: Optional[int] = None
+    humidity_upper_threshold: Optional[int] = None
     updated_at: datetime
 
     class Config:
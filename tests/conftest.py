@@ -0,0 +1,44 @@
+# tests/conftest.py
+import os
+import sys
+import tempfile
+
+# database / mqtt 등은 import 시점에 환경변수를 읽으므로 먼저 설정
+_tmp = tempfile.mkdtemp(prefix="airzy-test-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmp, 'test.db')}"
+# 테스트 세션이 커넥션을 잡고 있어도 다른 코드가 쓸 수 있도록 단일 writer 풀 대신 기본 엔진
+os.environ.setdefault("DB_PROFILE", "basic")
+os.environ.setdefault("MQTT_COORDINATION", "off")
+os.environ.setdefault("MQTT_LEADER_LOCK_FILE", os.path.join(_tmp, "ingest.lock"))
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest  # noqa: E402
+
+from database import Base, SessionLocal, engine  # noqa: E402
+from migrations import run_migrations  # noqa: E402
+import models  # noqa: E402
+
+run_migrations(engine)
+
+
+@pytest.fixture
+def db():
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.rollback()
+        # 테스트마다 빈 DB 에서 시작
+        for table in reversed(Base.metadata.sorted_tables):
+            session.execute(table.delete())
+        session.commit()
+        session.close()
+
+
+@pytest.fixture
+def user(db):
+    u = models.User(username="tester", useremail="tester@example.com", userpassword="x")
+    db.add(u)
+    db.commit()
+    return u
@@ -0,0 +1,139 @@
+# tests/test_alert_cooldown.py
+from datetime import datetime, timedelta
+
+from alert_cooldown import AlertCooldown
+import models
+
+T0 = datetime(2026, 1, 1, 12, 0, 0)
+
+
+def feed(cooldown, db, user_id, values, threshold=50, interval=5, step=timedelta(minutes=10)):
+    """값들을 step 간격으로 넣고 메일을 보낸 값 목록을 반환 (step 이 interval 보다 길어 쿨다운은 항상 지남)"""
+    sent = []
+    for i, value in enumerate(values):
+        decision = cooldown.evaluate(db, user_id, "pm25", value, threshold, interval, now=T0 + step * i)
+        if decision is not None:
+            sent.append(value)
+    return sent
+
+
+def test_oscillation_around_threshold_alerts_once(db, user):
+    cooldown = AlertCooldown(hysteresis_ratio=0.05)
+    # 해제 기준 47.5 아래로 내려가지 않으면 같은 초과 구간
+    assert feed(cooldown, db, user.User_ID, [60, 49, 51, 49, 55]) == [60]
+
+
+def test_new_episode_after_clear(db, user):
+    cooldown = AlertCooldown(hysteresis_ratio=0.05)
+    assert feed(cooldown, db, user.User_ID, [60, 49, 45, 52, 40, 70]) == [60, 52, 70]
+
+
+def test_suppressed_breaches_are_summarised(db, user):
+    cooldown = AlertCooldown(hysteresis_ratio=0.05)
+    uid = user.User_ID
+    assert cooldown.evaluate(db, uid, "pm25", 60, 50, 5, now=T0) is not None
+    assert cooldown.evaluate(db, uid, "pm25", 80, 50, 5, now=T0 + timedelta(minutes=1)) is None
+    assert cooldown.evaluate(db, uid, "pm25", 40, 50, 5, now=T0 + timedelta(minutes=2)) is None
+    decision = cooldown.evaluate(db, uid, "pm25", 55, 50, 5, now=T0 + timedelta(minutes=10))
+    assert decision.suppressed == 1 and decision.peak == 80
+
+
+def test_new_episode_within_interval_waits_for_cooldown(db, user):
+    cooldown = AlertCooldown(hysteresis_ratio=0.05)
+    uid = user.User_ID
+    minute = timedelta(minutes=1)
+    assert cooldown.evaluate(db, uid, "pm25", 60, 50, 5, now=T0) is not None
+    cooldown.evaluate(db, uid, "pm25", 40, 50, 5, now=T0 + minute)
+    # 해제 후 다시 초과했지만 직전 메일 후 5분이 안 지남 -> 미뤘다가 지난 뒤 첫 초과에서 보냄
+    assert cooldown.evaluate(db, uid, "pm25", 60, 50, 5, now=T0 + 2 * minute) is None
+    assert cooldown.evaluate(db, uid, "pm25", 51, 50, 5, now=T0 + 6 * minute) is not None
+
+
+def test_remind_while_active(db, user):
+    cooldown = AlertCooldown(hysteresis_ratio=0.05, remind_while_active=True)
+    assert feed(cooldown, db, user.User_ID, [60, 49, 51, 55]) == [60, 51, 55]
+
+
+def test_state_survives_restart(db, user):
+    first = AlertCooldown(hysteresis_ratio=0.05)
+    assert feed(first, db, user.User_ID, [60]) == [60]
+    first.flush(db)
+    assert db.get(models.AlertState, (user.User_ID, "pm25")).notified
+
+    # 재시작: DB 에서 복원된 구간이 아직 해제되지 않았으므로 다시 보내지 않음
+    second = AlertCooldown(hysteresis_ratio=0.05)
+    later = T0 + timedelta(hours=1)
+    assert second.evaluate(db, user.User_ID, "pm25", 55, 50, 5, now=later) is None
+    assert user.User_ID in second.active_user_ids()
+
+
+def test_below_rule_uses_given_breach_flags(db, user):
+    cooldown = AlertCooldown(hysteresis_ratio=0.05)
+    uid = user.User_ID
+    # alert_rules 가 평가한 결과(breached / cleared)를 그대로 사용
+    assert cooldown.evaluate(db, uid, "temperature", 5, 10, 5, now=T0, breached=True, cleared=False)
+    assert cooldown.evaluate(db, uid, "temperature", 9, 10, 5, now=T0 + timedelta(minutes=10),
+                             breached=True, cleared=False) is None
+    cooldown.evaluate(db, uid, "temperature", 12, 10, 5, now=T0 + timedelta(minutes=20),
+                      breached=False, cleared=True)
+    assert cooldown.evaluate(db, uid, "temperature", 4, 10, 5, now=T0 + timedelta(minutes=30),
+                             breached=True, cleared=False)
+
+
+def test_failed_send_is_retried_in_same_episode(db, user):
+    cooldown = AlertCooldown(hysteresis_ratio=0.05)
+    uid = user.User_ID
+    first = cooldown.evaluate(db, uid, "pm25", 60, 50, 5, now=T0)
+    assert first is not None
+    cooldown.send_failed(uid, first)
+
+    # 값이 내려가지 않은 채로 계속 초과 중이어도 쿨다운 없이 다음 측정값에서 다시 보냄
+    retry = cooldown.evaluate(db, uid, "pm25", 58, 50, 5, now=T0 + timedelta(seconds=10))
+    assert retry is not None
+    assert retry.suppressed == 1 and retry.peak == 60
+    assert cooldown.evaluate(db, uid, "pm25", 59, 50, 5, now=T0 + timedelta(minutes=10)) is None
+
+
+def test_send_failed_after_newer_send_is_ignored(db, user):
+    cooldown = AlertCooldown(hysteresis_ratio=0.05, remind_while_active=True)
+    uid = user.User_ID
+    stale = cooldown.evaluate(db, uid, "pm25", 60, 50, 5, now=T0)
+    newer = cooldown.evaluate(db, uid, "pm25", 61, 50, 5, now=T0 + timedelta(minutes=10))
+    assert newer is not None
+
+    cooldown.send_failed(uid, stale)
+    assert cooldown.evaluate(db, uid, "pm25", 62, 50, 5, now=T0 + timedelta(minutes=11)) is None
+
+
+def test_smtp_failure_keeps_episode_unnotified(db, user, monkeypatch):
+    import mqtt
+    from alert_cache import alert_targets
+    from alert_cooldown import alert_cooldown
+
+    db.add(models.AlertSetting(user_id=user.User_ID, pm25_threshold=50, interval_minutes=5))
+    db.commit()
+    alert_targets.invalidate(user.User_ID)
+    alert_cooldown.reset()
+    outcomes = [False, True]
+    sent = []
+
+    def fake_send(to, subject, body):
+        ok = outcomes.pop(0)
+        if ok:
+            sent.append(body)
+        return ok
+
+    monkeypatch.setattr(mqtt, "send_alert_email", fake_send)
+    try:
+        mqtt.check_and_send_alert(db, user.User_ID, 20, 40, 80)
+        db.expire_all()
+        assert db.get(models.AlertState, (user.User_ID, "pm25")).notified is False
+
+        # 같은 초과 구간의 다음 측정값에서 다시 보냄 (실패한 80 은 요약으로)
+        mqtt.check_and_send_alert(db, user.User_ID, 20, 40, 70)
+        db.expire_all()
+        assert db.get(models.AlertState, (user.User_ID, "pm25")).notified is True
+        assert len(sent) == 1 and "80" in sent[0]
+    finally:
+        alert_cooldown.reset()
+        alert_targets.invalidate(user.User_ID)
@@ -0,0 +1,70 @@
+# tests/test_alerts.py
+import threading
+
+import pytest
+
+import models
+from alert_rules import alert_rules, readings_to_array
+from alerts import AlertDispatcher, AlertEvent
+
+
+@pytest.fixture
+def rules(db, user):
+    db.add(models.AlertSetting(
+        user_id=user.User_ID,
+        pm25_threshold=50, pm25_rule="above",
+        temperature_threshold=10, temperature_rule="below",
+        humidity_threshold=30, humidity_upper_threshold=60, humidity_rule="range",
+    ))
+    db.commit()
+    alert_rules.invalidate()
+    alert_rules.evaluate(*readings_to_array([]))  # 임계값 표 컴파일
+    yield user.User_ID
+    alert_rules.invalidate()
+
+
+def test_merge_keeps_value_farthest_outside_each_rule(rules):
+    uid = rules
+    event = AlertEvent(uid, temperature=5, humidity=65, pm25=70)
+    event.merge(AlertEvent(uid, temperature=2, humidity=20, pm25=60), alert_rules.worse)
+    # above: 더 큰 값 / below: 더 작은 값 / range: 범위 밖으로 더 나간 값 (30 - 20 > 65 - 60)
+    assert (event.pm25, event.temperature, event.humidity) == (70, 2, 20)
+    assert event.merged == 2
+
+
+def test_merge_without_rules_keeps_max():
+    event = AlertEvent(1, temperature=None, humidity=40, pm25=10)
+    event.merge(AlertEvent(1, temperature=3, humidity=30, pm25=None))
+    assert (event.temperature, event.humidity, event.pm25) == (3, 40, 10)
+
+
+def test_dispatcher_merges_on_overflow_with_rule_aware_values(rules):
+    uid = rules
+    gate = threading.Event()
+    handled = []
+
+    def handler(event):
+        gate.wait(2)
+        handled.append(event)
+
+    dispatcher = AlertDispatcher(handler, workers=1, max_size=1, overflow_policy="merge",
+                                 worse=alert_rules.worse)
+    dispatcher.start()
+    try:
+        dispatcher.submit(AlertEvent(0, None, None, None))        # 워커가 잡고 대기
+        for _ in range(100):
+            if dispatcher.stats()["queue_depth"] == 0:
+                break
+            threading.Event().wait(0.01)
+        assert dispatcher.submit(AlertEvent(uid, temperature=8, humidity=None, pm25=None))
+        assert dispatcher.submit(AlertEvent(uid, temperature=1, humidity=None, pm25=None))
+        assert dispatcher.submit(AlertEvent(uid, temperature=9, humidity=None, pm25=None))
+        # 다른 유저의 이벤트는 합칠 곳이 없어 버려짐
+        assert not dispatcher.submit(AlertEvent(uid + 1, 1, 1, 1))
+    finally:
+        gate.set()
+        dispatcher.stop()
+
+    merged = handled[-1]
+    assert merged.temperature == 1 and merged.merged == 3
+    assert dispatcher.stats()["dropped"] == 1
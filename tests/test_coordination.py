@@ -0,0 +1,103 @@
+# tests/test_coordination.py
+import time
+
+from coordination import FileLock, IngestLeader, LeaderDuty, leader_duties
+
+
+class Recorder:
+    def __init__(self):
+        self.events = []
+
+    def duty(self, name):
+        return LeaderDuty(name, lambda: self.events.append(("start", name)),
+                          lambda: self.events.append(("stop", name)))
+
+
+def wait_for(predicate, timeout=3.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def test_file_lock_is_exclusive(tmp_path):
+    path = str(tmp_path / "leader.lock")
+    a, b = FileLock(path), FileLock(path)
+    assert a.try_acquire()
+    assert not b.try_acquire()
+    a.release()
+    assert b.try_acquire()
+    b.release()
+
+
+def test_standby_takes_over_duties(tmp_path):
+    path = str(tmp_path / "leader.lock")
+    first, second = Recorder(), Recorder()
+    a = IngestLeader(path, retry_seconds=0.05)
+    b = IngestLeader(path, retry_seconds=0.05)
+
+    a.start([first.duty("mqtt"), first.duty("retention")])
+    b.start([second.duty("mqtt"), second.duty("retention")])
+    assert a.is_leader and not b.is_leader
+    assert first.events == [("start", "mqtt"), ("start", "retention")]
+    assert second.events == []
+
+    a.stop()
+    # 멈출 때는 시작한 순서의 반대로
+    assert first.events[2:] == [("stop", "retention"), ("stop", "mqtt")]
+    assert wait_for(lambda: b.is_leader)
+    assert second.events == [("start", "mqtt"), ("start", "retention")]
+    b.stop()
+    assert not b.is_leader
+
+
+def test_failed_duty_releases_lock(tmp_path):
+    path = str(tmp_path / "leader.lock")
+    recorder = Recorder()
+
+    def broken():
+        raise RuntimeError("broker down")
+
+    leader = IngestLeader(path, retry_seconds=60)
+    leader.start([recorder.duty("retention"), LeaderDuty("mqtt", broken, lambda: None)])
+    assert not leader.is_leader
+    assert recorder.events == [("start", "retention"), ("stop", "retention")]
+    # 잠금을 놓았으므로 다른 프로세스가 잡을 수 있음
+    other = FileLock(path)
+    assert other.try_acquire()
+    other.release()
+    leader.stop()
+
+
+def test_leader_duties_by_mode():
+    assert [d.name for d in leader_duties("lock")] == ["mqtt", "retention"]
+    # shared 모드는 모든 워커가 구독하고 리더는 한 프로세스만 할 일만 맡음
+    assert "mqtt" not in [d.name for d in leader_duties("shared")]
+    assert "retention" in [d.name for d in leader_duties("shared")]
+
+
+def test_start_ingest_warms_buffer_after_relay_snapshot(monkeypatch):
+    import coordination
+
+    events = []
+    monkeypatch.setattr(coordination.row_relay, "start", lambda: events.append("relay"))
+    monkeypatch.setattr(type(coordination.row_relay), "running", property(lambda self: "relay" in events))
+    monkeypatch.setattr(coordination.recent_readings, "start_warm_up", lambda: events.append("warm_up"))
+
+    coordination.start_ingest("off")
+    assert events == ["relay", "warm_up"]
+
+
+def test_start_ingest_skips_buffer_without_relay(monkeypatch):
+    import coordination
+
+    events = []
+    monkeypatch.setattr(coordination.row_relay, "start", lambda: None)
+    monkeypatch.setattr(type(coordination.row_relay), "running", property(lambda self: False))
+    monkeypatch.setattr(coordination.recent_readings, "start_warm_up", lambda: events.append("warm_up"))
+
+    # 다른 워커의 행을 받을 수 없으면 버퍼를 채우지 않음 (조회는 항상 DB)
+    coordination.start_ingest("off")
+    assert events == []
@@ -0,0 +1,154 @@
+# tests/test_database.py
+import asyncio
+import os
+import subprocess
+import sys
+import textwrap
+import threading
+import time
+
+import pytest
+from sqlalchemy import exc, text
+
+import database
+from database import create_async_engines, create_engines
+
+
+@pytest.fixture
+def engines(tmp_path):
+    url = f"sqlite:///{tmp_path / 'writer.db'}"
+    write_engine, read_engine = create_engines(url, "production")
+    async_write, async_read = create_async_engines(database.to_async_url(url), "production")
+    with write_engine.begin() as conn:
+        conn.execute(text("CREATE TABLE t (v INTEGER)"))
+    yield write_engine, async_write
+    write_engine.dispose()
+    read_engine.dispose()
+    asyncio.run(async_write.dispose())
+    asyncio.run(async_read.dispose())
+
+
+def test_async_writer_waits_for_sync_writer_without_blocking_loop(engines):
+    write_engine, async_write = engines
+    order = []
+
+    def hold_sync_writer(held: threading.Event):
+        with write_engine.begin() as conn:
+            conn.execute(text("INSERT INTO t VALUES (1)"))
+            held.set()
+            time.sleep(0.3)
+            order.append("sync commit")
+
+    async def main():
+        held = threading.Event()
+        thread = threading.Thread(target=hold_sync_writer, args=(held,))
+        thread.start()
+        await asyncio.to_thread(held.wait)
+
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while "async write" not in order:
+                ticks += 1
+                await asyncio.sleep(0.02)
+
+        async def write():
+            async with database.sqlite_writer_slot():
+                async with async_write.begin() as conn:
+                    order.append("async write")
+                    await conn.execute(text("INSERT INTO t VALUES (2)"))
+
+        await asyncio.gather(ticker(), write())
+        thread.join()
+        return ticks
+
+    ticks = asyncio.run(main())
+    assert order == ["sync commit", "async write"]
+    # 기다리는 동안에도 이벤트 루프는 다른 작업을 처리함
+    assert ticks >= 5
+
+
+def test_async_writer_times_out_and_cancel_does_not_leak_lock(engines, monkeypatch):
+    write_engine, async_write = engines
+    monkeypatch.setattr(database, "DB_WRITE_POOL_TIMEOUT", 0.1)
+
+    async def write():
+        async with database.sqlite_writer_slot():
+            async with async_write.begin() as conn:
+                await conn.execute(text("INSERT INTO t VALUES (3)"))
+
+    async def cancelled_write():
+        task = asyncio.create_task(write())
+        await asyncio.sleep(0.02)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    with write_engine.connect():
+        with pytest.raises(exc.TimeoutError):
+            asyncio.run(write())
+        asyncio.run(cancelled_write())
+
+    # 잠금이 풀려 있어야 다음 쓰기가 바로 됨
+    asyncio.run(write())
+    with write_engine.connect() as conn:
+        assert conn.execute(text("SELECT v FROM t")).scalars().all() == [3]
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 기본(production) 프로필로 새 프로세스에서 실행: 쓰기 세션을 연 채로 알림 처리가 다시 쓰기 세션을 열면
+# 재진입이 안 되는 쓰기 잠금에서 DB_WRITE_POOL_TIMEOUT 동안 멈췄다가 실패한다
+DIRECT_SAVE_SCRIPT = textwrap.dedent("""
+    import time
+    from database import DB_PROFILE, SessionLocal, engine
+    from migrations import run_migrations
+    import models
+    import mqtt
+
+    assert DB_PROFILE == "production"
+    run_migrations(engine)
+    db = SessionLocal()
+    user = models.User(username="tester", useremail="tester@example.com", userpassword="x")
+    db.add(user)
+    db.commit()
+    db.add(models.AlertSetting(user_id=user.User_ID, pm25_threshold=50))
+    db.commit()
+    user_id = user.User_ID
+    db.close()
+
+    sent = []
+    mqtt.send_alert_email = lambda to, subject, body: sent.append(to) or True
+    assert mqtt._alert_dispatcher is None  # 알림 워커 없이 저장한 스레드에서 바로 처리
+
+    started = time.monotonic()
+    mqtt.save_measurement_to_db(20.0, 40.0, 80.0, user_id=user_id)
+    elapsed = time.monotonic() - started
+
+    db = SessionLocal()
+    assert db.query(models.Data).count() == 1
+    assert db.get(models.AlertState, (user_id, "pm25")).notified
+    db.close()
+    assert sent == ["tester@example.com"], sent
+    assert elapsed < 1.5, elapsed
+    print("ok")
+""")
+
+
+def test_direct_save_with_inline_alert_under_production_profile(tmp_path):
+    env = dict(os.environ)
+    env.pop("DB_PROFILE", None)
+    env.update(
+        DATABASE_URL=f"sqlite:///{tmp_path / 'prod.db'}",
+        DB_WRITE_POOL_TIMEOUT="2",
+        MQTT_LEADER_LOCK_FILE=str(tmp_path / "ingest.lock"),
+        PYTHONPATH=ROOT,
+    )
+    env.pop("ASYNC_DATABASE_URL", None)
+    result = subprocess.run(
+        [sys.executable, "-c", DIRECT_SAVE_SCRIPT],
+        cwd=str(tmp_path), env=env, capture_output=True, text=True, timeout=60,
+    )
+    assert result.returncode == 0, result.stdout + result.stderr
+    assert result.stdout.strip().endswith("ok")
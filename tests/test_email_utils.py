@@ -0,0 +1,89 @@
+# tests/test_email_utils.py
+import smtplib
+
+import pytest
+
+import email_utils
+from email_utils import SMTPPool, build_alert_email
+
+
+class FakeServer:
+    def __init__(self, fail_sends=0):
+        self.sent = []
+        self.fail_sends = fail_sends
+
+    def send_message(self, msg):
+        if self.fail_sends:
+            self.fail_sends -= 1
+            raise smtplib.SMTPServerDisconnected("gone")
+        self.sent.append(msg["To"])
+
+    def noop(self):
+        return (250, b"ok")
+
+    def close(self):
+        pass
+
+    def quit(self):
+        pass
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    calls = []
+    monkeypatch.setattr(email_utils.time, "sleep", calls.append)
+    return calls
+
+
+def make_pool(monkeypatch, connect):
+    pool = SMTPPool(host="localhost", port=25, user="a@x", password=None, starttls=False,
+                    auth=False, size=1, max_retries=3)
+    monkeypatch.setattr(pool, "_connect", connect)
+    return pool
+
+
+def test_healthy_sends_never_back_off(monkeypatch, sleeps):
+    server = FakeServer()
+    pool = make_pool(monkeypatch, lambda: server)
+    assert pool.send_many([build_alert_email(f"u{i}@x", "s", "b") for i in range(3)]) == 3
+    assert pool.send(build_alert_email("u3@x", "s", "b"))
+    assert sleeps == []
+    assert server.sent == ["u0@x", "u1@x", "u2@x", "u3@x"]
+
+
+def test_backoff_only_on_reconnect_and_resets_per_call(monkeypatch, sleeps):
+    attempts = []
+
+    def connect():
+        attempts.append(1)
+        if len(attempts) <= 2:
+            raise OSError("refused")
+        return FakeServer()
+
+    pool = make_pool(monkeypatch, connect)
+    assert pool.send(build_alert_email("u@x", "s", "b"))
+    base = email_utils.SMTP_BACKOFF_BASE_SECONDS
+    assert sleeps == [base, base * 2]
+    assert pool.stats()["connection_errors"] == 2
+
+    # 앞선 실패가 다음 전송을 늦추지 않음
+    sleeps.clear()
+    assert pool.send(build_alert_email("v@x", "s", "b"))
+    assert sleeps == []
+
+
+def test_gives_up_after_max_retries(monkeypatch, sleeps):
+    def connect():
+        raise OSError("refused")
+
+    pool = make_pool(monkeypatch, connect)
+    assert not pool.send(build_alert_email("u@x", "s", "b"))
+    assert len(sleeps) == 2
+    assert pool.stats()["failed"] == 1
+
+
+def test_reconnects_after_dropped_connection(monkeypatch, sleeps):
+    servers = [FakeServer(fail_sends=1), FakeServer()]
+    pool = make_pool(monkeypatch, lambda: servers.pop(0))
+    assert pool.send_many([build_alert_email("a@x", "s", "b"), build_alert_email("b@x", "s", "b")]) == 2
+    assert sleeps == [email_utils.SMTP_BACKOFF_BASE_SECONDS]
@@ -0,0 +1,64 @@
+# tests/test_graph_cursor.py
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import HTTPException
+
+import models
+from routes.graph import build_graph_query, decode_cursor, encode_cursor
+
+T0 = datetime(2026, 3, 10, 12, 0)
+
+
+def _add(db, user, times):
+    items = [models.Data(temperature=20, humidity=40, pm25=10, user_id=user.User_ID, created_at=t) for t in times]
+    db.add_all(items)
+    db.commit()
+    return items
+
+
+def _pages(db, user, page_size, between_pages=None):
+    """next_cursor 를 따라가며 모든 페이지의 id 를 모은다"""
+    seen, after = [], None
+    while True:
+        rows = build_graph_query(db, user.User_ID, after=after).limit(page_size + 1).all()
+        page = rows[:page_size]
+        seen.extend(row.id for row in page)
+        if len(rows) <= page_size:
+            return seen
+        after = decode_cursor(encode_cursor(page[-1].created_at, page[-1].id))
+        if between_pages is not None:
+            between_pages()
+
+
+def test_cursor_round_trip():
+    ts = datetime(2026, 3, 10, 12, 0, 0, 123456)
+    assert decode_cursor(encode_cursor(ts, 42)) == (ts, 42)
+
+
+@pytest.mark.parametrize("cursor", ["not-a-cursor", encode_cursor(T0, 1)[:-3]])
+def test_invalid_cursor_is_rejected(cursor):
+    with pytest.raises(HTTPException) as info:
+        decode_cursor(cursor)
+    assert info.value.status_code == 400
+
+
+def test_pages_cover_every_row_once_with_equal_timestamps(db, user):
+    # 같은 created_at 이 페이지 경계에 걸쳐도 id 로 이어서 읽어야 함
+    times = [T0] * 4 + [T0 - timedelta(seconds=1)] * 3 + [T0 - timedelta(seconds=2)]
+    items = _add(db, user, times)
+
+    seen = _pages(db, user, page_size=3)
+
+    expected = [d.id for d in sorted(items, key=lambda d: (d.created_at, d.id), reverse=True)]
+    assert seen == expected
+
+
+def test_new_rows_between_pages_do_not_shift_later_pages(db, user):
+    items = _add(db, user, [T0 - timedelta(minutes=i) for i in range(7)])
+
+    # OFFSET 방식이면 앞쪽에 새 행이 들어올 때 다음 페이지가 밀려서 중복이 생김
+    seen = _pages(db, user, page_size=2, between_pages=lambda: _add(db, user, [T0 + timedelta(minutes=1)]))
+
+    assert seen[:2] == [items[0].id, items[1].id]
+    assert seen == [d.id for d in items]
@@ -0,0 +1,92 @@
+# tests/test_ingest.py
+import threading
+import time
+from datetime import datetime
+
+import models
+from ingest import MeasurementBatcher, Reading, insert_data_rows
+
+
+def _reading(user, pm25=10.0):
+    return Reading(temperature=20.0, humidity=40.0, pm25=pm25, air_quality="good", user_id=user.User_ID)
+
+
+def test_flush_when_batch_is_full(db, user):
+    flushed = []
+    batcher = MeasurementBatcher(batch_size=3, max_delay=1.0, on_flushed=flushed.append)
+    batcher.start()
+    try:
+        batcher.submit_many([_reading(user) for _ in range(3)])
+        deadline = time.monotonic() + 0.5
+        while not flushed and time.monotonic() < deadline:
+            time.sleep(0.01)
+    finally:
+        batcher.stop()
+
+    # max_delay(1초)를 기다리지 않고 batch_size 에서 바로 flush
+    assert [len(rows) for rows in flushed] == [3]
+    assert all("id" in row for row in flushed[0])
+    assert db.query(models.Data).count() == 3
+    assert db.query(models.DataRollup).filter_by(resolution="1m").one().count == 3
+
+
+def test_flush_after_max_delay(db, user):
+    done = threading.Event()
+    batcher = MeasurementBatcher(batch_size=100, max_delay=0.05, on_flushed=lambda rows: done.set())
+    batcher.start()
+    try:
+        batcher.submit(_reading(user))
+        assert done.wait(2.0)
+    finally:
+        batcher.stop()
+
+    stats = batcher.stats()
+    assert (stats["batched"], stats["flushed"], stats["batches"], stats["dropped"]) == (1, 1, 1, 0)
+
+
+def test_drop_when_queue_is_full(db, user):
+    batcher = MeasurementBatcher(queue_size=2)
+
+    assert batcher.submit(_reading(user))
+    assert batcher.submit_many([_reading(user), _reading(user), _reading(user)]) == 1
+    assert not batcher.submit(_reading(user))
+
+    stats = batcher.stats()
+    assert (stats["batched"], stats["dropped"], stats["queue_depth"]) == (2, 3, 2)
+
+
+def test_stop_flushes_queued_readings(db, user):
+    batcher = MeasurementBatcher(batch_size=2, max_delay=0.05)
+    batcher.submit_many([_reading(user, pm25=float(i)) for i in range(5)])
+    batcher.start()
+    batcher.stop()
+
+    assert db.query(models.Data).count() == 5
+    assert batcher.stats()["flushed"] == 5
+
+
+def test_rows_without_user_are_dropped(db):
+    batcher = MeasurementBatcher()
+    # 유저가 하나도 없으면 기본 유저로도 저장할 수 없음
+    batcher._flush([Reading(temperature=20.0, humidity=40.0, pm25=10.0, air_quality="good")])
+
+    assert db.query(models.Data).count() == 0
+    assert batcher.stats()["dropped"] == 1
+
+
+def test_insert_data_rows_matches_returned_ids_to_rows(db, user):
+    at = datetime(2026, 3, 10, 12, 0, 0, 123456)
+    values = [(20.5, 40.0, 12.0), (None, 41.0, 3.5), (20.5, 40.0, 12.0), (-3.25, 0.0, 99.9)]
+    rows = [
+        {"temperature": t, "humidity": h, "pm25": p, "air_quality": "good", "user_id": user.User_ID, "created_at": at}
+        for t, h, p in values
+    ]
+    insert_data_rows(db, rows)
+    db.commit()
+
+    assert len({row["id"] for row in rows}) == len(rows)
+    for row in rows:
+        stored = db.get(models.Data, row["id"])
+        assert (stored.temperature, stored.humidity, stored.pm25, stored.created_at) == (
+            row["temperature"], row["humidity"], row["pm25"], at,
+        )
@@ -0,0 +1,35 @@
+# tests/test_measurement_batch.py
+from datetime import datetime, timedelta, timezone
+
+from aggregation import classify_air_quality
+from routes.measurement import _parse_batch
+
+NOW = datetime(2026, 3, 10, 12, 0)
+
+
+def test_classify_air_quality_boundaries():
+    assert classify_air_quality([0, 14.9, 15, 49.9, 50, 300]) == ["good", "good", "normal", "normal", "bad", "bad"]
+    assert classify_air_quality([]) == []
+
+
+def test_parse_batch_keeps_valid_items_and_reports_invalid_ones():
+    items = [
+        {"temperature": 20, "humidity": 40, "pm25": 10},
+        {"temperature": 20, "humidity": 40},
+        {"temperature": 20, "humidity": 40, "pm25": 60, "note": "kitchen",
+         "created_at": datetime(2026, 3, 10, 20, 0, tzinfo=timezone(timedelta(hours=9))).isoformat()},
+        "not-an-object",
+        {"temperature": 20, "humidity": 40, "pm25": 20, "created_at": (NOW + timedelta(hours=1)).isoformat()},
+    ]
+
+    results, rows, valid_results = _parse_batch(items, 7, NOW)
+
+    assert [r.index for r in results] == [0, 1, 2, 3, 4]
+    assert [r.status for r in results] == ["created", "invalid", "created", "invalid", "invalid"]
+    assert results[1].error.startswith("pm25:")
+    assert results[4].error == "created_at: in the future"
+    assert valid_results == [results[0], results[2]]
+
+    assert [row["air_quality"] for row in rows] == ["good", "bad"]
+    assert [row["created_at"] for row in rows] == [NOW, datetime(2026, 3, 10, 11, 0)]
+    assert rows[1]["note"] == "kitchen" and all(row["user_id"] == 7 for row in rows)
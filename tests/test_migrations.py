@@ -0,0 +1,89 @@
+# tests/test_migrations.py
+import os
+import subprocess
+import sys
+
+from sqlalchemy import create_engine, text
+
+from database import Base
+from migrations import MIGRATIONS, check_schema, pending_migrations, run_migrations
+
+
+def raw_created_at(engine):
+    with engine.connect() as conn:
+        return [row[0] for row in conn.execute(text("SELECT created_at FROM data ORDER BY id"))]
+
+
+def insert_legacy_row(engine, created_at):
+    with engine.begin() as conn:
+        conn.execute(
+            text("INSERT INTO data (temperature, humidity, pm25, created_at) VALUES (20, 40, 10, :c)"),
+            {"c": created_at},
+        )
+
+
+def test_data_migrations_run_once(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'legacy.db'}")
+    Base.metadata.create_all(bind=engine)
+    insert_legacy_row(engine, "2025-01-01 00:00:00")
+    assert check_schema(engine) == [f"migration {name}" for name, _ in MIGRATIONS]
+
+    run_migrations(engine)
+    assert raw_created_at(engine) == ["2025-01-01 00:00:00.000000"]
+    assert pending_migrations(engine) == []
+    assert check_schema(engine) == []
+
+    # 두 번째 실행은 data 를 다시 훑지 않음 (기록된 마이그레이션은 건너뜀)
+    insert_legacy_row(engine, "2025-01-02 00:00:00")
+    run_migrations(engine)
+    assert raw_created_at(engine)[-1] == "2025-01-02 00:00:00"
+    engine.dispose()
+
+
+def test_check_schema_reports_missing_column(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    run_migrations(engine)
+    with engine.begin() as conn:
+        conn.execute(text("ALTER TABLE alert_state DROP COLUMN notified"))
+    assert check_schema(engine) == ["alert_state.notified"]
+    run_migrations(engine)
+    assert check_schema(engine) == []
+    engine.dispose()
+
+
+def test_orm_rows_keep_microsecond_format(db, user):
+    import models
+
+    db.add(models.Data(temperature=20, humidity=40, pm25=10, user_id=user.User_ID))
+    db.commit()
+    (created_at,) = db.execute(text("SELECT created_at FROM data")).one()
+    assert len(created_at) == 26
+
+
+def _import_main(tmp_path, **env):
+    """빈 DB 파일로 새 프로세스에서 main 을 import (import 때 스키마 처리만 보고 서버는 띄우지 않음)"""
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    run_env = {k: v for k, v in os.environ.items() if k not in ("WEB_CONCURRENCY", "DB_SCHEMA_ON_STARTUP")}
+    run_env.update(
+        DATABASE_URL=f"sqlite:///{tmp_path / 'fresh.db'}",
+        MQTT_LEADER_LOCK_FILE=str(tmp_path / "ingest.lock"),
+        PYTHONPATH=root,
+        **env,
+    )
+    return subprocess.run(
+        [sys.executable, "-c", "import main; print(main.DB_SCHEMA_ON_STARTUP)"],
+        cwd=str(tmp_path), env=run_env, capture_output=True, text=True, timeout=60,
+    )
+
+
+def test_single_process_migrates_fresh_db_on_import(tmp_path):
+    result = _import_main(tmp_path)
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip().endswith("migrate")
+    assert check_schema(create_engine(f"sqlite:///{tmp_path / 'fresh.db'}")) == []
+
+
+def test_multiple_workers_require_manage_migrate(tmp_path):
+    result = _import_main(tmp_path, WEB_CONCURRENCY="2")
+    assert result.returncode != 0
+    assert "python manage.py migrate" in result.stderr
@@ -0,0 +1,34 @@
+# tests/test_passwords.py
+import asyncio
+
+import pytest
+
+import passwords
+from passwords import default_hash_workers
+
+
+@pytest.mark.parametrize(
+    "cores, web_workers, expected",
+    [
+        (1, 1, 1),
+        (8, 1, 2),    # 워커 하나여도 기본값은 작게
+        (8, 4, 2),
+        (8, 8, 1),
+        (4, 16, 1),   # 코어보다 워커가 많아도 최소 1
+        (16, 0, 2),
+    ],
+)
+def test_default_hash_workers_splits_cores_between_web_workers(cores, web_workers, expected):
+    assert default_hash_workers(cores, web_workers) == expected
+
+
+def test_hash_and_check_without_process_pool(monkeypatch):
+    monkeypatch.setattr(passwords, "PASSWORD_HASH_WORKERS", 0)
+    assert passwords.get_hash_executor() is None
+
+    async def roundtrip():
+        hashed = await passwords.hash_password("secret")
+        return await passwords.check_password("secret", hashed)
+
+    ok, new_hash = asyncio.run(roundtrip())
+    assert ok and new_hash is None
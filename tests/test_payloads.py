@@ -0,0 +1,97 @@
+# tests/test_payloads.py
+import json
+from datetime import datetime, timedelta
+
+import msgpack
+import pytest
+
+from payloads import PayloadError, decode_payload, encode_binary
+
+NOW = datetime(2026, 1, 1, 12, 0, 0)
+EPOCH_NOW = int((NOW - datetime(1970, 1, 1)).total_seconds())
+
+
+def reading(**overrides):
+    item = {"temperature": 21.5, "humidity": 40, "pm25": 12}
+    item.update(overrides)
+    return item
+
+
+def test_single_json_reading_without_timestamp():
+    decoded = decode_payload(json.dumps(reading()).encode(), now=NOW)
+    assert decoded.format == "json" and decoded.invalid == 0
+    (r,) = decoded.readings
+    assert (r.temperature, r.humidity, r.pm25, r.created_at) == (21.5, 40.0, 12.0, None)
+
+
+def test_json_batch_with_device_timestamps():
+    items = [reading(ts=EPOCH_NOW - 60), reading(created_at="2026-01-01T20:59:00+09:00")]
+    decoded = decode_payload(json.dumps({"readings": items}).encode(), now=NOW)
+    assert [r.created_at for r in decoded.readings] == [NOW - timedelta(minutes=1)] * 2
+
+
+def test_msgpack_matches_json():
+    items = [reading(ts=EPOCH_NOW), reading(pm25=30, ts=EPOCH_NOW - 1)]
+    from_json = decode_payload(json.dumps(items).encode(), now=NOW)
+    from_msgpack = decode_payload(msgpack.packb(items), now=NOW)
+    assert from_msgpack.format == "msgpack"
+    assert from_msgpack.readings == from_json.readings
+
+
+@pytest.mark.parametrize("bad", [
+    {"humidity": -0.5},
+    {"pm25": -1},
+    {"temperature": "NaN"},
+    {"humidity": True},
+    {"pm25": None},
+    {"ts": EPOCH_NOW + 3600},
+])
+def test_invalid_values_are_counted_not_stored(bad):
+    items = [reading(), reading(**bad)]
+    for data in (json.dumps(items).encode(), msgpack.packb(items)):
+        decoded = decode_payload(data, now=NOW)
+        assert len(decoded.readings) == 1
+        assert decoded.invalid == 1
+
+
+@pytest.mark.parametrize("value", [float("inf"), float("-inf"), float("nan")])
+def test_non_finite_msgpack_values_are_invalid(value):
+    # JSON 은 Infinity / NaN 을 표준으로 표현할 수 없어서 MessagePack 으로 확인
+    decoded = decode_payload(msgpack.packb([reading(), reading(pm25=value)]), now=NOW)
+    assert len(decoded.readings) == 1 and decoded.invalid == 1
+
+
+def test_missing_field_is_invalid():
+    decoded = decode_payload(json.dumps([{"temperature": 1, "humidity": 2}]).encode(), now=NOW)
+    assert decoded.readings == [] and decoded.invalid == 1
+
+
+def test_binary_round_trip_and_negative_temperature():
+    data = encode_binary([(0, 20.5, 41.25, 12.3), (30, -3.0, 40, 10), (60, 21.0, 42, 13.0)],
+                         base_ts=EPOCH_NOW - 60)
+    decoded = decode_payload(data, now=NOW)
+    assert decoded.format == "binary"
+    assert decoded.invalid == 0
+    assert [(r.temperature, r.humidity, r.pm25) for r in decoded.readings] == [
+        (20.5, 41.25, 12.3), (-3.0, 40.0, 10.0), (21.0, 42.0, 13.0),
+    ]
+    assert decoded.readings[-1].created_at == NOW
+
+
+def test_negative_temperature_is_accepted():
+    items = [reading(temperature=-12.5)]
+    for data in (json.dumps(items).encode(), msgpack.packb(items)):
+        decoded = decode_payload(data, now=NOW)
+        assert decoded.invalid == 0
+        assert decoded.readings[0].temperature == -12.5
+
+
+def test_binary_without_device_clock_ends_at_receive_time():
+    decoded = decode_payload(encode_binary([(0, 20, 40, 10), (10, 20, 40, 10)]), now=NOW)
+    assert [r.created_at for r in decoded.readings] == [NOW - timedelta(seconds=10), NOW]
+
+
+@pytest.mark.parametrize("data", [b"", b"hello", b"{not json", b"AZ\x02\x01\x00\x00\x00\x00", b"AZ\x01\x02"])
+def test_unreadable_payloads_raise(data):
+    with pytest.raises(PayloadError):
+        decode_payload(data, now=NOW)
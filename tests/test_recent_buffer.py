@@ -0,0 +1,116 @@
+# tests/test_recent_buffer.py
+from datetime import datetime, timedelta
+
+import recent_buffer
+from recent_buffer import RecentBuffer, ReadingRing, to_epoch_us
+
+# 보관 기간(RETENTION_RAW_DAYS) 안쪽 시각
+T0 = datetime.utcnow().replace(microsecond=0) - timedelta(days=20)
+
+
+def row(row_id, created_at, pm25=10.0, user_id=1):
+    return {
+        "id": row_id, "user_id": user_id, "created_at": created_at,
+        "temperature": 20.0, "humidity": 40.0, "pm25": pm25, "air_quality": "좋음", "note": None,
+    }
+
+
+def ready_buffer(capacity=16):
+    buffer = RecentBuffer(capacity)
+    buffer.ready = True
+    return buffer
+
+
+def test_ring_trim_drops_old_rows_and_raises_coverage():
+    ring = ReadingRing(8)
+    for i in range(6):
+        ring.add((i + 1, T0 + timedelta(days=i), 20.0, 40.0, 10.0, None, "n" if i == 1 else None))
+    cutoff = to_epoch_us(T0 + timedelta(days=3))
+    assert ring.trim_before(cutoff) == 3
+    assert ring.count == 3
+    assert ring.covered_from == cutoff
+    assert [p.id for p in ring.query(None, None, None, 10)] == [6, 5, 4]
+    assert ring.notes == {}
+    # 자른 뒤에도 이어서 쓰고 가득 차면 정상적으로 덮어씀
+    for i in range(6, 14):
+        ring.add((i + 1, T0 + timedelta(days=i), 20.0, 40.0, 10.0, None, None))
+    assert [p.id for p in ring.query(None, None, None, 3)] == [14, 13, 12]
+    assert ring.count == 8
+
+
+def test_query_before_retention_cutoff_falls_back_to_db():
+    buffer = ready_buffer()
+    buffer.add_rows([row(i + 1, T0 + timedelta(days=i)) for i in range(10)])
+    assert len(buffer.query(1, start_date=T0)) == 10
+
+    buffer.trim_before(T0 + timedelta(days=5))
+    # 지워진(지워질) 구간을 포함하는 범위는 ring 으로 답하지 않음
+    assert buffer.query(1, start_date=T0) is None
+    assert [p.id for p in buffer.query(1, start_date=T0 + timedelta(days=5))] == [10, 9, 8, 7, 6]
+    # 최신 N 개가 cutoff 이후로 다 채워지면 여전히 ring 에서 응답
+    assert [p.id for p in buffer.query(1, limit=3)] == [10, 9, 8]
+    assert buffer.query(1, limit=8) is None
+
+
+def test_query_trims_by_retention_cutoff(monkeypatch):
+    now = datetime.utcnow()
+    cutoff = (now - timedelta(days=30)).replace(hour=0, minute=0, second=0, microsecond=0)
+    monkeypatch.setattr(recent_buffer, "raw_cutoff", lambda: cutoff)
+
+    buffer = ready_buffer()
+    buffer.add_rows([row(1, cutoff - timedelta(days=1)), row(2, cutoff + timedelta(hours=1))])
+    assert buffer.query(1, start_date=cutoff - timedelta(days=2)) is None
+    assert [p.id for p in buffer.query(1, start_date=cutoff)] == [2]
+    assert buffer.stats()["users"] == 1
+
+
+def _add_db_rows(db, user, times):
+    import models
+
+    items = [models.Data(temperature=20, humidity=40, pm25=10, air_quality="good",
+                         user_id=user.User_ID, created_at=t) for t in times]
+    db.add_all(items)
+    db.commit()
+    return [d.id for d in items]
+
+
+def test_rows_saved_between_relay_snapshot_and_warm_up_are_not_lost(db, user, monkeypatch):
+    import relay as relay_module
+    from relay import RowRelay
+
+    buffer = RecentBuffer(16)
+    monkeypatch.setattr(relay_module, "recent_readings", buffer)
+    relay = RowRelay(poll_seconds=0)
+
+    before = _add_db_rows(db, user, [T0])
+    relay.poll_once(db)  # relay 시작 위치 기록 (coordination.start_ingest 에서 warm_up 보다 먼저)
+    # 다른 워커가 relay 시작과 warm_up 사이에 저장한 행 -> warm_up 이 DB 에서 읽음
+    between = _add_db_rows(db, user, [T0 + timedelta(minutes=1)])
+    buffer.warm_up()
+    # warm_up 이후에 저장된 행 -> relay 가 전달 (warm_up 과 겹친 행은 건너뜀)
+    after = _add_db_rows(db, user, [T0 + timedelta(minutes=2)])
+    relay.poll_once(db)
+
+    points = buffer.query(user.User_ID, start_date=T0 - timedelta(days=1))
+    assert [p.id for p in points] == list(reversed(before + between + after))
+
+
+def test_tz_aware_bounds_match_db_after_normalizing(db, user):
+    from datetime import timezone
+
+    from aggregation import to_naive_utc
+    from routes.graph import build_graph_query
+
+    ids = _add_db_rows(db, user, [T0 + timedelta(hours=i) for i in range(6)])
+    buffer = RecentBuffer(16)
+    buffer.warm_up()
+
+    kst = timezone(timedelta(hours=9))
+    start = (T0 + timedelta(hours=2)).replace(tzinfo=timezone.utc).astimezone(kst)
+    assert to_naive_utc(start) == T0 + timedelta(hours=2)
+
+    # /graph 는 경로를 고르기 전에 한 번 변환 -> ring 과 DB 가 같은 결과
+    start = to_naive_utc(start)
+    from_ring = [p.id for p in buffer.query(user.User_ID, start_date=start)]
+    from_db = [d.id for d in build_graph_query(db, user.User_ID, start_date=start).all()]
+    assert from_ring == from_db == list(reversed(ids[2:]))
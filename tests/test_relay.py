@@ -0,0 +1,74 @@
+# tests/test_relay.py
+from datetime import datetime
+
+import pytest
+
+import models
+import mqtt
+from alert_rules import alert_rules
+from relay import RowRelay
+
+
+def add_data(db, user, pm25):
+    d = models.Data(temperature=20, humidity=40, pm25=pm25, user_id=user.User_ID,
+                    created_at=datetime.utcnow())
+    db.add(d)
+    db.commit()
+    return d
+
+
+def test_listener_gets_rows_saved_by_other_processes(db, user):
+    relay = RowRelay(poll_seconds=0)
+    seen = []
+    relay.add_listener(seen.extend)
+    relay.poll_once(db)  # 시작 위치 기록
+
+    first = add_data(db, user, 10)
+    second = add_data(db, user, 70)
+    assert relay.poll_once(db) == 2
+    assert [row["id"] for row in seen] == [first.id, second.id]
+    assert seen[1]["user_id"] == user.User_ID and seen[1]["pm25"] == 70
+
+    relay.remove_listener(seen.extend)
+    add_data(db, user, 20)
+    relay.poll_once(db)
+    assert len(seen) == 2
+
+
+@pytest.fixture
+def alert_calls(db, user, monkeypatch):
+    db.add(models.AlertSetting(user_id=user.User_ID, pm25_threshold=50))
+    db.commit()
+    alert_rules.invalidate()
+    calls = []
+    monkeypatch.setattr(mqtt, "submit_alert", lambda *args: calls.append(args))
+    yield calls
+    alert_rules.invalidate()
+
+
+def test_only_alerting_process_evaluates_rows(user, alert_calls, monkeypatch):
+    rows = [{"user_id": user.User_ID, "temperature": 0, "humidity": 0, "pm25": 80}]
+
+    # shared 모드의 리더가 아닌 워커: 저장만 하고 알림은 평가하지 않음
+    monkeypatch.setattr(mqtt, "_alerts_enabled", False)
+    mqtt.alert_flushed_rows(rows)
+    assert alert_calls == []
+
+    monkeypatch.setattr(mqtt, "_alerts_enabled", True)
+    mqtt.alert_flushed_rows(rows)
+    assert alert_calls == [(user.User_ID, 0, 0, 80)]
+
+
+def test_leader_alert_duty_toggles_evaluation(db, monkeypatch):
+    from relay import row_relay
+
+    monkeypatch.setattr(mqtt, "_alerts_enabled", False)
+    try:
+        mqtt.start_leader_alerts()
+        assert mqtt._alerts_enabled
+        assert mqtt.alert_flushed_rows in row_relay._listeners
+        mqtt.stop_leader_alerts()
+        assert not mqtt._alerts_enabled
+        assert mqtt.alert_flushed_rows not in row_relay._listeners
+    finally:
+        mqtt.stop_mqtt()
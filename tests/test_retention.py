@@ -0,0 +1,106 @@
+# tests/test_retention.py
+from datetime import datetime, timedelta
+
+import pytest
+
+import models
+import retention
+import rollups
+from retention import cutoff_for, run_retention
+
+
+@pytest.fixture(autouse=True)
+def no_pause(monkeypatch):
+    monkeypatch.setattr(retention, "RETENTION_CHUNK_PAUSE_SECONDS", 0)
+    monkeypatch.setattr(retention, "RETENTION_CHUNK_ROWS", 3)
+
+
+def test_cutoff_rounds_down_to_utc_midnight():
+    now = datetime(2026, 3, 10, 15, 30)
+    assert cutoff_for(30, now) == datetime(2026, 2, 8)
+    assert cutoff_for(0, now) is None
+
+
+def test_purge_keeps_rows_after_cutoff_and_rollups(db, user):
+    now = datetime(2026, 3, 10, 12, 0)
+    cutoff = cutoff_for(retention.RETENTION_RAW_DAYS, now)
+    old = [cutoff - timedelta(hours=1 + i) for i in range(7)]
+    new = [cutoff, cutoff + timedelta(days=1)]
+    items = [
+        models.Data(temperature=20, humidity=40, pm25=10, user_id=user.User_ID, created_at=t)
+        for t in old + new
+    ]
+    db.add_all(items)
+    db.flush()
+    rollups.apply_rows(db, [rollups.row_from_data(d) for d in items])
+    db.commit()
+
+    report = run_retention(now=now, archive_dir="")
+    assert report.deleted_rows == len(old)
+    remaining = sorted(t for (t,) in db.query(models.Data.created_at).all())
+    assert remaining == new
+
+    # 지운 날의 일 롤업은 남아 있음
+    day = rollups.to_epoch(cutoff - timedelta(days=1))
+    daily = db.query(models.DataRollup).filter_by(resolution="1d", bucket_epoch=day).one()
+    assert daily.count == len(old)
+
+
+def test_archive_before_delete(db, user, tmp_path):
+    import gzip
+    import json
+
+    now = datetime(2026, 3, 10, 12, 0)
+    cutoff = cutoff_for(retention.RETENTION_RAW_DAYS, now)
+    db.add(models.Data(temperature=20, humidity=40, pm25=10, user_id=user.User_ID,
+                       created_at=cutoff - timedelta(hours=1)))
+    db.commit()
+
+    report = run_retention(now=now, archive_dir=str(tmp_path))
+    assert report.archived_rows == report.deleted_rows == 1
+    (path,) = tmp_path.iterdir()
+    lines = gzip.decompress(path.read_bytes()).decode().splitlines()
+    assert json.loads(lines[0])["user_id"] == user.User_ID
+
+
+def test_stop_event_ends_purge_after_committed_chunk(db, user):
+    import threading
+
+    now = datetime(2026, 3, 10, 12, 0)
+    cutoff = cutoff_for(retention.RETENTION_RAW_DAYS, now)
+    db.add_all([
+        models.Data(temperature=20, humidity=40, pm25=10, user_id=user.User_ID,
+                    created_at=cutoff - timedelta(hours=1 + i))
+        for i in range(7)
+    ])
+    db.commit()
+
+    stop = threading.Event()
+    stop.set()
+    archived, deleted = retention.purge_raw(cutoff, archive_dir="", stop=stop)
+    # 청크 하나(RETENTION_CHUNK_ROWS=3)만 지우고 멈춤, 나머지는 다음 실행에서
+    assert deleted == 3
+    assert db.query(models.Data).count() == 4
+
+
+def test_worker_stop_waits_for_running_retention(monkeypatch):
+    import threading
+    import time
+
+    running = threading.Event()
+    finished = []
+
+    def slow_retention(stop=None):
+        running.set()
+        stop.wait()
+        time.sleep(0.2)  # 진행 중인 청크를 커밋하는 중
+        finished.append(True)
+
+    monkeypatch.setattr(retention, "run_retention", slow_retention)
+    worker = retention.RetentionWorker(interval_hours=0.01 / 3600)
+    worker.start()
+    assert running.wait(5)
+
+    worker.stop()
+    # stop 이 돌아온 시점에는 retention 이 끝나 있음 -> 리더 잠금을 놓아도 겹치지 않음
+    assert finished == [True]
@@ -0,0 +1,141 @@
+# tests/test_rollups.py
+from datetime import datetime, timedelta
+
+import pytest
+
+import models
+import rollups
+from aggregation import aggregate_raw
+from database import engine
+from migrations import fill_rollup_metric_counts
+
+T0 = datetime(2026, 3, 10, 0, 0)
+
+
+def _insert(db, user, readings, step=timedelta(minutes=1)):
+    items = [
+        models.Data(
+            temperature=t, humidity=h, pm25=p, air_quality="good",
+            user_id=user.User_ID, created_at=T0 + step * i,
+        )
+        for i, (t, h, p) in enumerate(readings)
+    ]
+    db.add_all(items)
+    db.flush()
+    rollups.apply_rows(db, [rollups.row_from_data(d) for d in items])
+    db.commit()
+
+
+def _by_bucket(points):
+    return {p["bucket_start"]: p for p in points}
+
+
+READINGS = [
+    (20.0, 40.0, 10.0),
+    (None, 50.0, 30.0),
+    (26.0, None, None),
+    (None, None, None),
+    (23.0, 45.0, 20.0),
+]
+
+
+@pytest.mark.parametrize("seconds", [60, 300, 3600, 86400])
+def test_rollups_match_raw_aggregation_with_missing_values(db, user, seconds):
+    _insert(db, user, READINGS)
+
+    raw = _by_bucket(aggregate_raw(db, user.User_ID, seconds))
+    rolled = _by_bucket(rollups.aggregate_rollups(db, user.User_ID, seconds))
+
+    assert raw.keys() == rolled.keys()
+    for bucket, point in raw.items():
+        for key, value in point.items():
+            if isinstance(value, float):
+                assert rolled[bucket][key] == pytest.approx(value), key
+            else:
+                assert rolled[bucket][key] == value, key
+
+
+def _assert_same(raw, rolled):
+    assert raw.keys() == rolled.keys()
+    for bucket, point in raw.items():
+        for key, value in point.items():
+            if isinstance(value, float):
+                assert rolled[bucket][key] == pytest.approx(value), key
+            else:
+                assert rolled[bucket][key] == value, key
+
+
+@pytest.mark.parametrize("seconds", [60, 300, 3600, 86400])
+def test_partial_edge_buckets_match_raw_aggregation(db, user, seconds, monkeypatch):
+    import retention
+
+    monkeypatch.setattr(retention, "RETENTION_RAW_DAYS", 0)  # 원본을 지우지 않은 상태
+    _insert(db, user, READINGS * 120, step=timedelta(minutes=7, seconds=13))
+    # 롤업 경계(분/시/일)에 걸치는 범위: 시작 전 / 끝 뒤의 값이 섞이면 안 됨
+    start, end = T0 + timedelta(hours=13, minutes=17, seconds=30), T0 + timedelta(days=2, hours=9, seconds=45)
+
+    raw = _by_bucket(aggregate_raw(db, user.User_ID, seconds, start, end))
+    rolled = _by_bucket(rollups.aggregate_rollups(db, user.User_ID, seconds, start, end))
+    _assert_same(raw, rolled)
+
+    # 롤업 한 칸 안의 좁은 범위
+    start, end = T0 + timedelta(hours=1, minutes=3), T0 + timedelta(hours=1, minutes=40)
+    raw = _by_bucket(aggregate_raw(db, user.User_ID, seconds, start, end))
+    rolled = _by_bucket(rollups.aggregate_rollups(db, user.User_ID, seconds, start, end))
+    _assert_same(raw, rolled)
+
+
+def test_purged_edge_falls_back_to_whole_rollup_bucket(db, user, monkeypatch):
+    import retention
+
+    _insert(db, user, READINGS, step=timedelta(hours=5))
+    # 원본은 보관 기간이 지나 지워지고 롤업만 남은 날: 그 날의 롤업 한 칸을 그대로 사용
+    monkeypatch.setattr(retention, "RETENTION_RAW_DAYS", 1)
+    db.query(models.Data).delete()
+    db.commit()
+
+    (point,) = rollups.aggregate_rollups(db, user.User_ID, 86400, T0 + timedelta(hours=12))
+    assert point["bucket_start"] == T0 and point["count"] == len(READINGS)
+
+
+def test_average_skips_none_per_metric(db, user):
+    _insert(db, user, READINGS)
+
+    (point,) = rollups.aggregate_rollups(db, user.User_ID, 86400)
+    assert point["count"] == 5
+    assert point["temperature_avg"] == pytest.approx((20 + 26 + 23) / 3)
+    assert point["humidity_avg"] == pytest.approx((40 + 50 + 45) / 3)
+    assert point["pm25_avg"] == pytest.approx((10 + 30 + 20) / 3)
+
+
+def test_bucket_without_values_has_no_average(db, user):
+    _insert(db, user, [(None, None, 12.0)])
+
+    (point,) = rollups.aggregate_rollups(db, user.User_ID, 60)
+    assert point["temperature_avg"] is None
+    assert point["pm25_avg"] == pytest.approx(12.0)
+
+
+def test_rebuild_matches_incremental_counts(db, user):
+    _insert(db, user, READINGS)
+    incremental = rollups.aggregate_rollups(db, user.User_ID, 3600)
+
+    rollups.rebuild(db, user_id=user.User_ID)
+    db.commit()
+    rebuilt = rollups.aggregate_rollups(db, user.User_ID, 3600)
+
+    assert rebuilt == incremental
+
+
+def test_fill_metric_counts_for_old_rollup_rows(db, user):
+    _insert(db, user, [(20.0, None, 10.0)])
+    db.query(models.DataRollup).update(
+        {"temperature_count": None, "humidity_count": None, "pm25_count": None}
+    )
+    db.commit()
+
+    fill_rollup_metric_counts(engine)
+    db.expire_all()
+
+    for row in db.query(models.DataRollup).all():
+        assert (row.temperature_count, row.humidity_count, row.pm25_count) == (1, 0, 1)